@@ -1,9 +1,32 @@
 import os
 os.environ["STREAMLIT_WATCHER_TYPE"] = "none"
+import importlib
+import time
 import streamlit as st
 
+# Libraries the pages need, imported (and timed) one by one on the first page load
+STARTUP_MODULES = ("numpy", "pandas", "pyarrow", "scipy.sparse", "sklearn.cluster", "matplotlib", "clusterlens")
+
+@st.cache_resource(show_spinner=False)
+def startup_imports():
+    """({module: seconds}, epoch start) of this server process's first page load."""
+    started, seconds = time.time(), {}
+    for module in STARTUP_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        seconds[module] = time.perf_counter() - start
+    return seconds, started
+
+import_seconds, imports_started = startup_imports()
+from clusterlens import diagnostics
+
 if "role" not in st.session_state:
     st.session_state.role = None
+# Stage timings of this session's page runs, shown in the sidebar diagnostics panel
+if "diagnostics" not in st.session_state:
+    st.session_state.diagnostics = diagnostics.Recorder()
+    st.session_state.diagnostics.extend(diagnostics.import_spans(import_seconds, imports_started))
+diagnostics.activate(st.session_state.diagnostics)
     
 def intro():
     # --- Title Section ---
@@ -70,6 +93,28 @@ def intro():
             st.session_state.role = "Start"
             st.rerun()
     
+def diagnostics_panel(recorder):
+    """Collapsible sidebar panel: startup imports, per-stage timings and their export."""
+    with st.sidebar.expander("🩺 Diagnostics"):
+        st.caption(
+            f"Startup imports: {sum(import_seconds.values()):.2f}s ("
+            + ", ".join(f"{m} {s:.2f}s" for m, s in sorted(import_seconds.items(), key=lambda i: -i[1]))
+            + ")"
+        )
+        rows = [row for row in recorder.rows() if row["kind"] == "stage"]
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("No stages recorded yet in this session.")
+        st.download_button("JSON log", data=recorder.to_json_lines(), file_name="clusterlens_stages.jsonl",
+                           mime="application/x-ndjson", key="diagnostics_json")
+        st.download_button("Chrome trace", data=recorder.to_chrome_trace(), file_name="clusterlens_trace.json",
+                           mime="application/json", key="diagnostics_trace",
+                           help="Open in chrome://tracing or ui.perfetto.dev")
+        if st.button("Clear", key="diagnostics_clear"):
+            recorder.clear()
+            st.rerun()
+
 
 
 # ---Define your account pages---#
@@ -109,6 +154,9 @@ else:
 #--Ececute the Page returned by st.navigation--#
 pg.run()
 
+#--Diagnostics for this session--#
+diagnostics_panel(st.session_state.diagnostics)
+
 
 
 
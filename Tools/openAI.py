@@ -1,19 +1,62 @@
 import streamlit as st
-import pandas as pd
-import io
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage
 
 import os
 
+from clusterlens import assistant, diagnostics, ingest, query as local_query
+from clusterlens.cache import hash_bytes
+
 
 # ---- Model initialization ----
-model = ChatOpenAI(
-    model="openai/gpt-oss-120b",
-    temperature=1,
-    openai_api_key=os.getenv("OPENAI_API_KEY"),
-    openai_api_base="https://api.groq.com/openai/v1"   
-)
+@st.cache_resource
+def chat_model():
+    """One chat client per server process, shared by every session and rerun.
+
+    CLUSTERLENS_CHAT_MODEL=fake swaps in the offline stand-in (no API key or network).
+    """
+    if os.getenv("CLUSTERLENS_CHAT_MODEL") == "fake":
+        return assistant.FakeChatModel()
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model="openai/gpt-oss-120b",
+        temperature=1,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        openai_api_base="https://api.groq.com/openai/v1",
+        streaming=True,
+    )
+
+@st.cache_resource
+def response_cache():
+    """Finished replies shared across sessions, keyed by dataset and normalized query."""
+    return assistant.ResponseCache()
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def dataset_digest(data_hash, result_key, _df, _clusters):
+    """Token-budgeted digest of one upload (plus its clustering result), built once per hash."""
+    with diagnostics.stage("digest", _df):
+        return assistant.build_digest(_df, _clusters)
+
+def chat_bubble(text, side):
+    """Chat bubble HTML: the user's query on the right, the model's reply on the left."""
+    shadow = 0.3 if side == "right" else 0.2
+    margin = "margin-left: auto;" if side == "right" else "margin-right: auto;"
+    return f"""
+        <div style="
+            text-align: {side};
+            max-width: 70%;
+            {margin}
+            color: white;
+            padding: 14px 18px;
+            border-radius: 16px;
+            margin-top: 12px;
+            font-family: 'Segoe UI', sans-serif;
+            font-size: 16px;
+            line-height: 1.5;
+            box-shadow: 0px 4px 10px rgba(0,0,0,{shadow});
+            word-wrap: break-word;
+        ">
+            {text}
+        </div>
+        """
 
 # ---- Session state setup ----
 if "df" not in st.session_state:
@@ -33,9 +76,9 @@ st.markdown(
 # ---- File uploader ----
 uploaded_file = st.file_uploader(
     label="Upload your dataset", 
-    type=".csv", 
+    type=ingest.UPLOAD_TYPES,
     accept_multiple_files=False,
-    help="Upload a .CSV dataset to analyze"
+    help="Upload a .CSV, .Parquet or .Feather dataset to analyze"
 )
 st.markdown(
     """
@@ -52,7 +95,10 @@ st.markdown(
 
 # ---- Load DataFrame ----
 if uploaded_file:
-    df = pd.read_csv(io.StringIO(uploaded_file.getvalue().decode("utf-8")))
+    # Shares the parse with the Clustering page when the same file is uploaded there
+    data = uploaded_file.getvalue()
+    data_hash = hash_bytes(data)
+    df = ingest.load_bytes(data, uploaded_file.name, data_hash)
     st.session_state.uploaded_file = uploaded_file
 
 # ---- Query input ----
@@ -92,56 +138,48 @@ if st.button("Generate"):
     if uploaded_file:
         if st.session_state.querry.strip():
             
-            prompt = f"{st.session_state.querry}\n\nOnly from:\n{uploaded_file}"
-
-            with st.spinner("Analyzing your query..."):
-                response = model.invoke([HumanMessage(prompt)])
+            query = st.session_state.querry
+            # Cluster profiles from the Clustering page, if this same file was clustered there
+            clusters = labels = result_key = None
+            index = st.session_state.get("index")
+            if index is not None and st.session_state.get("data_hash") == data_hash:
+                clusters = assistant.cluster_table(index, st.session_state.features)
+                labels = index.labels if len(index.labels) == len(df) else None
+                result_key = st.session_state.result_key
+            digest = dataset_digest(data_hash, result_key, df, clusters)
+            dataset = f"{data_hash}:{result_key}"
+            cached = response_cache().get(dataset, query) is not None
 
             # Show user query as a right-aligned chat bubble
-            st.markdown(
-                f"""
-                <div style="
-                    text-align: right;
-                    max-width: 70%;
-                    margin-left: auto;
-                    color: white;
-                    padding: 14px 18px;
-                    border-radius: 16px;
-                    margin-top: 12px;
-                    font-family: 'Segoe UI', sans-serif;
-                    font-size: 16px;
-                    line-height: 1.5;
-                    box-shadow: 0px 4px 10px rgba(0,0,0,0.3);
-                    word-wrap: break-word;
-                ">
-                    {st.session_state.querry}
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
-
-            # Show model response as a left-aligned chat bubble
-            st.markdown(
-                f"""
-                <div style="
-                    text-align: left;
-                    max-width: 70%;
-                    margin-right: auto;
-                    color: white;
-                    padding: 14px 18px;
-                    border-radius: 16px;
-                    margin-top: 12px;
-                    font-family: 'Segoe UI', sans-serif;
-                    font-size: 16px;
-                    line-height: 1.5;
-                    box-shadow: 0px 4px 10px rgba(0,0,0,0.2);
-                    word-wrap: break-word;
-                ">
-                    {response.content}
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+            st.markdown(chat_bubble(query, "right"), unsafe_allow_html=True)
+
+            # Stream the model response into a left-aligned chat bubble
+            # The model plans the query, pandas runs it on every row, the model phrases the result
+            reply = ""
+            bubble = st.empty()
+            trace = local_query.Trace()
+            with st.spinner("Analyzing your query..."):
+                for chunk in local_query.ask_local(chat_model(), df, query, labels, digest,
+                                                   response_cache(), dataset, trace):
+                    reply += chunk
+                    bubble.markdown(chat_bubble(reply, "left"), unsafe_allow_html=True)
+            if cached:
+                st.caption("Cached reply")
+            elif trace.result is not None:
+                result = trace.result
+                st.caption(
+                    f"Computed locally on {result.n_rows:,} rows ({result.matched:,} matching) in "
+                    f"{result.seconds * 1000:.0f} ms; {trace.prompt_tokens:,} prompt tokens sent"
+                )
+                with st.expander("Query plan and result"):
+                    st.code(result.plan.to_json(), language="json")
+                    st.dataframe(result.frame)
+            else:
+                reason = f"no usable query plan ({trace.error})" if trace.error else "the model returned no query plan"
+                st.caption(
+                    f"Answered from the {digest.tokens:,}-token digest ({', '.join(digest.sections)}"
+                    f"{', trimmed to fit' if digest.truncated else ''}): {reason}"
+                )
 
 
         else:
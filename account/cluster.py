@@ -1,30 +1,58 @@
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-from sklearn.metrics import silhouette_score
-from kneed import KneeLocator
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
+import tempfile
+from pathlib import Path
+from functools import partial
+from uuid import uuid4
+
+from clusterlens import charts, diagnostics, engine, export, ingest, reduction, scoring, stream
+from clusterlens.cache import ResultCache, cache_key, hash_bytes
+from clusterlens.encoding import cluster_means
+from clusterlens.index import ClusterIndex
+from clusterlens.jobs import JobQueue
+from clusterlens.ksearch import PARALLEL_MIN_ROWS
+from clusterlens.memory import ArrayStore, memory_report
+from clusterlens.model import MIME as MODEL_MIME, ClusterModel
+from clusterlens.paging import PAGE_SIZE, Filter, TableView
+from clusterlens.profiling import compute_profile
 
 # ================================
 # ---- SESSION STATE INIT ----
 # ================================
+# One canonical (compacted) frame per upload plus a label array; every tab
+# reads from these instead of keeping its own copies.
 defaults = {
-    "df_temp": None,
     "df": None,
+    "data_hash": None,
+    "labels": None,
     "features": [],
     "features_temp": [],
-    "kmeans": None,
-    "X": None,
-    "downloads": []
+    "model": None,
+    "index": None,
+    # sorted/filtered paging over `index`
+    "view": None,
+    "profile": None,
+    "encoded_profile": None,
+    "result_key": None,
+    # kept across uploads and feature changes so the next run can warm-start
+    "warm_state": None,
+    # clustering job this session is waiting for: key, features and data hash
+    "job": None,
 }
 for key, val in defaults.items():
     if key not in st.session_state:
         st.session_state[key] = val
+if "arrays" not in st.session_state:
+    st.session_state.arrays = ArrayStore()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid4().hex
+
+def reset_results():
+    """Forget the clustering result (e.g. after a new upload)."""
+    for key in ("labels", "model", "index", "view", "profile", "encoded_profile", "result_key"):
+        st.session_state[key] = None
 
 # ================================
 # ---- CUSTOM STYLES ----
@@ -49,59 +77,218 @@ st.markdown("""
 # ================================
 # ---- HELPER FUNCTIONS ----
 # ================================
-@st.cache_data
-def cluster_data(df, features):
-    """Perform clustering and return clusters, fitted model, and scaled features."""
-    X = df[features].copy()
-    
-    st.session_state.df = st.session_state.df_temp.copy()
-    st.session_state.features = st.session_state.features_temp.copy()
-
-    # Encode categorical features
-    label_encoders = {}
-    for col in X.columns:
-        if X[col].dtype == 'object':
-            le = LabelEncoder()
-            X[col] = le.fit_transform(X[col])
-            label_encoders[col] = le
-
-    # Fill missing values and scale
-    X.fillna(X.mean(), inplace=True)
-    X_scaled = StandardScaler().fit_transform(X)
-
-    X = X.loc[:, X.nunique() > 1]
-    max_k = min(10, len(X))
-    # Find optimal clusters
-    wcss = [KMeans(n_clusters=k, random_state=42).fit(X_scaled).inertia_ for k in range(1, max_k+1)]
-    kl = KneeLocator(range(1, 11), wcss, curve='convex', direction='decreasing')
-
-    # Final clustering
-    kmeans = KMeans(n_clusters=kl.elbow, random_state=42)
-    clusters = kmeans.fit_predict(X_scaled)
-    return clusters, kmeans, X_scaled
+SAMPLING_MODES = {"Auto (sample large files)": "auto", "Always sample": True, "Full data": False}
+ENCODINGS = {"Label codes": "ordinal", "One-hot / hashed (sparse)": "sparse"}
+ALGORITHMS = {"Auto": "auto", "Lloyd": "lloyd", "Elkan": "elkan", "Mini-batch": "minibatch"}
+WARM_MODES = {"rows": "same features", "features": "features changed", "cold": "no shared features"}
+POLL_SECONDS = 1.0
+PAGE_SIZES = (50, PAGE_SIZE, 500)
+# categorical columns with more levels are filtered by substring instead of a level list
+FILTER_MAX_LEVELS = 1000
+
+@st.cache_resource
+def result_cache():
+    """Disk-backed result cache shared by every session and kept across restarts."""
+    return ResultCache()
+
+@st.cache_resource
+def job_queue():
+    """Clustering worker pool shared by every session of this server (see clusterlens.jobs)."""
+    return JobQueue()
+
+def submit_clustering(df, features, data_hash, early_stop=False, sampling="auto", criterion="elbow",
+                      encoding="ordinal", warm_start=None, algorithm="auto", budget=None, pca=None):
+    """Queue clustering on the shared worker pool and return the job key.
+
+    Identical requests (same upload, features and options) from any session
+    share one job; results are also cached on disk by upload hash.
+    """
+    options = dict(early_stop=early_stop, sampling=sampling, criterion=criterion, silhouette=True,
+                   encoding=encoding, algorithm=algorithm, budget=budget, pca=pca)
+    warm = None
+    if warm_start is not None:
+        warm = hash_bytes(b"".join(np.ascontiguousarray(c).tobytes() for _, c in sorted(warm_start.centers.items())))
+    key = cache_key(data_hash, features, warm=warm, **options)
+    queue = job_queue()
+    queue.submit(
+        key, engine.cluster_data, args=(df, list(features)),
+        kwargs=dict(options, cache=result_cache(), data_hash=data_hash, warm_start=warm_start,
+                    n_jobs=queue.cores_per_job if len(df) >= PARALLEL_MIN_ROWS else 1),
+        watcher=st.session_state.session_id,
+    )
+    return key
+
+def cancel_clustering():
+    """Stop waiting for this session's job (the job stops once no session waits for it)."""
+    pending = st.session_state.job
+    if pending is not None:
+        job_queue().cancel(pending["key"], st.session_state.session_id)
+        st.session_state.job = None
+
+@st.fragment(run_every=POLL_SECONDS)
+def clustering_progress():
+    """Progress of this session's job, refreshed every POLL_SECONDS; reruns the page once it ends."""
+    pending = st.session_state.job
+    job = job_queue().get(pending["key"]) if pending is not None else None
+    if job is None or job.future.done():
+        st.rerun()
+    progress = job.progress
+    if progress is None:
+        st.progress(0.0, text=f"Waiting for a free worker ({len(job_queue().active())} jobs queued or "
+                              f"running on this server)...")
+    elif progress.total > 1:
+        st.progress(progress.fraction, text=f"{progress.stage}: {progress.done} of {progress.total} k fitted")
+    else:
+        st.progress(progress.fraction, text=f"{progress.stage}...")
+    if len(job.watchers) > 1:
+        st.caption(f"Shared with {len(job.watchers) - 1} other session(s) running the same clustering.")
+    if st.button("Cancel clustering"):
+        cancel_clustering()
+        st.toast("Clustering cancelled.")
+        st.rerun()
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def feature_chart(result_key, feature, _index):
+    """PNG of one feature across all clusters, cached by (result, feature)."""
+    with diagnostics.stage("feature counts", _index.df, feature=feature):
+        counts = charts.feature_counts(_index.df[feature], _index.labels, _index.clusters, feature)
+    with diagnostics.stage("chart rendering", feature=feature):
+        return charts.render_feature(counts)
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def projection_chart(result_key, _model, _df, _labels):
+    """PNG of a stratified sample of every cluster on two principal components, cached by result."""
+    with diagnostics.stage("2-D projection", _df):
+        projection = reduction.project(_model, _df, _labels)
+    with diagnostics.stage("chart rendering", projection.points):
+        return charts.render_projection(projection)
+
+def table_view():
+    """TableView of the current result; sort orderings are built on first use and reused."""
+    view = st.session_state.view
+    if view is None or view.index is not st.session_state.index:
+        view = st.session_state.view = TableView(st.session_state.index)
+    return view
+
+def filter_controls(view, columns):
+    """Filter widgets for the chosen columns; returns a tuple of paging.Filter."""
+    filters = []
+    for col in st.multiselect("Filter by", options=columns, key="filter_columns"):
+        levels = view.levels(col, FILTER_MAX_LEVELS)
+        bounds = view.bounds(col)
+        if levels is not None:
+            keep = st.multiselect(f"{col} is one of", options=levels, key=f"filter_{col}")
+            if keep:
+                filters.append(Filter(col, values=tuple(keep)))
+        elif bounds is not None:
+            low, high = bounds
+            if low < high:
+                chosen = st.slider(col, low, high, (low, high), key=f"filter_{col}")
+                if chosen != (low, high):
+                    filters.append(Filter(col, low=chosen[0], high=chosen[1]))
+        else:
+            text = st.text_input(f"{col} contains", key=f"filter_{col}")
+            if text:
+                filters.append(Filter(col, contains=text))
+    return tuple(filters)
+
+@st.fragment
 def show_clusters():
-    """Display clustered data by cluster in separate tabs."""
+    """Display clustered data by cluster in separate tabs, one server-side page at a time.
+
+    Only the visible page of each cluster is sent to the browser; paging,
+    sorting and filtering rerun this fragment, not the whole page.
+    """
     st.title("📊 Segmentation by Clusters")
-    clusters = sorted(st.session_state.df['Cluster'].unique())
-    tabs = st.tabs([f"Cluster {c+1}" for c in clusters])
+    index = st.session_state.index
+    view = table_view()
+    columns = index.feature_columns()
+    left, middle, right = st.columns([3, 2, 1])
+    sort = left.selectbox("Sort rows by", options=[None] + columns, key="table_sort",
+                          format_func=lambda c: "Original order" if c is None else c)
+    ascending = middle.radio("Order", ["Ascending", "Descending"], horizontal=True, key="table_order") == "Ascending"
+    size = right.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(PAGE_SIZE), key="table_page_size")
+    with st.expander("🔎 Filter rows"):
+        filters = filter_controls(view, columns)
+    tabs = st.tabs([f"Cluster {c+1}" for c in index])
 
-    for tab, cluster in zip(tabs, clusters):
+    for tab, cluster in zip(tabs, index):
         with tab:
-            cluster_df = st.session_state.df[st.session_state.df["Cluster"] == cluster]
-            st.dataframe(cluster_df.drop(columns=["Cluster"]))
-
-def decode_cluster_means(cluster_summary, label_encoders):
-    """Decode encoded categorical feature means back to labels."""
-    decoded = cluster_summary.copy()
-    for col in decoded.columns:
-        if col in label_encoders:
-            le = label_encoders[col]
-            mapping = dict(zip(le.transform(le.classes_), le.classes_))
-            decoded[col] = decoded[col].apply(
-                lambda val: mapping[min(mapping, key=lambda x: abs(x - val))]
-            )
-    return decoded
+            number = st.number_input("Page", min_value=1, value=1, step=1, key=f"table_page_{cluster}")
+            page = view.page(cluster, number - 1, size, sort, ascending, filters, columns)
+            if page.total == 0:
+                st.caption(f"No rows match the filters ({index.sizes[cluster]:,} rows in this cluster).")
+                continue
+            matching = f" matching ({index.sizes[cluster]:,} in cluster)" if filters else ""
+            st.caption(f"Rows {page.start + 1:,}–{page.start + len(page.frame):,} of {page.total:,}{matching}; "
+                       f"page {page.number + 1} of {page.pages:,}")
+            st.dataframe(page.frame)
+
+def show_result(result, df, features, data_hash):
+    """Keep a finished ClusterResult in the session and show the clusters with run details."""
+    # stages that ran in the clustering worker, for the diagnostics panel
+    diagnostics.record([span for span in result.timings if span.pid != os.getpid()])
+    arrays = st.session_state.arrays
+    labels = arrays.put("labels", result.labels)
+    st.session_state.features = features.copy()
+    st.session_state.labels = labels
+    st.session_state.index = ClusterIndex(
+        df, labels, order=arrays.put("order", np.argsort(labels, kind="stable"))
+    )
+    st.session_state.profile = None
+    st.session_state.encoded_profile = None
+    if result.encoder is not None:
+        # category shares per cluster, aggregated on the sparse design matrix
+        means = cluster_means(result.X_scaled, result.labels)
+        st.session_state.encoded_profile = result.encoder.describe(means).set_index(means.index)
+    st.session_state.result_key = cache_key(
+        data_hash, features, labels=hash_bytes(np.ascontiguousarray(labels).tobytes())
+    )
+    st.session_state.model = ClusterModel.from_result(result)
+    st.session_state.warm_state = result.warm_state
+    warm = result.warm
+    if warm is not None:
+        st.caption(
+            f"Warm start ({WARM_MODES[warm.mode]}): "
+            f"{len(warm.reused)} k reused as-is, {len(warm.refitted)} refined, {len(warm.cold)} fitted from scratch; "
+            f"{warm.iterations} iterations in {warm.seconds:.2f}s vs {warm.cold_iterations} in "
+            f"{warm.cold_seconds:.2f}s cold (saved {warm.saved_iterations} iterations, "
+            f"{warm.saved_seconds:.2f}s)."
+        )
+    plan = result.plan
+    if plan is not None:
+        took = f"; took {plan.seconds:.2f}s" if plan.seconds is not None else ""
+        st.caption(f"Plan: {plan.describe()} (estimated {plan.estimated_seconds:.2f}s{took}).")
+        with st.expander("Why this plan"):
+            st.markdown("\n".join(f"- {reason}" for reason in plan.reasons))
+    reduced = result.reduction
+    if reduced is not None:
+        compared = ""
+        if reduced.agreement is not None:
+            compared = (f" One fit at k = {result.k} on {reduced.compare_rows:,} rows: {reduced.speedup:.1f}x "
+                        f"faster than on all features, labels agree at ARI {reduced.agreement:.3f}.")
+        st.caption(
+            f"PCA: clustered on {reduced.n_components} of {reduced.n_features} dimensions "
+            f"({reduced.variance:.1%} of the variance, target {reduced.target:.0%}; {reduced.solver} "
+            f"on {reduced.fit_rows:,} rows, {reduced.seconds:.2f}s).{compared}"
+        )
+    scores = result.silhouette
+    if scores is not None and result.k in scores.scores:
+        st.caption(
+            f"Silhouette for k = {result.k}: {scores.scores[result.k]:.3f} "
+            f"(best k = {scores.best_k}; {scores.repeats} samples of {scores.sample_size:,} rows, "
+            f"{scores.seconds:.2f}s)"
+        )
+    report = result.sampling
+    if report is not None:
+        st.caption(
+            f"k chosen on {report.sample_size:,} of {report.n_rows:,} rows ({report.method}); "
+            f"{report.agreement:.0%} of samples agreed; sampled vs full-data inertia "
+            f"differs by at most {report.max_deviation:.1%}."
+        )
+        if not report.confident:
+            st.warning("Samples disagreed on k; consider clustering on the full data.")
+    st.success("Clustering complete!")
 
 # ================================
 # ---- TABS ----
@@ -112,61 +299,194 @@ segment, profiling, analyzing, download, about = st.tabs(
 
 # ---- SEGMENT TAB ----
 with segment:
-    st.info("Upload your CSV to see real clustering insights")
-    uploaded_file = st.file_uploader(" ", type=".csv", help="Upload a .CSV dataset")
-    st.session_state.df_temp = None
-
-    if uploaded_file:
-        df = pd.read_csv(io.StringIO(uploaded_file.getvalue().decode("utf-8")))
-        # Remove duplicate rows 
-        df = df.drop_duplicates()
-        
-        st.session_state.df_temp = df.copy()
+    st.info("Upload your CSV, Parquet or Feather file to see real clustering insights")
+    uploaded_file = st.file_uploader(" ", type=ingest.UPLOAD_TYPES, help="Upload a .CSV, .Parquet or .Feather dataset")
+    st.session_state.df = None
+    streaming = st.toggle(
+        "Streaming mode (large files)",
+        help="Read the file in chunks and write labels straight to disk. "
+             "Profiling, Analyzing and Download tabs are not available in this mode.",
+    )
+
+    if uploaded_file and streaming:
+        header = next(stream.iter_chunks(uploaded_file, chunksize=1))
+        features = st.multiselect("Select Features for Clustering", options=header.columns)
+
+        if st.button("Cluster"):
+            if not features:
+                st.warning("Please select at least one feature.")
+            else:
+                # removed as soon as the labelled file has been handed to the download button
+                with tempfile.TemporaryDirectory(prefix="clusterlens_") as tmp:
+                    output = Path(tmp) / "clusters.csv"
+                    try:
+                        with st.spinner("Clustering in streaming mode..."):
+                            result = stream.stream_cluster(uploaded_file, features, output)
+                    except ValueError as e:
+                        st.error(str(e))
+                    else:
+                        st.markdown(f"📊 {result.n_rows} rows in {result.k} clusters (mean feature values)")
+                        st.dataframe(result.profiles)
+                        with open(result.output, "rb") as f:
+                            st.download_button(
+                                label="📥 Download all rows with Cluster column",
+                                data=f,
+                                file_name="clusters.csv",
+                                mime="text/csv",
+                            )
+                        st.download_button(
+                            label="💾 Download fitted model",
+                            data=ClusterModel.from_stream(result).to_bytes(),
+                            file_name="clusterlens_model.npz",
+                            mime=MODEL_MIME,
+                        )
+                        st.success("Clustering complete!")
+
+    elif uploaded_file:
+        # Parsed, de-duplicated and compacted once per upload; reruns reuse the same frame
+        data = uploaded_file.getvalue()
+        data_hash = hash_bytes(data)
+        df = ingest.load_bytes(data, uploaded_file.name, data_hash)
+        if data_hash != st.session_state.data_hash:
+            reset_results()
+            st.session_state.data_hash = data_hash
+
+        st.session_state.df = df
         features = st.multiselect("Select Features for Clustering", options=df.columns)
         st.session_state.features_temp = features.copy()
+        early_stop = st.checkbox(
+            "Stop the elbow search early",
+            help="End the k = 1..10 sweep once the inertia curve has clearly bent.",
+        )
+        sampling = st.selectbox(
+            "Choose k on",
+            options=list(SAMPLING_MODES),
+            help="Sampling picks k on a subset of rows and fits the final model once on all rows.",
+        )
+        criterion = st.radio(
+            "Pick k by", options=["elbow", "silhouette"], horizontal=True,
+            format_func=str.capitalize,
+            help="Silhouette is estimated on bounded random samples, so it stays cheap on large files.",
+        )
+        encoding = st.selectbox(
+            "Categorical encoding",
+            options=list(ENCODINGS),
+            help="Label codes put arbitrary distances between categories. Sparse encoding one-hots "
+                 "low-cardinality columns and hashes high-cardinality ones without densifying.",
+        )
+        algorithm = st.selectbox(
+            "KMeans algorithm",
+            options=list(ALGORITHMS),
+            help="Auto picks mini-batch for very large tables and Elkan only where a short trial "
+                 "shows it faster than Lloyd.",
+        )
+        budget = st.number_input(
+            "Time budget (seconds, 0 = none)", min_value=0.0, value=0.0, step=5.0,
+            help="Fewer restarts, smaller samples for choosing k, mini-batch and an iteration cap "
+                 "are applied in that order until the estimated run time fits.",
+        )
+        pca = st.checkbox(
+            "Reduce dimensions with PCA",
+            help="Choose k and fit on the leading principal components instead of every encoded "
+                 "column. Pays off with many correlated features.",
+        )
+        if pca:
+            pca = st.slider(
+                "Explained variance to keep", min_value=0.5, max_value=0.99,
+                value=reduction.VARIANCE_TARGET, step=0.01,
+                help="The fewest components whose explained variance reaches this share are kept.",
+            )
+        warm_start = st.session_state.warm_state is not None and st.checkbox(
+            "Warm-start from the previous run", value=True,
+            help="Start every k from the last run's centroids (after new rows or a feature change) "
+                 "instead of from scratch.",
+        )
 
         if st.button("Cluster"):
             if not features:
                 st.warning("Please select at least one feature.")
             else:
-                clusters, kmeans, X_scaled = cluster_data(df, features)
-                st.session_state.df["Cluster"] = clusters
-                st.session_state.kmeans = kmeans
-                st.session_state.X_scaled = X_scaled
-                show_clusters()
-                st.success("Clustering complete!")
+                cancel_clustering()
+                key = submit_clustering(
+                    df, features, data_hash,
+                    early_stop, SAMPLING_MODES[sampling], criterion, ENCODINGS[encoding],
+                    st.session_state.warm_state if warm_start else None,
+                    ALGORITHMS[algorithm], budget or None, pca or None,
+                )
+                st.session_state.job = {"key": key, "features": features.copy(), "data_hash": data_hash}
+
+        pending = st.session_state.job
+        if pending is not None and pending["data_hash"] != data_hash:
+            cancel_clustering()  # a different file was uploaded meanwhile
+            pending = None
+        if pending is not None:
+            job = job_queue().get(pending["key"])
+            status = job.status if job is not None else None
+            if status in ("queued", "running"):
+                clustering_progress()
+            else:
+                st.session_state.job = None
+                if status == "done":
+                    show_result(job.result(), df, pending["features"], data_hash)
+                elif status == "failed":
+                    try:
+                        job.result()
+                    except ValueError as e:
+                        st.error(str(e))
+                elif status == "cancelled":
+                    st.info("Clustering was cancelled.")
+                else:
+                    st.warning("The clustering job is no longer available; please cluster again.")
+
+        if st.session_state.index is not None:
+            show_clusters()
+
+        with st.expander("🧠 Session memory"):
+            index = st.session_state.index
+            model = st.session_state.model
+            st.dataframe(memory_report({
+                "Uploaded frame": df,
+                "Cluster labels": st.session_state.labels,
+                "Index row order": index.order if index is not None else None,
+                "Index grouped view": index.__dict__.get("grouped") if index is not None else None,
+                "Sorted orderings": dict(st.session_state.view.orderings) if st.session_state.view is not None else None,
+                "Cluster profile": st.session_state.profile,
+                "Centroids": model.centers if model is not None else None,
+                "Encoded profile": st.session_state.encoded_profile,
+            }), hide_index=True)
 
 # ---- PROFILING TAB ----
 with profiling:
-    if st.session_state.df_temp is not None and st.session_state.df is not None:
-        if "Cluster" in st.session_state.df and st.session_state.features == st.session_state.features_temp:
-            X = st.session_state.df.copy()
-            X_encoded = X.copy()
-
-            # Encode all categorical for profiling
-            label_encoders = {}
-            for col in X_encoded.columns:
-                if X_encoded[col].dtype == 'object':
-                    le = LabelEncoder()
-                    X_encoded[col] = le.fit_transform(X_encoded[col])
-                    label_encoders[col] = le
-
-            cluster_summary = X_encoded.groupby("Cluster")[st.session_state.features].mean().round(2)
-            decoded_summary = decode_cluster_means(cluster_summary, label_encoders)
+    if st.session_state.df is not None:
+        if st.session_state.labels is not None and st.session_state.features == st.session_state.features_temp:
+            index = st.session_state.index
+            # Computed once per clustering result, then reused on every rerun
+            if st.session_state.profile is None:
+                with diagnostics.stage("profile", st.session_state.df):
+                    st.session_state.profile = compute_profile(
+                        st.session_state.df, index.labels, st.session_state.features
+                    )
+            profile = st.session_state.profile
+            cluster_summary = profile.summary
 
             st.markdown("📊 Cluster Profiles (Mean Feature Values)")
-            st.dataframe(decoded_summary)
+            st.dataframe(profile.decoded)
 
-            clusters = sorted(X['Cluster'].unique())
-            tabs = st.tabs([f"Cluster {c+1}" for c in clusters])
-            for tab, cluster in zip(tabs, clusters):
+            tabs = st.tabs([f"Cluster {c+1}" for c in index])
+            for tab, cluster in zip(tabs, index):
                 with tab:
-                    cluster_df = X_encoded[X_encoded["Cluster"] == cluster]
                     st.markdown("📈 Cluster Summary Statistics")
-                    st.dataframe(cluster_df.drop(columns=["Cluster"]).describe())
+                    st.dataframe(profile.cluster_stats(cluster))
+                    if profile.modes is not None:
+                        st.markdown("🏷️ Most Common Category")
+                        st.dataframe(profile.modes.loc[[cluster]], hide_index=True)
+
+            if st.session_state.encoded_profile is not None:
+                with st.expander("🧮 Encoded Feature Means (one-hot columns are category shares)"):
+                    st.dataframe(st.session_state.encoded_profile.round(3))
 
             # Feature importance
-            feature_importance = cluster_summary.var().sort_values(ascending=False)
+            feature_importance = profile.importance
             st.markdown("### 🌟 Features Separating Clusters the Most")
             st.dataframe(feature_importance.to_frame("Variance"))
 
@@ -186,34 +506,22 @@ with profiling:
 
 # ---- ANALYZING TAB ----
 with analyzing:
-    if st.session_state.df_temp is not None and st.session_state.df is not None:
-        if "Cluster" in st.session_state.df and st.session_state.features == st.session_state.features_temp:
+    if st.session_state.df is not None:
+        if st.session_state.labels is not None and st.session_state.features == st.session_state.features_temp:
             st.markdown("## 🔍 Cluster Comparison Visualization")
-            X = st.session_state.df.copy()
-            
-            clusters = sorted(X["Cluster"].unique())
-            colors = plt.cm.tab10(np.linspace(0, 1, len(clusters)))
+            index = st.session_state.index
+            st.caption("Switch a feature on to draw it; charts are cached per clustering result.")
 
             for feature in st.session_state.features:
-                st.markdown(f"### Feature: **{feature}**")
-                cols = st.columns(len(clusters))
-
-                for col, cluster, color in zip(cols, clusters, colors):
-                    with col:
-                        cluster_data = X[X["Cluster"] == cluster][feature].dropna()
-                        fig, ax = plt.subplots(figsize=(3.5, 3))
-                        if np.issubdtype(cluster_data.dtype, np.number):
-                            ax.hist(cluster_data, bins=15, color=color, edgecolor='black')
-                            ax.set_ylabel("Count")
-                        else:
-                            counts = cluster_data.value_counts()
-                            ax.bar(counts.index.astype(str), counts.values, color=color)
-                            ax.set_xticks(range(len(counts.index))) 
-                            ax.set_xticklabels(counts.index.astype(str), rotation=45, ha='right')
-                        ax.set_title(f"Cluster {cluster+1}", fontsize=10)
-                        ax.set_xlabel(feature)
-                        plt.tight_layout()
-                        st.pyplot(fig)
+                if st.toggle(f"Feature: **{feature}**", key=f"chart_{feature}"):
+                    st.image(feature_chart(st.session_state.result_key, feature, index))
+
+            st.markdown("## 🗺️ 2-D Projection")
+            st.caption(f"Up to {reduction.POINTS_PER_CLUSTER:,} random rows per cluster on the first two "
+                       f"principal components of the encoded features; X marks the centroids.")
+            if st.toggle("Show projection", key="chart_projection"):
+                st.image(projection_chart(st.session_state.result_key, st.session_state.model,
+                                          index.df, index.labels))
         else:
             st.warning("No clusters found yet. Please run clustering first.")
     else:
@@ -221,18 +529,70 @@ with analyzing:
 
 # ---- DOWNLOAD TAB ----
 with download:
-    if st.session_state.df_temp is not None and st.session_state.df is not None:
-        if "Cluster" in st.session_state.df and st.session_state.features == st.session_state.features_temp:
-            X = st.session_state.df.copy()
-            for cluster in sorted(X['Cluster'].unique()):
-                csv = X[X["Cluster"] == cluster].to_csv(index=False).encode('utf-8')
+    if st.session_state.df is not None:
+        if st.session_state.labels is not None and st.session_state.features == st.session_state.features_temp:
+            index = st.session_state.index
+            fmt = st.radio(
+                "File format", options=list(export.FORMATS), horizontal=True, format_func=str.upper,
+                help="Parquet files are much smaller and faster to load than CSV.",
+            )
+            # Files are only generated when a button is clicked
+            st.download_button(
+                label=f"📦 Download All Clusters as ZIP ({fmt.upper()})",
+                data=partial(export.export_zip, index, fmt),
+                file_name=f"clusters_{fmt}.zip",
+                mime=export.ZIP_MIME,
+                key=f"download_zip_{fmt}"
+            )
+            st.download_button(
+                label=f"📥 Download All Rows with Cluster Column as {fmt.upper()}",
+                data=partial(export.export_all, index, fmt),
+                file_name=export.file_name(None, fmt),
+                mime=export.FORMATS[fmt],
+                key=f"download_all_{fmt}"
+            )
+            for cluster in index:
                 st.download_button(
-                    label=f"📥 Download Cluster {cluster+1} Data as CSV",
-                    data=csv,
-                    file_name=f'cluster_{cluster+1}.csv',
-                    mime='text/csv',
-                    key=f"download_{int(cluster)}"
+                    label=f"📥 Download Cluster {cluster+1} Data as {fmt.upper()}",
+                    data=partial(export.export_cluster, index, cluster, fmt),
+                    file_name=export.file_name(cluster, fmt),
+                    mime=export.FORMATS[fmt],
+                    key=f"download_{int(cluster)}_{fmt}"
                 )
+
+            st.markdown("### 🧩 Model")
+            model = st.session_state.model
+            st.download_button(
+                label="💾 Download fitted model",
+                data=model.to_bytes,
+                file_name="clusterlens_model.npz",
+                mime=MODEL_MIME,
+                help="Encoders, scaler, centroids and feature schema; score new files with "
+                     "`python -m clusterlens score clusterlens_model.npz new.csv -o scored.csv`.",
+            )
+            new_file = st.file_uploader(
+                "Assign clusters to a new file with this model", type=["csv", "parquet"], key="score_upload",
+            )
+            if new_file and st.button("Score file"):
+                # removed as soon as the scored file has been handed to the download button
+                with tempfile.TemporaryDirectory(prefix="clusterlens_") as tmp:
+                    output = Path(tmp) / f"scored.{fmt}"
+                    try:
+                        with st.spinner("Scoring..."):
+                            report = scoring.score_file(model, new_file, output)
+                    except ValueError as e:
+                        st.error(str(e))
+                    else:
+                        st.caption(f"{report.n_rows:,} rows scored in {report.seconds:.2f}s "
+                                   f"({report.rows_per_second:,.0f} rows/s)")
+                        st.dataframe(pd.Series(report.counts, index=[f"Cluster {c+1}" for c in range(model.k)], name="Rows"))
+                        with open(report.output, "rb") as f:
+                            st.download_button(
+                                label=f"📥 Download scored rows as {fmt.upper()}",
+                                data=f,
+                                file_name=f"scored.{fmt}",
+                                mime=export.FORMATS[fmt],
+                            )
         else:
             st.warning("No clusters found yet. Please run clustering first.")
     else:
@@ -253,7 +613,7 @@ with about:
         3. **Profiling and Statistics** → See insights like means, medians, and distributions.  
         4. **Feature Importance** → Identify which features drive clustering.  
         5. **Visualization** → Explore your clusters visually.  
-        6. **Download Results** → Export clustered data for offline use.  
+        6. **Download Results** → Export clustered data as CSV, Parquet or one ZIP of every cluster.  
     """)
     st.header("Why this is useful")
     st.write("""
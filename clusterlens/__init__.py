@@ -0,0 +1,33 @@
+"""ClusterLens engine: the clustering pipeline without the Streamlit UI."""
+from .engine import (
+    ClusterResult,
+    read_table,
+    encode_features,
+    scale_features,
+    fit_kmeans,
+    encode_design,
+    cluster_data,
+    decode_cluster_means,
+    profile_clusters,
+)
+from .stream import StreamResult, iter_chunks, stream_cluster
+from .ksearch import KSearchResult, search_k, pick_elbow
+from .sampling import SamplingReport, draw_sample, select_k
+from .silhouette import SilhouetteReport, sampled_silhouette, silhouette_by_k
+from .cache import ResultCache, cache_key, hash_bytes, hash_frame
+from .ingest import parse_bytes, drop_duplicate_rows, load_bytes, load_upload
+from .index import ClusterIndex
+from .paging import Filter, Page, TableView
+from .profiling import ClusterProfile, compute_profile, decode_means, nearest_code
+from .memory import ArrayStore, compact_frame, memory_report
+from .encoding import SparseEncoder, cluster_means, cluster_stds
+from .warmstart import WarmStart, WarmReport, warm_search
+from .model import ClusterModel
+from .scoring import ScoreReport, nearest_centroid, score_file
+from .planner import Plan, plan_run
+from .jobs import Job, JobCancelled, JobQueue, Progress
+from .assistant import Digest, FakeChatModel, ResponseCache, ask, build_digest
+from .query import QueryError, QueryPlan, QueryResult, Trace, ask_local, execute, parse_plan
+from .bench import BenchReport, Regression, StageResult, compare, make_dataset
+from .diagnostics import Recorder, Span, collect, stage
+from .reduction import Projection, Reduction, ReductionReport, project, reduce
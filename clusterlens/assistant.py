@@ -0,0 +1,263 @@
+"""Dataset assistant: token-budgeted dataset digest, reply cache and streaming.
+
+The model never sees the raw upload. `build_digest` turns the parsed frame
+into a compact text digest, filled section by section in priority order
+until the token budget is spent:
+
+1. shape, then one line per column (dtype, missing values, distinct values);
+2. summary statistics of numeric columns;
+3. the most frequent levels of categorical columns;
+4. per-cluster sizes and means, when a clustering result exists;
+5. a few randomly sampled rows (long cells cut).
+
+Tokens are estimated at CHARS_PER_TOKEN characters each. Replies are
+streamed from any LangChain-style chat model (`.stream(messages)` yielding
+chunks with `.content`; messages are (role, text) tuples) and cached whole
+in a `ResponseCache` keyed by (dataset, normalized query). `FakeChatModel`
+is an offline stand-in with the same interface.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .engine import is_categorical
+
+DIGEST_TOKENS = 1500
+CHARS_PER_TOKEN = 4
+SAMPLE_ROWS = 20
+TOP_LEVELS = 5
+MAX_CELL_CHARS = 40
+CACHE_ENTRIES = 256
+
+SYSTEM_PROMPT = (
+    "You answer questions about a tabular dataset. You are given a digest of it: the schema, summary "
+    "statistics, frequent categories, cluster profiles if the data was clustered, and a small random "
+    "sample of rows (not the full data). Answer only from the digest; if it does not contain the "
+    "answer, say what is missing."
+)
+
+
+@dataclass
+class Digest:
+    """Text context for the model and what went into it."""
+    text: str
+    tokens: int
+    sections: list = field(default_factory=list)
+    # True if any section was cut to fit the budget
+    truncated: bool = False
+
+
+def estimate_tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def normalize_query(query):
+    """Lower-cased, whitespace-collapsed query without trailing punctuation."""
+    return " ".join(str(query).lower().split()).rstrip("?.! ")
+
+
+# ================================
+# ---- DIGEST ----
+# ================================
+def _number(value):
+    """Four significant digits without an exponent (50012.3 -> "50010")."""
+    if not np.isfinite(value):
+        return str(value)
+    return np.format_float_positional(value, precision=4, unique=False, fractional=False, trim="-")
+
+
+def _short(value):
+    text = str(value)
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 1] + "…"
+
+
+def _schema(df):
+    lines = []
+    for col in df.columns:
+        series = df[col]
+        missing = int(series.isna().sum())
+        kind = "categorical" if is_categorical(series) else "numeric"
+        lines.append(f"- {col}: {kind} ({series.dtype}), {series.nunique():,} distinct"
+                     + (f", {missing:,} missing" if missing else ""))
+    return lines
+
+
+def _numeric_stats(df):
+    numeric = [c for c in df.columns if not is_categorical(df[c])]
+    if not numeric:
+        return []
+    stats = df[numeric].describe().T[["mean", "std", "min", "50%", "max"]]
+    stats = stats.rename(columns={"50%": "median"}).map(_number)
+    return stats.to_csv().splitlines()
+
+
+def _levels(df):
+    lines = []
+    for col in df.columns:
+        if not is_categorical(df[col]):
+            continue
+        counts = df[col].astype(str).value_counts()
+        shares = counts / max(len(df), 1)
+        top = ", ".join(f"{_short(level)} ({share:.0%})" for level, share in shares.head(TOP_LEVELS).items())
+        more = f", +{len(counts) - TOP_LEVELS:,} more" if len(counts) > TOP_LEVELS else ""
+        lines.append(f"- {col}: {top}{more}")
+    return lines
+
+
+def _table(frame, index=True):
+    cells = frame.map(lambda v: _number(v) if isinstance(v, (float, np.floating)) else _short(v))
+    return cells.to_csv(index=index).splitlines()
+
+
+def cluster_table(index, columns):
+    """Rows and mean of every numeric column per cluster of a ClusterIndex (clusters numbered from 1)."""
+    numeric = [c for c in columns if not is_categorical(index.df[c])]
+    table = index.means(numeric)
+    table.insert(0, "Rows", index.sizes.to_numpy())
+    table.index = pd.Index([f"Cluster {c + 1}" for c in table.index], name="Cluster")
+    return table
+
+
+def _fit(title, lines, budget):
+    """(section text, tokens, truncated) for as many of `lines` as fit in `budget` tokens."""
+    head = f"## {title}\n"
+    kept, used = [], estimate_tokens(head)
+    for line in lines:
+        cost = estimate_tokens(line + "\n")
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    note = ""
+    # make room for the note saying how much was left out
+    while len(kept) < len(lines) and kept:
+        note = f"... ({len(lines) - len(kept):,} more lines omitted)\n"
+        if used + estimate_tokens(note) <= budget:
+            break
+        used -= estimate_tokens(kept.pop() + "\n")
+    if not kept:
+        return "", 0, bool(lines)
+    text = head + "".join(line + "\n" for line in kept) + (note if len(kept) < len(lines) else "")
+    return text, estimate_tokens(text), len(kept) < len(lines)
+
+
+def build_digest(df, clusters=None, budget=DIGEST_TOKENS, sample_rows=SAMPLE_ROWS, random_state=0):
+    """Digest of `df` (plus an optional per-cluster table) within `budget` tokens; see the module docstring."""
+    header = f"Dataset: {len(df):,} rows x {len(df.columns):,} columns\n"
+    text, used = header, estimate_tokens(header)
+    sections, truncated = [], False
+    n = min(sample_rows, len(df))
+    sample = df.sample(n, random_state=random_state) if n < len(df) else df
+    candidates = [
+        ("Columns", _schema(df)),
+        ("Numeric summary", _numeric_stats(df)),
+        ("Frequent categories", _levels(df)),
+        ("Clusters", _table(clusters) if clusters is not None else []),
+        (f"Random sample of {n} rows", _table(sample, index=False)),
+    ]
+    for title, lines in candidates:
+        if not lines:
+            continue
+        part, cost, cut = _fit(title, lines, budget - used)
+        truncated |= cut
+        if part:
+            text += part
+            used += cost
+            sections.append(title)
+    return Digest(text=text, tokens=used, sections=sections, truncated=truncated)
+
+
+# ================================
+# ---- REPLIES ----
+# ================================
+class ResponseCache:
+    """Finished replies keyed by (dataset key, normalized query), least recently used evicted first."""
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, dataset, query):
+        key = (dataset, normalize_query(query))
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, dataset, query, reply):
+        with self._lock:
+            self._entries[(dataset, normalize_query(query))] = reply
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def build_messages(digest, query):
+    """(role, text) messages for a question about the digested dataset."""
+    return [("system", SYSTEM_PROMPT), ("human", f"Dataset digest:\n{digest.text}\nQuestion: {query}")]
+
+
+def stream_reply(model, messages):
+    """Text chunks of the model's reply as they arrive."""
+    for chunk in model.stream(messages):
+        text = getattr(chunk, "content", chunk)
+        if text:
+            yield text
+
+
+def ask(model, digest, query, cache=None, dataset=None):
+    """Stream the reply to `query`. A cached reply for (dataset, query) comes back as one chunk;
+    a new one is cached once it has been received in full."""
+    if cache is not None:
+        cached = cache.get(dataset, query)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    for text in stream_reply(model, build_messages(digest, query)):
+        parts.append(text)
+        yield text
+    if cache is not None:
+        cache.put(dataset, query, "".join(parts))
+
+
+# ================================
+# ---- OFFLINE MODEL ----
+# ================================
+@dataclass
+class Chunk:
+    content: str
+
+
+class FakeChatModel:
+    """Offline stand-in for a LangChain chat model.
+
+    Replies come from `responses` in turn (by default a note on the prompt
+    size); a callable response is called with the messages. Replies are
+    streamed word by word; `calls` records the messages of every call so
+    prompts can be inspected.
+    """
+
+    def __init__(self, responses=None):
+        self.responses = list(responses or [])
+        self.calls = []
+
+    def _reply(self, messages):
+        self.calls.append(list(messages))
+        if self.responses:
+            reply = self.responses[(len(self.calls) - 1) % len(self.responses)]
+            return reply(messages) if callable(reply) else reply
+        tokens = sum(estimate_tokens(text) for _, text in messages)
+        return f"(offline model) Received {len(messages)} messages, about {tokens:,} tokens."
+
+    def invoke(self, messages):
+        return Chunk(self._reply(messages))
+
+    def stream(self, messages):
+        words = self._reply(messages).split(" ")
+        for i, word in enumerate(words):
+            yield Chunk(word if i == len(words) - 1 else word + " ")
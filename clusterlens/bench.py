@@ -0,0 +1,307 @@
+"""Benchmarks of the pipeline stages on synthetic data, with a baseline comparison.
+
+    python -m clusterlens bench --preset default -o bench.json
+    python -m clusterlens bench --size 1e6x50 --baseline bench.json
+
+Datasets are drawn like `sklearn.datasets.make_blobs` (isotropic Gaussian
+blobs around random centres) but generated in float32 one column at a time,
+so a 1e7 x 200 table fits in memory. About a fifth of the
+columns are categorical: a blob dimension cut into 3..40 quantile levels,
+so categories follow the clusters as real data does.
+
+Each dataset goes through the stages the pages run, in order:
+
+    parse    the upload parser on the table written as CSV (skipped above PARSE_MAX_CELLS)
+    dedupe   drop_duplicate_rows
+    compact  compact_frame
+    cluster  cluster_data (k-search and final fit)
+    profile  compute_profile (Profiling tab)
+    charts   feature_counts + render_feature for one numeric and one categorical column (Analyzing tab)
+    table    first sorted page of the largest cluster (Clustering page)
+    export   export_all as CSV (Download tab)
+
+Wall time is the best of `repeat` plain runs. Peak memory is measured on
+one extra run under tracemalloc (which numpy and pandas report to), as the
+peak above what was allocated when the stage started; allocations made by
+Arrow or BLAS outside Python's allocators are not included. Results are
+written as JSON; `compare` flags stages that got slower or hungrier than a
+saved baseline by more than a relative threshold and an absolute floor.
+"""
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from . import export
+from .charts import feature_counts, render_feature
+from .engine import cluster_data, is_categorical
+from .index import ClusterIndex
+from .ingest import drop_duplicate_rows, parse_bytes
+from .ksearch import MAX_K, RANDOM_STATE
+from .memory import compact_frame
+from .paging import TableView
+from .profiling import compute_profile
+
+STAGES = ("parse", "dedupe", "compact", "cluster", "profile", "charts", "table", "export")
+PRESETS = {
+    "smoke": ((1_000, 5), (10_000, 20)),
+    "default": ((1_000, 5), (10_000, 20), (100_000, 20), (100_000, 100), (1_000_000, 20)),
+    "full": tuple((rows, features) for rows in (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+                  for features in (5, 50, 200)),
+}
+CENTERS = 5
+CATEGORICAL_SHARE = 0.2
+PARSE_MAX_CELLS = 50_000_000
+# a stage regresses when it is this much slower (or larger) than the baseline ...
+THRESHOLD = 0.25
+# ... and the difference is above these floors, so noise on tiny stages is ignored
+MIN_SECONDS = 0.05
+MIN_MB = 1.0
+FORMAT_VERSION = 1
+
+
+@dataclass
+class StageResult:
+    dataset: str
+    stage: str
+    rows: int
+    features: int
+    seconds: float = None
+    peak_mb: float = None
+    detail: str = ""
+    skipped: str = None
+
+
+@dataclass
+class Regression:
+    dataset: str
+    stage: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self):
+        return self.current / self.baseline if self.baseline else float("inf")
+
+
+@dataclass
+class BenchReport:
+    results: list
+    machine: dict = field(default_factory=dict)
+    config: dict = field(default_factory=dict)
+    created: str = None
+
+    def to_json(self):
+        return json.dumps({"version": FORMAT_VERSION, "created": self.created, "machine": self.machine,
+                           "config": self.config, "results": [asdict(r) for r in self.results]}, indent=2)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported benchmark format {data.get('version')!r}")
+        return cls(results=[StageResult(**r) for r in data["results"]], machine=data.get("machine", {}),
+                   config=data.get("config", {}), created=data.get("created"))
+
+
+def parse_size(text):
+    """(rows, features) from "ROWSxFEATURES", e.g. "1e6x50"."""
+    try:
+        rows, features = text.lower().split("x")
+        return int(float(rows)), int(float(features))
+    except ValueError:
+        raise ValueError(f"Size {text!r} is not ROWSxFEATURES (e.g. 1e6x50)") from None
+
+
+def machine_info():
+    import sklearn
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__, "sklearn": sklearn.__version__}
+
+
+# ================================
+# ---- DATA ----
+# ================================
+def make_dataset(rows, features, centers=CENTERS, categorical_share=CATEGORICAL_SHARE,
+                 random_state=RANDOM_STATE):
+    """(frame, true labels): blobs around `centers` random centres, some columns cut into categories."""
+    rng = np.random.default_rng(random_state)
+    labels = rng.integers(0, centers, size=rows)
+    n_categorical = int(round(features * categorical_share)) if features > 1 else 0
+    columns = {}
+    for j in range(features):
+        centre = rng.uniform(-10, 10, size=centers).astype(np.float32)
+        values = centre[labels] + rng.standard_normal(rows, dtype=np.float32)
+        if j < features - n_categorical:
+            columns[f"x{j}"] = values
+            continue
+        levels = int(rng.integers(3, 41))
+        edges = np.quantile(values, np.linspace(0, 1, levels + 1)[1:-1])
+        codes = np.searchsorted(edges, values)
+        names = np.array([f"c{j}_{level}" for level in range(levels)], dtype=object)
+        columns[f"cat{j}"] = pd.Categorical.from_codes(codes, categories=names)
+    return pd.DataFrame(columns), labels
+
+
+# ================================
+# ---- MEASUREMENT ----
+# ================================
+def measure(fn, repeat=1, memory=True):
+    """(output of the first run, best seconds over `repeat` runs, peak MB of one traced run or None)."""
+    out, best = None, None
+    for i in range(max(1, repeat)):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        out = result if i == 0 else out
+        best = seconds if best is None else min(best, seconds)
+        del result
+    peak = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            base = tracemalloc.get_traced_memory()[0]
+            fn()
+            peak = (tracemalloc.get_traced_memory()[1] - base) / 2**20
+        finally:
+            tracemalloc.stop()
+    return out, best, peak
+
+
+def _warm_up():
+    """One tiny run of the pipeline so imports and first-call costs stay out of the first dataset."""
+    df, _ = make_dataset(500, 3, categorical_share=0.34)
+    result = cluster_data(df, list(df.columns), max_k=3)
+    _charts(ClusterIndex(df, result.labels), list(df.columns))
+
+
+def _profile_frame(df, labels):
+    return compute_profile(df, labels, list(df.columns))
+
+
+def _charts(index, features):
+    numeric = [c for c in features if not is_categorical(index.df[c])][:1]
+    categorical = [c for c in features if is_categorical(index.df[c])][:1]
+    return [render_feature(feature_counts(index.df[c], index.labels, index.clusters, c))
+            for c in numeric + categorical]
+
+
+def _table(index, features):
+    view = TableView(index)
+    cluster = int(np.argmax(index.sizes.to_numpy()))
+    sort = next((c for c in features if not is_categorical(index.df[c])), None)
+    return view.page(cluster, 0, sort=sort, ascending=False)
+
+
+def _export(index):
+    return len(export.export_all(index, "csv"))
+
+
+def run_dataset(rows, features, stages=STAGES, repeat=1, memory=True, max_k=MAX_K,
+                random_state=RANDOM_STATE, log=None):
+    """StageResults of every stage in `stages` on one synthetic dataset."""
+    name = f"{rows}x{features}"
+    df, labels = make_dataset(rows, features, random_state=random_state)
+    columns = list(df.columns)
+    results = []
+
+    def record(stage, fn, detail=None):
+        """Output of `fn` timed as `stage`, or None if the stage is not selected."""
+        if stage not in stages:
+            return None
+        result = StageResult(name, stage, len(df), len(columns))
+        out, result.seconds, result.peak_mb = measure(fn, repeat, memory)
+        result.detail = detail(out) if detail else ""
+        results.append(result)
+        if log is not None:
+            log(result)
+        return out
+
+    if "parse" in stages:
+        if rows * features > PARSE_MAX_CELLS:
+            results.append(StageResult(name, "parse", rows, features,
+                                       skipped=f"more than {PARSE_MAX_CELLS:,} cells"))
+        else:
+            data = df.to_csv(index=False).encode()
+            record("parse", lambda: parse_bytes(data, "bench.csv"), lambda out: f"{len(data) / 2**20:,.2f} MB CSV")
+            del data
+    deduped = record("dedupe", lambda: drop_duplicate_rows(df), lambda out: f"{len(out):,} rows kept")
+    df = deduped if deduped is not None else df
+    compacted = record("compact", lambda: compact_frame(df))
+    df = compacted if compacted is not None else df
+    result = record("cluster", lambda: cluster_data(df, columns, max_k=max_k, random_state=random_state),
+                    lambda out: f"k={out.k}" + (f"; {out.plan.describe()}" if out.plan is not None else ""))
+    if result is not None:
+        labels = result.labels
+    record("profile", lambda: _profile_frame(df, labels))
+    index = ClusterIndex(df, labels)
+    record("charts", lambda: _charts(index, columns), lambda out: f"{len(out)} figures")
+    record("table", lambda: _table(index, columns), lambda out: f"{out.total:,} rows in the cluster")
+    record("export", lambda: _export(index), lambda out: f"{out / 2**20:,.2f} MB CSV")
+    return results
+
+
+def run(sizes, stages=STAGES, repeat=1, memory=True, max_k=MAX_K, random_state=RANDOM_STATE, log=None):
+    """BenchReport over every (rows, features) in `sizes`."""
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stage(s) {sorted(unknown)}; expected some of {STAGES}.")
+    _warm_up()
+    results = []
+    for rows, features in sizes:
+        results += run_dataset(rows, features, stages, repeat, memory, max_k, random_state, log)
+    config = {"sizes": [list(s) for s in sizes], "stages": list(stages), "repeat": repeat, "memory": memory,
+              "max_k": max_k, "random_state": random_state}
+    return BenchReport(results=results, machine=machine_info(), config=config,
+                       created=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+
+
+# ================================
+# ---- COMPARISON ----
+# ================================
+def compare(current, baseline, threshold=THRESHOLD, min_seconds=MIN_SECONDS, min_mb=MIN_MB):
+    """Regressions of `current` against `baseline` (BenchReports), matched by (dataset, stage)."""
+    before = {(r.dataset, r.stage): r for r in baseline.results if r.skipped is None}
+    regressions = []
+    for r in current.results:
+        old = before.get((r.dataset, r.stage))
+        if old is None or r.skipped is not None:
+            continue
+        for metric, floor in (("seconds", min_seconds), ("peak_mb", min_mb)):
+            now, then = getattr(r, metric), getattr(old, metric)
+            if now is None or then is None:
+                continue
+            if now > then * (1 + threshold) and now - then > floor:
+                regressions.append(Regression(r.dataset, r.stage, metric, then, now))
+    return regressions
+
+
+def format_results(results):
+    lines = [f"{'dataset':>14} {'stage':<8} {'seconds':>9} {'peak MB':>9}  detail"]
+    for r in results:
+        if r.skipped is not None:
+            lines.append(f"{r.dataset:>14} {r.stage:<8} {'-':>9} {'-':>9}  skipped: {r.skipped}")
+            continue
+        peak = f"{r.peak_mb:9.1f}" if r.peak_mb is not None else f"{'-':>9}"
+        lines.append(f"{r.dataset:>14} {r.stage:<8} {r.seconds:9.3f} {peak}  {r.detail}")
+    return "\n".join(lines)
+
+
+def format_regressions(regressions):
+    return "\n".join(f"REGRESSION {g.dataset} {g.stage} {g.metric}: {g.baseline:.3f} -> {g.current:.3f} "
+                     f"({g.ratio:.2f}x)" for g in regressions)
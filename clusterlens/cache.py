@@ -0,0 +1,230 @@
+"""Persistent, content-addressed cache of clustering results.
+
+Entries are keyed by a hash of the input data plus the feature list and
+every parameter that affects the result, and are stored one per file as a
+compressed .npz (no pickle): labels in the smallest integer type that fits,
+centroids, scaler statistics, encoder classes, the centroids of every
+fitted k (for warm starts) and a JSON metadata record.
+The directory is shared by every session and process and survives
+restarts; the least recently used entries are evicted once it grows past
+`max_bytes`.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import warnings
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.preprocessing import StandardScaler, LabelEncoder
+
+from .encoding import classes_from_arrays, classes_to_arrays
+
+CACHE_DIR = Path(os.environ.get("CLUSTERLENS_CACHE_DIR", Path.home() / ".cache" / "clusterlens"))
+MAX_BYTES = 1 << 30
+
+
+# ================================
+# ---- KEYS ----
+# ================================
+def hash_bytes(data):
+    """Fast content hash of raw uploaded bytes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_frame(df):
+    """Content hash of a DataFrame via pandas' vectorized row hashes."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def cache_key(data_hash, features, **params):
+    """Key for one run: data hash + ordered feature list + algorithm parameters."""
+    payload = json.dumps({"data": data_hash, "features": list(features), "params": params},
+                         sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+# ================================
+# ---- (DE)SERIALIZATION ----
+# ================================
+def _restore_kmeans(centers, labels, inertia, n_iter):
+    """Rebuild a fitted KMeans from its stored arrays so predict() works.
+
+    The estimator is fitted through the public API on the centroids themselves
+    (one iteration from init=centers, which leaves them in place), then the
+    stored labels and statistics of the original fit are put back.
+    """
+    centers = np.ascontiguousarray(centers)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", ConvergenceWarning)
+        kmeans = KMeans(n_clusters=len(centers), init=centers, n_init=1, max_iter=1).fit(centers)
+    # duplicate centroids would be relocated as empty clusters; keep the stored ones
+    kmeans.cluster_centers_ = centers
+    kmeans.labels_ = labels
+    kmeans.inertia_ = inertia
+    kmeans.n_iter_ = n_iter
+    return kmeans
+
+
+def _pack(result):
+    """ClusterResult -> dict of arrays for np.savez."""
+    k = int(result.k)
+    arrays = {
+        "labels": result.labels.astype(np.min_scalar_type(max(k - 1, 0))),
+        "centers": result.kmeans.cluster_centers_,
+    }
+    # sparse-encoded results keep their scaler inside the encoder, refitted on a hit
+    if result.encoder is None:
+        arrays["scaler_mean"] = result.scaler.mean_
+        arrays["scaler_scale"] = result.scaler.scale_
+        arrays["scaler_var"] = result.scaler.var_
+    for i, (col, le) in enumerate(result.label_encoders.items()):
+        arrays[f"classes_{i}"], arrays[f"classes_missing_{i}"] = classes_to_arrays(le.classes_)
+    warm = result.warm_state
+    if warm is not None:
+        arrays.update((f"warm_centers_{k}", c) for k, c in warm.centers.items())
+    meta = {
+        "k": k,
+        "ks": [int(x) for x in result.ks],
+        "wcss": [float(x) for x in result.wcss],
+        "features": list(result.features),
+        "columns": list(result.columns),
+        "encoded": list(result.label_encoders),
+        "inertia": float(result.kmeans.inertia_),
+        "n_iter": int(getattr(result.kmeans, "n_iter_", 0)),
+        "n_samples_seen": int(result.scaler.n_samples_seen_) if result.encoder is None else None,
+        "sampling": asdict(result.sampling) if result.sampling is not None else None,
+        "silhouette": asdict(result.silhouette) if result.silhouette is not None else None,
+        "plan": asdict(result.plan) if result.plan is not None else None,
+        "reduction": asdict(result.reduction) if result.reduction is not None else None,
+        "warm": None if warm is None else {
+            "n_rows": int(warm.n_rows), "classes": warm.classes,
+            "cold_iterations": {str(k): int(v) for k, v in warm.cold_iterations.items()},
+            "cold_seconds": {str(k): float(v) for k, v in warm.cold_seconds.items()},
+        },
+    }
+    arrays["meta"] = np.array(json.dumps(meta, default=float))
+    return arrays
+
+
+def _unpack(data, X_scaled):
+    """np.load() contents -> ClusterResult (X_scaled is recomputed by the caller)."""
+    from .engine import ClusterResult
+    from .sampling import SamplingReport
+    from .silhouette import SilhouetteReport
+    from .planner import Plan
+    from .reduction import ReductionReport
+    from .warmstart import WarmStart
+
+    meta = json.loads(str(data["meta"]))
+    labels = data["labels"].astype(np.int32)
+    scaler = None
+    if "scaler_mean" in data:
+        scaler = StandardScaler()
+        scaler.mean_, scaler.scale_, scaler.var_ = data["scaler_mean"], data["scaler_scale"], data["scaler_var"]
+        scaler.n_samples_seen_ = meta["n_samples_seen"]
+        scaler.n_features_in_ = len(scaler.mean_)
+    label_encoders = {}
+    for i, col in enumerate(meta["encoded"]):
+        le = LabelEncoder()
+        le.classes_ = classes_from_arrays(data[f"classes_{i}"], data.get(f"classes_missing_{i}"))
+        label_encoders[col] = le
+
+    sampling = silhouette = None
+    if meta["sampling"] is not None:
+        sampling = SamplingReport(**meta["sampling"])
+        sampling.spot_check = {int(k): v for k, v in sampling.spot_check.items()}
+    if meta["silhouette"] is not None:
+        silhouette = SilhouetteReport(**meta["silhouette"])
+        silhouette.scores = {int(k): v for k, v in silhouette.scores.items()}
+        silhouette.spread = {int(k): v for k, v in silhouette.spread.items()}
+    warm_state = None
+    if meta.get("warm") is not None:
+        warm = meta["warm"]
+        warm_state = WarmStart(
+            features=meta["features"], columns=meta["columns"], n_rows=warm["n_rows"],
+            centers={int(name.rsplit("_", 1)[1]): data[name] for name in data.files
+                     if name.startswith("warm_centers_")},
+            classes=warm["classes"],
+            cold_iterations={int(k): v for k, v in warm["cold_iterations"].items()},
+            cold_seconds={int(k): v for k, v in warm["cold_seconds"].items()},
+        )
+
+    return ClusterResult(
+        labels=labels,
+        kmeans=_restore_kmeans(data["centers"], labels, meta["inertia"], meta["n_iter"]),
+        X_scaled=X_scaled, k=meta["k"], ks=meta["ks"], wcss=meta["wcss"],
+        features=meta["features"], columns=meta["columns"], scaler=scaler,
+        label_encoders=label_encoders, sampling=sampling, silhouette=silhouette,
+        warm_state=warm_state, plan=Plan(**meta["plan"]) if meta.get("plan") else None,
+        reduction=ReductionReport(**meta["reduction"]) if meta.get("reduction") else None,
+    )
+
+
+# ================================
+# ---- CACHE ----
+# ================================
+class ResultCache:
+    """Directory of `<key>.npz` entries with size-bounded LRU eviction."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.directory / f"{key}.npz"
+
+    def get(self, key, X_scaled=None):
+        """Cached ClusterResult for `key`, or None. A hit refreshes the entry's LRU time."""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                result = _unpack(data, X_scaled)
+        except (FileNotFoundError, OSError, KeyError, ValueError):
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        """Store `result` atomically, then evict down to `max_bytes`."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **_pack(result))
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the directory fits in `max_bytes`."""
+        entries = []
+        for path in self.directory.glob("*.npz"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def size(self):
+        return sum(p.stat().st_size for p in self.directory.glob("*.npz"))
+
+    def clear(self):
+        for path in self.directory.glob("*.npz"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,127 @@
+"""Per-feature cluster comparison charts for the Analyzing tab.
+
+Histogram and bar counts for one feature are computed for all clusters at
+once with a single bincount over (cluster, bin) pairs, and drawn as one
+faceted figure. Figures are built with the object-oriented Figure API
+rather than pyplot, so nothing is kept in pyplot's global registry and
+memory stays flat across reruns; the caller gets PNG bytes it can cache.
+`render_projection` draws the sampled 2-D projection of all clusters.
+"""
+import io
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from matplotlib import colormaps
+from matplotlib.figure import Figure
+
+BINS = 15
+FACETS_PER_ROW = 4
+
+
+@dataclass
+class FeatureCounts:
+    """Counts of one feature for every cluster."""
+    feature: str
+    clusters: np.ndarray
+    numeric: bool
+    counts: np.ndarray
+    # numeric: per-cluster bin edges, shape (clusters, bins + 1)
+    edges: np.ndarray = None
+    # categorical: the category label of each count column
+    categories: np.ndarray = None
+
+
+def feature_counts(values, labels, clusters, feature, bins=BINS):
+    """Histogram (numeric) or value counts (categorical) of `values` per cluster.
+
+    Numeric bins span each cluster's own min..max, like one `ax.hist`
+    call per cluster would, but every cluster is binned in the same pass.
+    """
+    values = pd.Series(values).reset_index(drop=True)
+    labels = np.asarray(labels)
+    valid = values.notna().to_numpy()
+    inverse = np.searchsorted(clusters, labels[valid])
+    k = len(clusters)
+
+    if pd.api.types.is_numeric_dtype(values):
+        v = values.to_numpy(dtype="float64")[valid]
+        lo = np.full(k, np.nan)
+        hi = np.full(k, np.nan)
+        grouped = pd.Series(v).groupby(inverse)
+        lo[grouped.min().index] = grouped.min().to_numpy()
+        hi[grouped.max().index] = grouped.max().to_numpy()
+        flat = lo == hi
+        lo[flat] -= 0.5
+        hi[flat] += 0.5
+        lo, hi = np.nan_to_num(lo), np.nan_to_num(hi, nan=1.0)
+        width = (hi - lo) / bins
+        b = np.clip(((v - lo[inverse]) / width[inverse]).astype(np.int64), 0, bins - 1)
+        counts = np.bincount(inverse * bins + b, minlength=k * bins).reshape(k, bins)
+        edges = lo[:, None] + width[:, None] * np.arange(bins + 1)
+        return FeatureCounts(feature, clusters, True, counts, edges=edges)
+
+    codes, categories = pd.factorize(values[valid].astype(str))
+    n = len(categories)
+    counts = np.bincount(inverse * n + codes, minlength=k * n).reshape(k, n)
+    return FeatureCounts(feature, clusters, False, counts, categories=np.asarray(categories, dtype=object))
+
+
+def render_feature(fc, dpi=100):
+    """Draw one faceted figure (a panel per cluster) and return it as PNG bytes."""
+    k = len(fc.clusters)
+    ncols = min(k, FACETS_PER_ROW)
+    nrows = math.ceil(k / ncols)
+    fig = Figure(figsize=(3.5 * ncols, 3 * nrows), dpi=dpi)
+    axes = fig.subplots(nrows, ncols, squeeze=False).ravel()
+    colors = colormaps["tab10"](np.linspace(0, 1, k))
+
+    for i, (ax, cluster, color) in enumerate(zip(axes, fc.clusters, colors)):
+        if fc.numeric:
+            edges = fc.edges[i]
+            ax.bar(edges[:-1], fc.counts[i], width=np.diff(edges), align="edge",
+                   color=color, edgecolor="black")
+            ax.set_ylabel("Count")
+        else:
+            order = np.argsort(-fc.counts[i], kind="stable")
+            order = order[fc.counts[i][order] > 0]
+            names = fc.categories[order].astype(str)
+            ax.bar(range(len(order)), fc.counts[i][order], color=color)
+            ax.set_xticks(range(len(order)))
+            ax.set_xticklabels(names, rotation=45, ha="right")
+        ax.set_title(f"Cluster {cluster + 1}", fontsize=10)
+        ax.set_xlabel(fc.feature)
+    for ax in axes[k:]:
+        ax.set_visible(False)
+
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    fig.clear()
+    return buf.getvalue()
+
+
+def render_projection(projection, dpi=100):
+    """Scatter of a `reduction.Projection` (points coloured by cluster, centroids marked) as PNG bytes."""
+    clusters = np.unique(projection.labels)
+    colors = colormaps["tab10"](np.linspace(0, 1, max(len(clusters), 1)))
+    fig = Figure(figsize=(7, 5.5), dpi=dpi)
+    ax = fig.subplots()
+    for cluster, color in zip(clusters, colors):
+        points = projection.points[projection.labels == cluster]
+        ax.scatter(points[:, 0], points[:, 1], s=6, alpha=0.5, color=color, linewidths=0,
+                   label=f"Cluster {cluster + 1}", rasterized=True)
+    ax.scatter(projection.centers[:, 0], projection.centers[:, 1], s=120, marker="X", color="black",
+               edgecolor="white", label="Centroids")
+    explained = list(projection.explained) + [0.0] * (2 - len(projection.explained))
+    ax.set_xlabel(f"PC 1 ({explained[0]:.0%} of variance)")
+    ax.set_ylabel(f"PC 2 ({explained[1]:.0%} of variance)")
+    legend = ax.legend(loc="best", fontsize=8)
+    for handle in legend.legend_handles[:-1]:
+        handle.set_sizes([30])  # cluster dots are drawn tiny; keep them visible in the legend
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png")
+    fig.clear()
+    return buf.getvalue()
@@ -0,0 +1,229 @@
+"""Command-line entry point: cluster a CSV, Parquet or Feather file and write results to disk.
+
+    python -m clusterlens data.csv --features age income city --out-dir results/
+    python -m clusterlens score results/model.npz new.csv -o scored.csv
+    python -m clusterlens bench --preset default -o bench.json --baseline old.json
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from . import bench
+from .cache import ResultCache, hash_bytes
+from .encoding import HIGH_CARDINALITY, ONEHOT_MAX_LEVELS
+from .model import ClusterModel
+from .planner import ALGORITHMS
+from .scoring import score_file
+from .warmstart import WarmStart
+from .engine import ENCODINGS, MAX_K, RANDOM_STATE, read_table, cluster_data, profile_clusters
+from .sampling import SAMPLE_SIZE, METHODS
+from .stream import CHUNKSIZE, iter_chunks, stream_cluster
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="clusterlens", description="Cluster a CSV or Parquet file.")
+    parser.add_argument("input", help="Path to a .csv, .parquet or .feather file")
+    parser.add_argument("-f", "--features", nargs="+", help="Columns to cluster on (default: all)")
+    parser.add_argument("-o", "--out-dir", default=".", help="Directory for labels and profiles")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output format")
+    parser.add_argument("--max-k", type=int, default=MAX_K, help="Largest k tried in the elbow search")
+    parser.add_argument("--random-state", type=int, default=RANDOM_STATE)
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Worker processes for the elbow search (default: all cores on large inputs)")
+    parser.add_argument("--early-stop", action="store_true",
+                        help="Stop the elbow search once the inertia curve has clearly bent")
+    parser.add_argument("--sample", choices=["auto", "on", "off"], default="auto",
+                        help="Choose k on a sample (auto: only for large inputs)")
+    parser.add_argument("--sample-size", type=int, default=SAMPLE_SIZE, help="Rows per k-selection sample")
+    parser.add_argument("--sample-method", choices=METHODS, default="stratified")
+    parser.add_argument("--criterion", choices=["elbow", "silhouette"], default="elbow",
+                        help="Pick k by the inertia elbow or by the best sampled silhouette")
+    parser.add_argument("--encoding", choices=ENCODINGS, default="ordinal",
+                        help="Categorical columns as label codes or as a sparse one-hot/hashed matrix")
+    parser.add_argument("--max-levels", type=int, default=ONEHOT_MAX_LEVELS,
+                        help="With --encoding sparse: one-hot columns with at most this many levels")
+    parser.add_argument("--high-cardinality", choices=HIGH_CARDINALITY, default="hash",
+                        help="With --encoding sparse: encoding for columns above --max-levels")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="auto",
+                        help="KMeans variant (auto: chosen by table size and a short trial fit)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Wall-clock budget in seconds; restarts, sampling and iterations are cut to fit it")
+    parser.add_argument("--pca", type=float, default=None, metavar="TARGET",
+                        help="Choose k and fit on the principal components explaining this share of the "
+                             "variance (e.g. 0.9)")
+    parser.add_argument("--warm-state", default=None,
+                        help="Warm-start from this .npz (if it exists) and write the new state back to it")
+    parser.add_argument("--save-model", default=None,
+                        help="Also write the fitted model (encoders, scaler, centroids) to this .npz")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Reuse/store results in this result-cache directory")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read the input in chunks so memory stays bounded (CSV output only)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="Rows per chunk in --stream mode")
+    return parser
+
+
+def build_score_parser():
+    parser = argparse.ArgumentParser(prog="clusterlens score",
+                                     description="Assign clusters to a CSV or Parquet file with a saved model.")
+    parser.add_argument("model", help="Model .npz written with --save-model or from the Download tab")
+    parser.add_argument("input", help="Path to a .csv, .parquet or .feather file")
+    parser.add_argument("-o", "--output", required=True,
+                        help="Output file; Parquet for a .parquet suffix, CSV otherwise")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE, help="Rows per chunk")
+    return parser
+
+
+def run_score(argv):
+    args = build_score_parser().parse_args(argv)
+    model = ClusterModel.load(args.model)
+    try:
+        report = score_file(model, args.input, args.output, chunksize=args.chunksize, n_jobs=args.jobs)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"{report.n_rows} rows scored in {report.seconds:.2f}s ({report.rows_per_second:,.0f} rows/s); "
+          f"written to {report.output}")
+    return 0
+
+
+def build_bench_parser():
+    parser = argparse.ArgumentParser(prog="clusterlens bench",
+                                     description="Time every pipeline stage on synthetic datasets.")
+    parser.add_argument("--preset", choices=sorted(bench.PRESETS), default="default",
+                        help="Dataset sizes to run (ignored when --size is given)")
+    parser.add_argument("--size", action="append", default=None, metavar="ROWSxFEATURES",
+                        help="Dataset size such as 1e6x50; may be repeated")
+    parser.add_argument("--stages", nargs="+", choices=bench.STAGES, default=list(bench.STAGES))
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per stage; the best is kept")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the extra traced run that measures peak memory")
+    parser.add_argument("--max-k", type=int, default=MAX_K)
+    parser.add_argument("--random-state", type=int, default=RANDOM_STATE)
+    parser.add_argument("-o", "--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="Compare with this JSON file and exit with status 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=bench.THRESHOLD,
+                        help="Relative slowdown (or memory growth) counted as a regression")
+    return parser
+
+
+def run_bench(argv):
+    args = build_bench_parser().parse_args(argv)
+    try:
+        sizes = [bench.parse_size(s) for s in args.size] if args.size else list(bench.PRESETS[args.preset])
+    except ValueError as e:
+        raise SystemExit(str(e))
+    baseline = bench.BenchReport.load(args.baseline) if args.baseline else None
+    print(bench.format_results([]))
+    report = bench.run(sizes, args.stages, repeat=args.repeat, memory=not args.no_memory, max_k=args.max_k,
+                       random_state=args.random_state,
+                       log=lambda r: print(bench.format_results([r]).splitlines()[1], flush=True))
+    if args.output:
+        report.save(args.output)
+        print(f"results written to {args.output}")
+    if baseline is None:
+        return 0
+    regressions = bench.compare(report, baseline, threshold=args.threshold)
+    if regressions:
+        print(bench.format_regressions(regressions))
+        return 1
+    print(f"no regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+def run_stream(args):
+    if args.format == "parquet":
+        raise SystemExit("--stream writes labels as CSV; --format parquet is not supported with it")
+    columns = list(next(iter_chunks(args.input, chunksize=1)).columns)
+    features = args.features or columns
+    missing = [f for f in features if f not in columns]
+    if missing:
+        raise SystemExit(f"Unknown feature(s): {', '.join(missing)}")
+
+    out_dir = Path(args.out_dir)
+    result = stream_cluster(
+        args.input, features, out_dir / "labels.csv", chunksize=args.chunksize,
+        max_k=args.max_k, random_state=args.random_state,
+    )
+    result.profiles.to_csv(out_dir / "profiles.csv")
+    if args.save_model:
+        ClusterModel.from_stream(result).save(args.save_model)
+    print(f"{result.n_rows} rows -> {result.k} clusters; results written to {out_dir}")
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["score"]:
+        return run_score(argv[1:])
+    if argv[:1] == ["bench"]:
+        return run_bench(argv[1:])
+    args = build_parser().parse_args(argv)
+    if args.stream:
+        return run_stream(args)
+    df = read_table(args.input)
+    features = args.features or list(df.columns)
+    missing = [f for f in features if f not in df.columns]
+    if missing:
+        raise SystemExit(f"Unknown feature(s): {', '.join(missing)}")
+
+    cache = data_hash = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir)
+        data_hash = hash_bytes(Path(args.input).read_bytes())
+    warm_start = None
+    if args.warm_state and Path(args.warm_state).exists():
+        warm_start = WarmStart.load(args.warm_state)
+    try:
+        result = cluster_data(df, features, max_k=args.max_k, random_state=args.random_state,
+                              n_jobs=args.jobs, early_stop=args.early_stop,
+                              sampling={"auto": "auto", "on": True, "off": False}[args.sample],
+                              sample_size=args.sample_size, sample_method=args.sample_method,
+                              criterion=args.criterion, cache=cache, data_hash=data_hash,
+                              encoding=args.encoding, max_levels=args.max_levels,
+                              high_cardinality=args.high_cardinality, warm_start=warm_start,
+                              algorithm=args.algorithm, budget=args.budget, pca=args.pca)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    _, profiles = profile_clusters(df, result.labels, features)
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    labelled = df.assign(Cluster=result.labels)
+    if args.format == "parquet":
+        labelled.to_parquet(out_dir / "labels.parquet", index=False)
+        profiles.to_parquet(out_dir / "profiles.parquet")
+    else:
+        labelled.to_csv(out_dir / "labels.csv", index=False)
+        profiles.to_csv(out_dir / "profiles.csv")
+    print(f"{len(df)} rows -> {result.k} clusters; results written to {out_dir}")
+    if result.plan is not None:
+        plan = result.plan
+        print(f"plan: {plan.describe()} (estimated {plan.estimated_seconds:.2f}s, took {plan.seconds:.2f}s)")
+        for reason in plan.reasons:
+            print(f"  - {reason}")
+    if result.reduction is not None:
+        reduced = result.reduction
+        print(f"pca: {reduced.n_components} of {reduced.n_features} dimensions, {reduced.variance:.1%} of the "
+              f"variance ({reduced.solver} on {reduced.fit_rows} rows, {reduced.seconds:.2f}s)")
+        if reduced.agreement is not None:
+            print(f"  one fit on {reduced.compare_rows} rows: {reduced.full_seconds:.3f}s full vs "
+                  f"{reduced.reduced_seconds:.3f}s reduced ({reduced.speedup:.1f}x), "
+                  f"adjusted Rand agreement {reduced.agreement:.3f}")
+    if result.silhouette is not None:
+        scores = ", ".join(f"k={k}: {s:.3f}" for k, s in result.silhouette.scores.items())
+        print(f"silhouette ({result.silhouette.seconds:.2f}s): {scores}")
+    if result.sampling is not None:
+        report = result.sampling
+        print(f"k chosen on {report.sample_size} rows ({report.method}), votes {report.votes}, "
+              f"max inertia deviation {report.max_deviation:.1%}")
+    if result.warm is not None:
+        warm = result.warm
+        print(f"warm start ({warm.mode}): reused k={warm.reused}, refined k={warm.refitted}, "
+              f"cold k={warm.cold}; saved {warm.saved_iterations} iterations, {warm.saved_seconds:.2f}s")
+    if args.save_model:
+        ClusterModel.from_result(result).save(args.save_model)
+    if args.warm_state and result.warm_state is not None:
+        result.warm_state.save(args.warm_state)
+    return 0
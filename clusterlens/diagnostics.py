@@ -0,0 +1,222 @@
+"""Per-stage timing and memory spans, with JSON-lines and Chrome-trace export.
+
+Library code marks its stages with `stage(name, data)`; a stage costs two
+clock reads and two RSS reads (/proc/self/statm) and is recorded into
+every sink that is active in the current context:
+
+- `Recorder`, a bounded per-session log the pages activate with
+  `activate(recorder)` at the start of each script run;
+- `collect()`, a plain list for one call: `cluster_data` collects its own
+  stages into `ClusterResult.timings`, so stages that ran in a background
+  worker process come back with the result and can be added to the
+  session's recorder.
+
+Each span holds the duration, the RSS after the stage and its change, the
+rows and columns of the stage's data, and the process and thread it ran
+in. With CLUSTERLENS_TRACEMALLOC=1, tracemalloc runs from import time and
+spans also hold the peak of Python-allocated memory (numpy and pandas
+included) above the level at the start of the stage; tracing slows
+allocation-heavy code, so it is off by default.
+
+`to_json_lines` gives one JSON object per span for log pipelines;
+`to_chrome_trace` gives a file for chrome://tracing or Perfetto, with
+worker processes on their own tracks.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+MAX_SPANS = 2000
+TRACE_MEMORY = os.environ.get("CLUSTERLENS_TRACEMALLOC") == "1"
+if TRACE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+_PAGE_BYTES = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_sinks = contextvars.ContextVar("clusterlens_diagnostics", default=())
+# per thread: [traced bytes at the start, highest peak seen] of every open stage
+_open = threading.local()
+
+
+def rss_mb():
+    """Resident set size of this process in MB, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_BYTES / 2**20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def shape(data):
+    """(rows, columns) of a frame, array or sparse matrix; (len, None) for other sized objects."""
+    dims = getattr(data, "shape", None)
+    if dims is not None and len(dims) >= 1:
+        return int(dims[0]), int(dims[1]) if len(dims) > 1 else None
+    try:
+        return len(data), None
+    except TypeError:
+        return None, None
+
+
+@dataclass
+class Span:
+    """One timed stage."""
+    name: str
+    start: float
+    seconds: float = None
+    category: str = "stage"
+    rows: int = None
+    cols: int = None
+    rss_mb: float = None
+    rss_delta_mb: float = None
+    # tracemalloc peak above the start of the stage, when tracing
+    peak_mb: float = None
+    pid: int = field(default_factory=os.getpid)
+    tid: int = field(default_factory=threading.get_ident)
+    args: dict = field(default_factory=dict)
+
+    def describe(self, data):
+        """Set rows and columns from `data` (e.g. the stage's output)."""
+        self.rows, self.cols = shape(data)
+
+
+class Recorder:
+    """Thread-safe log of the last `max_spans` spans."""
+
+    def __init__(self, max_spans=MAX_SPANS):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def append(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def extend(self, spans):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    @property
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def rows(self):
+        """Spans as dicts, newest first, for a table."""
+        return [{"stage": s.name, "kind": s.category, "seconds": round(s.seconds, 4), "rows": s.rows,
+                 "cols": s.cols, "RSS MB": _round(s.rss_mb), "RSS change MB": _round(s.rss_delta_mb),
+                 "peak MB": _round(s.peak_mb), "pid": s.pid,
+                 "started": time.strftime("%H:%M:%S", time.localtime(s.start))}
+                for s in reversed(self.spans) if s.seconds is not None]
+
+    def to_json_lines(self):
+        return "".join(json.dumps(asdict(s), default=str) + "\n" for s in self.spans)
+
+    def to_chrome_trace(self):
+        """Trace Event Format JSON: one complete ("X") event per span, in microseconds."""
+        events = [{"name": s.name, "cat": s.category, "ph": "X", "ts": round(s.start * 1e6),
+                   "dur": round((s.seconds or 0.0) * 1e6), "pid": s.pid, "tid": s.tid,
+                   "args": {k: v for k, v in asdict(s).items()
+                            if k in ("rows", "cols", "rss_mb", "rss_delta_mb", "peak_mb") and v is not None}
+                   | s.args}
+                  for s in self.spans if s.seconds is not None]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
+
+
+def _round(value):
+    return None if value is None else round(value, 1)
+
+
+# ================================
+# ---- HOOKS ----
+# ================================
+def activate(recorder):
+    """Record the stages of this context (e.g. one Streamlit script run) into `recorder`."""
+    _sinks.set((recorder,))
+
+
+@contextmanager
+def collect():
+    """Collect the spans of the enclosed block into the yielded list (active sinks still get them)."""
+    spans = []
+    token = _sinks.set(_sinks.get() + (spans,))
+    try:
+        yield spans
+    finally:
+        _sinks.reset(token)
+
+
+def record(spans):
+    """Add finished spans (e.g. `ClusterResult.timings` from a worker process) to the active sinks."""
+    for sink in _sinks.get():
+        for span in spans:
+            sink.append(span)
+
+
+def collected(fn):
+    """Decorator: set `.timings` of `fn`'s return value to the spans recorded during the call."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with collect() as spans:
+            result = fn(*args, **kwargs)
+        result.timings = spans
+        return result
+    return wrapper
+
+
+@contextmanager
+def stage(name, data=None, category="stage", **args):
+    """Time the enclosed block as `name`; yields the Span (set its shape with `span.describe(out)`).
+
+    Without an active sink the block just runs.
+    """
+    sinks = _sinks.get()
+    span = Span(name=name, start=time.time(), category=category, args=args)
+    if not sinks:
+        yield span
+        return
+    if data is not None:
+        span.describe(data)
+    stack = _open.__dict__.setdefault("stack", [])
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+    before = rss_mb()
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span.seconds = time.perf_counter() - start
+        span.rss_mb = rss_mb()
+        if before is not None and span.rss_mb is not None:
+            span.rss_delta_mb = span.rss_mb - before
+        if tracing and tracemalloc.is_tracing():
+            base, seen = stack.pop()
+            peak = max(seen, tracemalloc.get_traced_memory()[1])
+            span.peak_mb = (peak - base) / 2**20
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+        for sink in sinks:
+            sink.append(span)
+
+
+def import_spans(seconds, start):
+    """Spans for a {module: seconds} import report, laid end to end from `start` (epoch seconds)."""
+    spans = []
+    for module, took in seconds.items():
+        spans.append(Span(name=f"import {module}", start=start, seconds=took, category="import"))
+        start += took
+    return spans
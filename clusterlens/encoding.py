@@ -0,0 +1,274 @@
+"""Sparse design matrix for mixed numeric / categorical features.
+
+Ordinal label codes put arbitrary distances between categories, and dense
+one-hot encoding does not fit columns with tens of thousands of levels.
+`SparseEncoder` picks a strategy per column by cardinality:
+
+- numeric: mean-imputed and standard-scaled;
+- "onehot": categorical columns with at most `max_levels` levels, one
+  indicator column per level;
+- "hash": higher-cardinality columns, levels hashed into `n_hash` indicator
+  columns (vectorized with pandas' hash_array, so there is no per-row
+  Python work);
+- "frequency": alternatively, each level replaced by its relative frequency
+  in the fitted data, then scaled like a numeric column.
+
+Missing categorical values are a level of their own (MISSING), as they are
+a class of their own in the ordinal encoder.
+
+The result is a CSR matrix. KMeans, the k-search, sampling and the
+silhouette all accept it directly, and `cluster_means` aggregates it per
+cluster with one sparse product, so memory and fit time follow the number
+of non-zero entries rather than rows x levels.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import StandardScaler
+
+ONEHOT_MAX_LEVELS = 50
+HASH_FEATURES = 32
+HIGH_CARDINALITY = ("hash", "frequency")
+# level of missing categorical values (what astype(str) gave NaN before pandas kept it missing)
+MISSING = "nan"
+
+
+def _as_text(series):
+    """Categorical values as strings, matching the ordinal encoder's astype(str); missing -> MISSING."""
+    text = series.astype(str).to_numpy(dtype=object)
+    text[series.isna().to_numpy()] = MISSING
+    return text
+
+
+def classes_to_arrays(classes):
+    """(str array, positions of missing classes) for saving LabelEncoder classes without pickle."""
+    classes = np.asarray(classes, dtype=object)
+    missing = np.flatnonzero(pd.isna(classes))
+    values = classes.copy()
+    values[missing] = ""
+    return values.astype(str), missing
+
+
+def classes_from_arrays(values, missing=None):
+    """Classes saved by `classes_to_arrays`, with missing ones restored as NaN."""
+    classes = np.asarray(values).astype(object)
+    if missing is not None and len(missing):
+        classes[np.asarray(missing)] = np.nan
+    return classes
+
+
+def _hash_bucket(values, n_hash):
+    return (pd.util.hash_array(values, categorize=True) % np.uint64(n_hash)).astype(np.int64)
+
+
+class SparseEncoder:
+    """Fit per-column strategies on a frame and turn frames into a CSR design matrix."""
+
+    def __init__(self, max_levels=ONEHOT_MAX_LEVELS, high_cardinality="hash", n_hash=HASH_FEATURES):
+        if high_cardinality not in HIGH_CARDINALITY:
+            raise ValueError(f"Unknown high-cardinality encoding {high_cardinality!r}; "
+                             f"expected one of {HIGH_CARDINALITY}.")
+        self.max_levels = max_levels
+        self.high_cardinality = high_cardinality
+        self.n_hash = n_hash
+
+    # ---- fit ----
+    def fit(self, df):
+        from .engine import is_categorical
+
+        self.strategies = {}
+        self.levels = {}
+        self.frequencies = {}
+        dense = {}
+        for col in df.columns:
+            series = df[col]
+            if not is_categorical(series):
+                self.strategies[col] = "numeric"
+                dense[col] = pd.to_numeric(series, errors="coerce").astype("float64")
+                continue
+            counts = pd.Series(_as_text(series)).value_counts(sort=False)
+            if len(counts) < 2:
+                continue  # constant: contributes nothing to distances
+            if len(counts) <= self.max_levels:
+                self.strategies[col] = "onehot"
+                self.levels[col] = np.sort(counts.index.to_numpy(dtype=object))
+            elif self.high_cardinality == "hash":
+                self.strategies[col] = "hash"
+            else:
+                self.strategies[col] = "frequency"
+                self.frequencies[col] = counts / counts.sum()
+                dense[col] = self._frequency(series, col)
+
+        dense = pd.DataFrame(dense, index=df.index)
+        self.means = dense.mean()
+        dense = dense.fillna(self.means)
+        varying = dense.columns[dense.nunique() > 1]
+        for col in dense.columns.difference(varying):
+            del self.strategies[col]
+            self.frequencies.pop(col, None)
+        self.dense_columns = [c for c in dense.columns if c in varying]
+        self.scaler = None
+        if self.dense_columns:
+            self.scaler = StandardScaler().fit(dense[self.dense_columns].to_numpy())
+        if not self.strategies:
+            raise ValueError("All selected features are constant; nothing to cluster on.")
+        self.columns = self._feature_names()
+        return self
+
+    def _frequency(self, series, col):
+        return pd.Series(_as_text(series)).map(self.frequencies[col]).fillna(0.0).to_numpy(dtype="float64")
+
+    def _feature_names(self):
+        names = list(self.dense_columns)
+        for col, strategy in self.strategies.items():
+            if strategy == "onehot":
+                names += [f"{col}={level}" for level in self.levels[col]]
+            elif strategy == "hash":
+                names += [f"{col}#{b}" for b in range(self.n_hash)]
+        return names
+
+    # ---- transform ----
+    def _width(self, col):
+        return len(self.levels[col]) if self.strategies[col] == "onehot" else self.n_hash
+
+    def transform(self, df):
+        """CSR design matrix: scaled dense block first, then one indicator block per column."""
+        n = len(df)
+        blocks = []
+        if self.dense_columns:
+            dense = np.column_stack([
+                self._frequency(df[c], c) if self.strategies[c] == "frequency"
+                else pd.to_numeric(df[c], errors="coerce").to_numpy(dtype="float64")
+                for c in self.dense_columns
+            ])
+            dense = np.where(np.isnan(dense), self.means[self.dense_columns].to_numpy(), dense)
+            blocks.append(sparse.csr_matrix(self.scaler.transform(dense)))
+
+        rows, cols = [], []
+        offset = 0
+        for col, strategy in self.strategies.items():
+            if strategy not in ("onehot", "hash"):
+                continue
+            values = _as_text(df[col])
+            if strategy == "onehot":
+                levels = self.levels[col]
+                pos = np.clip(np.searchsorted(levels, values), 0, len(levels) - 1)
+                seen = levels[pos] == values  # unseen levels get no indicator
+                rows.append(np.flatnonzero(seen))
+                cols.append(pos[seen] + offset)
+            else:
+                rows.append(np.arange(n))
+                cols.append(_hash_bucket(values, self.n_hash) + offset)
+            offset += self._width(col)
+        if offset:
+            r = np.concatenate(rows)
+            c = np.concatenate(cols)
+            blocks.append(sparse.csr_matrix((np.ones(len(r)), (r, c)), shape=(n, offset)))
+        return sparse.hstack(blocks, format="csr", dtype="float64")
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    # ---- (de)serialization ----
+    def to_state(self):
+        """(JSON-safe metadata, dict of arrays) describing the fitted encoder; see `from_state`."""
+        meta = {
+            "max_levels": self.max_levels, "high_cardinality": self.high_cardinality,
+            "n_hash": self.n_hash, "strategies": self.strategies,
+            "dense_columns": self.dense_columns, "columns": self.columns,
+            "means": {c: float(v) for c, v in self.means.items()},
+        }
+        arrays = {}
+        for i, col in enumerate(self.strategies):
+            if col in self.levels:
+                arrays[f"levels_{i}"] = np.asarray(self.levels[col], dtype=str)
+            if col in self.frequencies:
+                arrays[f"freq_levels_{i}"] = np.asarray(self.frequencies[col].index, dtype=str)
+                arrays[f"freq_values_{i}"] = self.frequencies[col].to_numpy(dtype="float64")
+        if self.scaler is not None:
+            arrays["dense_mean"] = self.scaler.mean_
+            arrays["dense_scale"] = self.scaler.scale_
+        return meta, arrays
+
+    @classmethod
+    def from_state(cls, meta, arrays):
+        encoder = cls(meta["max_levels"], meta["high_cardinality"], meta["n_hash"])
+        encoder.strategies = dict(meta["strategies"])
+        encoder.dense_columns = list(meta["dense_columns"])
+        encoder.columns = list(meta["columns"])
+        encoder.means = pd.Series(meta["means"], dtype="float64")
+        encoder.levels, encoder.frequencies = {}, {}
+        for i, col in enumerate(encoder.strategies):
+            if f"levels_{i}" in arrays:
+                encoder.levels[col] = np.asarray(arrays[f"levels_{i}"], dtype=object)
+            if f"freq_levels_{i}" in arrays:
+                encoder.frequencies[col] = pd.Series(
+                    arrays[f"freq_values_{i}"], index=np.asarray(arrays[f"freq_levels_{i}"], dtype=object)
+                )
+        encoder.scaler = None
+        if "dense_mean" in arrays:
+            encoder.scaler = StandardScaler()
+            encoder.scaler.mean_, encoder.scaler.scale_ = arrays["dense_mean"], arrays["dense_scale"]
+            encoder.scaler.var_ = encoder.scaler.scale_ ** 2
+            encoder.scaler.n_features_in_ = len(encoder.scaler.mean_)
+            encoder.scaler.n_samples_seen_ = 0
+        return encoder
+
+    # ---- inspect ----
+    def describe(self, centers):
+        """Centroids (or cluster means) as a DataFrame with original units for numeric columns."""
+        frame = pd.DataFrame(np.asarray(centers), columns=self.columns)
+        if self.scaler is not None:
+            frame[self.dense_columns] = self.scaler.inverse_transform(frame[self.dense_columns].to_numpy())
+        return frame
+
+    def summary(self):
+        """One row per input column: strategy, levels seen and output width."""
+        rows = []
+        for col, strategy in self.strategies.items():
+            if strategy == "onehot":
+                levels, width = len(self.levels[col]), len(self.levels[col])
+            elif strategy == "hash":
+                levels, width = None, self.n_hash
+            elif strategy == "frequency":
+                levels, width = len(self.frequencies[col]), 1
+            else:
+                levels, width = None, 1
+            rows.append({"Feature": col, "Encoding": strategy, "Levels": levels, "Columns": width})
+        return pd.DataFrame(rows)
+
+
+# ================================
+# ---- SPARSE AGGREGATES ----
+# ================================
+def _indicator(labels):
+    clusters, inverse = np.unique(np.asarray(labels), return_inverse=True)
+    n = len(inverse)
+    member = sparse.csr_matrix((np.ones(n), (inverse, np.arange(n))), shape=(len(clusters), n))
+    return clusters, member
+
+
+def cluster_means(X, labels, columns=None):
+    """Per-cluster mean of every column of X (dense or sparse) via one sparse product."""
+    clusters, member = _indicator(labels)
+    counts = np.asarray(member.sum(axis=1)).ravel()
+    sums = member @ X
+    sums = sums.toarray() if sparse.issparse(sums) else np.asarray(sums)
+    return pd.DataFrame(sums / counts[:, None], index=pd.Index(clusters, name="Cluster"), columns=columns)
+
+
+def cluster_stds(X, labels, columns=None):
+    """Per-cluster population standard deviation of every column, from E[x^2] - E[x]^2."""
+    means = cluster_means(X, labels, columns)
+    squares = X.multiply(X) if sparse.issparse(X) else np.square(X)
+    second = cluster_means(squares, labels, columns)
+    return np.sqrt((second - means ** 2).clip(lower=0.0))
+
+
+def row_sq_dist_to_mean(X):
+    """Squared distance of every row to the column mean, without densifying sparse X."""
+    if not sparse.issparse(X):
+        return ((X - X.mean(axis=0)) ** 2).sum(axis=1)
+    mean = np.asarray(X.mean(axis=0)).ravel()
+    norms = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    return np.maximum(norms - 2 * (X @ mean) + mean @ mean, 0.0)
@@ -0,0 +1,312 @@
+"""Headless clustering engine: ingest -> encode -> scale -> k-search -> fit -> profile.
+
+Nothing in this module imports Streamlit, so it can run from cron jobs,
+worker processes and the command line as well as from the Clustering page.
+"""
+import time
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.cluster import KMeans
+
+from . import diagnostics
+from .ksearch import MAX_K, RANDOM_STATE, make_kmeans, search_k
+from .planner import Plan, plan_run
+from .reduction import ReductionReport, compare_fits, lift, reduce
+from .sampling import SAMPLE_SIZE, SamplingReport, use_sampling, select_k
+from .silhouette import SilhouetteReport, silhouette_by_k
+from .cache import cache_key, hash_frame
+from .encoding import ONEHOT_MAX_LEVELS, SparseEncoder
+from .warmstart import WarmReport, WarmStart, design_units, snapshot, warm_search
+from .ingest import read_path
+
+
+@dataclass
+class ClusterResult:
+    """Everything produced by one clustering run."""
+    labels: np.ndarray
+    kmeans: KMeans
+    X_scaled: np.ndarray
+    k: int
+    ks: list
+    wcss: list
+    features: list
+    columns: list
+    scaler: StandardScaler
+    label_encoders: dict = field(default_factory=dict)
+    sampling: SamplingReport = None
+    silhouette: SilhouetteReport = None
+    # set when encoding="sparse": X_scaled is then a CSR matrix
+    encoder: SparseEncoder = None
+    # centroids for warm-starting the next run, and how this run's warm start went
+    warm_state: WarmStart = None
+    warm: WarmReport = None
+    # algorithm, restarts and sampling chosen by the planner, with reasons
+    plan: Plan = None
+    # set when the run clustered on principal components (pca=...)
+    reduction: ReductionReport = None
+    # diagnostics.Span of every stage of the run that produced this result (not cached)
+    timings: list = field(default_factory=list)
+
+
+# ================================
+# ---- INGEST ----
+# ================================
+def read_table(path):
+    """Read a CSV, Parquet or Feather file and drop duplicate rows."""
+    return read_path(path)
+
+
+# ================================
+# ---- ENCODE / SCALE ----
+# ================================
+def is_categorical(series):
+    """True for columns that have to be label-encoded before scaling."""
+    return not pd.api.types.is_numeric_dtype(series)
+
+
+def encode_features(X):
+    """Label-encode categorical columns; returns the encoded copy and its encoders."""
+    X = X.copy()
+    label_encoders = {}
+    for col in X.columns:
+        if is_categorical(X[col]):
+            le = LabelEncoder()
+            X[col] = le.fit_transform(X[col].astype(str))
+            label_encoders[col] = le
+    return X, label_encoders
+
+
+def scale_features(X):
+    """Mean-impute, drop constant columns and standard-scale."""
+    X = X.fillna(X.mean())
+    X = X.loc[:, X.nunique() > 1]
+    if X.shape[1] == 0:
+        raise ValueError("All selected features are constant; nothing to cluster on.")
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    return X_scaled, scaler, list(X.columns)
+
+
+ENCODINGS = ("ordinal", "sparse")
+
+
+def encode_design(X, encoding="ordinal", max_levels=ONEHOT_MAX_LEVELS, high_cardinality="hash"):
+    """Encode and scale `X`; returns (X_scaled, scaler, columns, label_encoders, encoder).
+
+    "ordinal" label-encodes categorical columns into a dense array;
+    "sparse" builds a CSR design matrix with `SparseEncoder` (one-hot up to
+    `max_levels` levels, `high_cardinality` encoding above that).
+    """
+    if encoding == "ordinal":
+        with diagnostics.stage("label encoding", X):
+            X, label_encoders = encode_features(X)
+        with diagnostics.stage("scaling", X):
+            X_scaled, scaler, columns = scale_features(X)
+        return X_scaled, scaler, columns, label_encoders, None
+    if encoding == "sparse":
+        encoder = SparseEncoder(max_levels=max_levels, high_cardinality=high_cardinality)
+        with diagnostics.stage("sparse encoding", X) as span:
+            X_scaled = encoder.fit_transform(X)
+            span.describe(X_scaled)
+        return X_scaled, encoder.scaler, encoder.columns, {}, encoder
+    raise ValueError(f"Unknown encoding {encoding!r}; expected one of {ENCODINGS}.")
+
+
+# ================================
+# ---- K-SEARCH / FIT ----
+# ================================
+def fit_kmeans(X_scaled, k, random_state=RANDOM_STATE, init=None, kmeans_params=None):
+    """Fit the final model, optionally seeded with `init` centroids; returns (labels, kmeans)."""
+    params = dict(kmeans_params or {})
+    if init is not None:
+        params.update(init=init, n_init=1)
+    kmeans = make_kmeans(k, random_state, **params)
+    labels = kmeans.fit_predict(X_scaled)
+    return labels, kmeans
+
+
+# ================================
+# ---- PIPELINE ----
+# ================================
+@diagnostics.collected
+def cluster_data(df, features, max_k=MAX_K, random_state=RANDOM_STATE, n_jobs=None, early_stop=False,
+                 sampling="auto", sample_size=SAMPLE_SIZE, sample_method="stratified",
+                 criterion="elbow", silhouette=False, cache=None, data_hash=None,
+                 encoding="ordinal", max_levels=ONEHOT_MAX_LEVELS, high_cardinality="hash",
+                 warm_start=None, algorithm="auto", budget=None, pca=None, progress=None):
+    """Run the full pipeline on `df[features]`.
+
+    Without sampling, the model fitted for the chosen k during the elbow
+    search is reused as the final model. With sampling (`True`, or "auto"
+    on large inputs) k is picked on samples and the final model is fitted
+    once on all rows, seeded with the sample centroids.
+
+    `criterion="silhouette"` picks the k with the best sampled silhouette
+    instead of the elbow; `silhouette=True` scores every k without changing
+    the choice.
+
+    `encoding="sparse"` clusters on a sparse one-hot/hashed design matrix
+    instead of ordinal label codes (see `encode_design`).
+
+    `algorithm` ("auto", "lloyd", "elkan" or "minibatch") and `budget`
+    (seconds) go to `planner.plan_run`, which picks the KMeans variant,
+    restarts and sampling for the data's size; `result.plan` says why.
+
+    `pca` (an explained-variance target such as 0.9) runs the k-search and
+    fit on the fewest principal components reaching it, with centroids
+    mapped back to the full space (see `clusterlens.reduction`);
+    `result.reduction` reports the speedup and the agreement with a
+    full-space fit. A warm start is not used in this mode.
+
+    `warm_start` (the previous result's `warm_state`) seeds every k from the
+    previous centroids instead of sampling or cold-fitting (see
+    `clusterlens.warmstart`), with the plan's KMeans parameters;
+    `result.warm` reports what that saved.
+
+    With a `ResultCache`, results are looked up by `data_hash` (e.g. the
+    hash of the uploaded bytes; defaults to a hash of `df[features]`) plus
+    the parameters, and stored after a miss.
+
+    `progress(stage, done, total)` is called after every fitted k and
+    around the silhouette and final fit (see `clusterlens.jobs`). The time
+    and memory of each stage are in `result.timings`.
+    """
+    if not features:
+        raise ValueError("Select at least one feature.")
+    if criterion not in ("elbow", "silhouette"):
+        raise ValueError(f"Unknown k-selection criterion {criterion!r}.")
+    X_scaled, scaler, columns, label_encoders, encoder = encode_design(
+        df[list(features)], encoding, max_levels=max_levels, high_cardinality=high_cardinality,
+    )
+    n_rows = X_scaled.shape[0]
+    units = design_units(columns, scaler, encoder.dense_columns if encoder is not None else None)
+    classes = {col: le.classes_ for col, le in label_encoders.items()}
+
+    if cache is not None:
+        key = cache_key(
+            data_hash or hash_frame(df[list(features)]), features, max_k=max_k,
+            random_state=random_state, early_stop=early_stop,
+            sampling=use_sampling(n_rows, sampling), sample_size=sample_size,
+            sample_method=sample_method, criterion=criterion, silhouette=silhouette,
+            **({"encoding": encoding, "max_levels": max_levels, "high_cardinality": high_cardinality}
+               if encoding != "ordinal" else {}),
+            algorithm=algorithm, budget=budget, **({"pca": pca} if pca is not None else {}),
+        )
+        with diagnostics.stage("cache lookup") as span:
+            cached = cache.get(key, X_scaled)
+            span.args["hit"] = cached is not None
+        if cached is not None:
+            cached.scaler, cached.encoder = scaler, encoder
+            # entries written before warm starts existed only know the chosen k
+            cached.warm_state = cached.warm_state or WarmStart(
+                features=list(features), columns=list(columns), n_rows=n_rows,
+                centers={cached.k: cached.kmeans.cluster_centers_ * units[1] + units[0]},
+                classes={c: list(map(str, v)) for c, v in classes.items()},
+            )
+            return cached
+
+    reduction = reduced = None
+    X_fit = X_scaled
+    if pca is not None:
+        with diagnostics.stage("PCA", X_scaled, target=pca) as span:
+            reduction, X_fit, reduced = reduce(X_scaled, pca, random_state=random_state)
+            span.describe(X_fit)
+        # previous centroids are not expressed in these components
+        warm_start = None
+
+    start = time.perf_counter()
+    report = warm = None
+    with diagnostics.stage("planning", X_fit):
+        # a warm start refines every k on all rows, so k is never chosen on samples
+        plan = plan_run(X_fit, max_k=max_k, budget=budget, algorithm=algorithm,
+                        sampling=False if warm_start is not None else sampling,
+                        sample_size=sample_size, n_jobs=n_jobs, random_state=random_state)
+    params = plan.kmeans_params
+    if warm_start is not None:
+        plan.reasons.append("warm start: k values refitted from the previous centroids use one restart")
+        with diagnostics.stage("warm-started k-search", X_scaled, max_k=max_k):
+            search, warm = warm_search(X_scaled, warm_start, columns, units, classes,
+                                       max_k=max_k, random_state=random_state, kmeans_params=params,
+                                       n_jobs=n_jobs, progress=progress)
+        k = search.k
+    else:
+        with diagnostics.stage("k-search", X_fit, max_k=max_k, algorithm=plan.algorithm,
+                               sampling=plan.sampling):
+            if plan.sampling:
+                k, search, report = select_k(X_fit, sample_size=plan.sample_size, method=sample_method,
+                                             max_k=max_k, random_state=random_state, n_jobs=n_jobs,
+                                             kmeans_params=plan.search_params, progress=progress)
+            else:
+                search = search_k(X_fit, max_k=max_k, random_state=random_state,
+                                  n_jobs=n_jobs, early_stop=early_stop, kmeans_params=params,
+                                  progress=progress)
+                k = search.k
+
+    scores = None
+    if criterion == "silhouette" or silhouette:
+        if progress is not None:
+            progress("silhouette", 0, 1)
+        with diagnostics.stage("silhouette", X_fit):
+            scores = silhouette_by_k(X_fit, search.models, random_state=random_state, n_jobs=n_jobs)
+        if criterion == "silhouette" and scores.best_k is not None:
+            k = scores.best_k
+
+    # warm-start states hold full-space centroids
+    full_search = search if reduction is None else \
+        replace(search, models={c: lift(m, reduction) for c, m in search.models.items()})
+    warm_state = snapshot(full_search, columns, units, n_rows, features, classes, warm_start, warm)
+    if report is not None:
+        if progress is not None:
+            progress("final fit on all rows", 0, 1)
+        fit_start = time.perf_counter()
+        with diagnostics.stage("final fit", X_fit, k=k):
+            labels, kmeans = fit_kmeans(X_fit, k, random_state=random_state,
+                                        init=search.models[k].cluster_centers_, kmeans_params=params)
+        fit_seconds = time.perf_counter() - fit_start
+    else:
+        kmeans = search.models[k]
+        labels = kmeans.labels_
+
+    if reduction is not None:
+        kmeans = lift(kmeans, reduction, reduction.residual(X_scaled, X_fit))
+        compare_start = time.perf_counter()
+        with diagnostics.stage("full-space comparison", k=k):
+            compare_fits(X_scaled, X_fit, labels, k, reduced, params, random_state=random_state)
+        start += time.perf_counter() - compare_start
+    if report is not None:
+        # only the full-data fit is comparable with later warm starts
+        warm_state.centers[k] = kmeans.cluster_centers_ * units[1] + units[0]
+        warm_state.cold_iterations = {k: int(kmeans.n_iter_)}
+        warm_state.cold_seconds = {k: fit_seconds}
+
+    result = ClusterResult(
+        labels=labels, kmeans=kmeans, X_scaled=X_scaled, k=k, ks=search.ks, wcss=search.wcss,
+        features=list(features), columns=columns, scaler=scaler,
+        label_encoders=label_encoders, sampling=report, silhouette=scores, encoder=encoder,
+        warm_state=warm_state, warm=warm, plan=plan, reduction=reduced,
+    )
+    # the plan covers the k-search and final fit; the silhouette and comparison report their own time
+    plan.seconds = time.perf_counter() - start - (scores.seconds if scores is not None else 0.0)
+    # the cache holds cold-started results only
+    if cache is not None and warm is None:
+        cache.put(key, result)
+    return result
+
+
+# ================================
+# ---- PROFILE ----
+# ================================
+def decode_cluster_means(cluster_summary, label_encoders):
+    """Decode encoded categorical feature means back to labels."""
+    from .profiling import decode_means
+    return decode_means(cluster_summary, {col: le.classes_ for col, le in label_encoders.items()})
+
+
+def profile_clusters(df, labels, features):
+    """Per-cluster mean of each feature, with categorical means decoded to labels."""
+    from .profiling import compute_profile
+    profile = compute_profile(df[list(features)], labels, features)
+    return profile.summary, profile.decoded
@@ -0,0 +1,127 @@
+"""Export clustered rows as CSV, Parquet or a ZIP bundle of every cluster.
+
+Files are produced only when asked for and written in row chunks into a
+SpooledTemporaryFile (in memory while small, on disk once it grows), so
+no export ever holds the whole file as one string while it is written.
+Every function returns the finished file as bytes (what Streamlit's
+download button accepts from a deferred callable) and closes the spool.
+"""
+import tempfile
+import zipfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SPOOL_BYTES = 32 << 20
+CHUNK_ROWS = 50_000
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+ZIP_MIME = "application/zip"
+
+
+# ================================
+# ---- WRITERS ----
+# ================================
+def _chunks(frame, labels, label_column, chunksize):
+    """Row chunks of `frame`, each with its slice of `labels` added as `label_column`."""
+    for start in range(0, max(len(frame), 1), chunksize):
+        chunk = frame.iloc[start:start + chunksize]
+        if labels is not None:
+            values = labels if np.ndim(labels) == 0 else labels[start:start + chunksize]
+            chunk = chunk.assign(**{label_column: values})
+        yield start, chunk
+
+
+def write_csv(frame, fileobj, labels=None, label_column="Cluster", chunksize=CHUNK_ROWS):
+    """Write `frame` (plus optional labels) as UTF-8 CSV, `chunksize` rows at a time."""
+    for start, chunk in _chunks(frame, labels, label_column, chunksize):
+        fileobj.write(chunk.to_csv(index=False, header=start == 0).encode("utf-8"))
+
+
+def write_parquet(frame, fileobj, labels=None, label_column="Cluster", chunksize=CHUNK_ROWS):
+    """Write `frame` (plus optional labels) as Parquet, one row group per `chunksize` rows.
+
+    Column types come from the whole frame, not the first chunk, where a
+    column that is empty there would be typed null.
+    """
+    types = {f.name: f.type for f in pa.Schema.from_pandas(frame, preserve_index=False)}
+    writer = None
+    try:
+        for _, chunk in _chunks(frame, labels, label_column, chunksize):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = pa.schema([pa.field(f.name, types.get(f.name, f.type)) for f in table.schema],
+                                   metadata=table.schema.metadata)
+                writer = pq.ParquetWriter(fileobj, schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet}
+
+
+def _read(out):
+    """Contents of spooled file `out`, which is closed."""
+    with out:
+        out.seek(0)
+        return out.read()
+
+
+def _spooled(write, frame, labels, label_column):
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    try:
+        write(frame, out, labels, label_column)
+    except BaseException:
+        out.close()
+        raise
+    return _read(out)
+
+
+def _members(index):
+    """(file stem cluster, frame, labels) for each cluster and for all rows.
+
+    Labels are added chunk by chunk unless the frame already carries them.
+    """
+    has_labels = index.label_column in index.df.columns
+    for c in index:
+        yield c, index.frame(c), None if has_labels else c
+    yield None, index.df, None if has_labels else index.labels
+
+
+# ================================
+# ---- EXPORTS ----
+# ================================
+def file_name(cluster=None, fmt="csv"):
+    """cluster_<n>.<fmt> for one cluster, all_clusters.<fmt> for every row."""
+    stem = "all_clusters" if cluster is None else f"cluster_{cluster + 1}"
+    return f"{stem}.{fmt}"
+
+
+def export_cluster(index, cluster, fmt="csv"):
+    """Rows of one cluster (with its Cluster column) as bytes."""
+    labels = None if index.label_column in index.df.columns else cluster
+    return _spooled(WRITERS[fmt], index.frame(cluster), labels, index.label_column)
+
+
+def export_all(index, fmt="csv"):
+    """Every row in the original order, with the Cluster column, as bytes."""
+    labels = None if index.label_column in index.df.columns else index.labels
+    return _spooled(WRITERS[fmt], index.df, labels, index.label_column)
+
+
+def export_zip(index, fmt="csv"):
+    """ZIP holding one file per cluster plus all_clusters.<fmt>, as bytes."""
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    # Parquet is already compressed; deflating it again only costs time
+    compression = zipfile.ZIP_DEFLATED if fmt == "csv" else zipfile.ZIP_STORED
+    try:
+        with zipfile.ZipFile(out, "w", compression=compression) as zf:
+            for cluster, frame, labels in _members(index):
+                with zf.open(file_name(cluster, fmt), "w", force_zip64=True) as member:
+                    WRITERS[fmt](frame, member, labels, index.label_column)
+    except BaseException:
+        out.close()
+        raise
+    return _read(out)
@@ -0,0 +1,87 @@
+"""Per-cluster row index built once per clustering result.
+
+The labels are argsorted a single time; after that every cluster's rows
+are one contiguous run of `order`, so the Segment, Profiling, Analyzing
+and Download tabs take rows by position instead of rebuilding boolean
+masks per cluster and per feature. `df` is referenced, never copied; a
+frame reordered by cluster (`grouped`) is only materialized on request,
+after which per-cluster frames are plain slices of it.
+"""
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+
+class ClusterIndex:
+    """Row positions, grouped view and aggregates for one labelling of `df`."""
+
+    def __init__(self, df, labels=None, label_column="Cluster", order=None):
+        if labels is None:
+            labels = df[label_column].to_numpy()
+        self.df = df
+        self.labels = np.asarray(labels)
+        self.label_column = label_column
+        # stable sort keeps the original row order inside each cluster
+        self.order = np.argsort(self.labels, kind="stable") if order is None else order
+        self.clusters, starts, self.counts = np.unique(
+            self.labels[self.order], return_index=True, return_counts=True
+        )
+        self.bounds = dict(zip(self.clusters.tolist(), zip(starts, starts + self.counts)))
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def __iter__(self):
+        return iter(self.clusters.tolist())
+
+    def rows(self, cluster):
+        """Original row positions of `cluster` (a view into `order`)."""
+        start, stop = self.bounds[cluster]
+        return self.order[start:stop]
+
+    @cached_property
+    def grouped(self):
+        """`df` reordered by cluster; built on first use and reused afterwards."""
+        return self.df.iloc[self.order]
+
+    def frame(self, cluster):
+        """Rows of `cluster`: a slice of `grouped` if it exists, else taken by position."""
+        start, stop = self.bounds[cluster]
+        if "grouped" in self.__dict__:
+            return self.grouped.iloc[start:stop]
+        return self.df.iloc[self.order[start:stop]]
+
+    def slice(self, frame, cluster):
+        """Rows of `cluster` from any frame aligned with `grouped` (e.g. an encoded copy of it)."""
+        start, stop = self.bounds[cluster]
+        return frame.iloc[start:stop]
+
+    def column(self, cluster, name):
+        """One column of `cluster` without materializing the other columns."""
+        return self.df[name].iloc[self.rows(cluster)]
+
+    def feature_columns(self):
+        """Every column except the label column."""
+        return [c for c in self.df.columns if c != self.label_column]
+
+    @cached_property
+    def sizes(self):
+        """Rows per cluster."""
+        return pd.Series(self.counts, index=self.clusters, name="Rows")
+
+    def means(self, columns):
+        """Per-cluster mean of numeric `columns` (NaN-aware), one reduceat per column."""
+        key = tuple(columns)
+        cache = self.__dict__.setdefault("_means", {})
+        if key not in cache:
+            starts = np.array([self.bounds[c][0] for c in self.clusters])
+            out = {}
+            for col in columns:
+                values = pd.to_numeric(self.df[col], errors="coerce").to_numpy(dtype="float64")[self.order]
+                present = ~np.isnan(values)
+                sums = np.add.reduceat(np.where(present, values, 0.0), starts)
+                counts = np.add.reduceat(present.astype(np.int64), starts)
+                out[col] = np.divide(sums, counts, out=np.full(len(sums), np.nan), where=counts > 0)
+            cache[key] = pd.DataFrame(out, index=pd.Index(self.clusters, name=self.label_column))
+        return cache[key]
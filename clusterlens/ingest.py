@@ -0,0 +1,125 @@
+"""Parse uploaded files once, straight from bytes.
+
+CSV is parsed by pyarrow's multithreaded reader directly from the byte
+buffer (no decode-to-str copy); Parquet and Feather are read natively.
+Parsed, de-duplicated frames are memoized per content hash, so Streamlit
+reruns and other pages that see the same upload skip parsing entirely.
+pyarrow is optional for CSV: without it pandas' C parser is used.
+"""
+import io
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+import pandas as pd
+
+from . import diagnostics
+from .cache import hash_bytes
+from .memory import compact_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - pandas fallback
+    pa = None
+
+FORMATS = ("csv", "parquet", "feather")
+UPLOAD_TYPES = ["csv", "parquet", "pq", "feather", "arrow"]
+MEMO_ENTRIES = 4
+
+_memo = OrderedDict()
+_memo_lock = Lock()
+
+
+# ================================
+# ---- FORMAT DETECTION ----
+# ================================
+def detect_format(data, name=None):
+    """'csv', 'parquet' or 'feather', from magic bytes first and the file name second."""
+    head = bytes(data[:8])
+    if head[:4] == b"PAR1":
+        return "parquet"
+    if head[:6] == b"ARROW1":
+        return "feather"
+    suffix = Path(name or "").suffix.lower()
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    if suffix in (".feather", ".arrow"):
+        return "feather"
+    return "csv"
+
+
+# ================================
+# ---- PARSING ----
+# ================================
+def parse_bytes(data, name=None):
+    """Parse raw file bytes into a DataFrame without copying them into a str."""
+    fmt = detect_format(data, name)
+    if fmt == "parquet":
+        return pd.read_parquet(io.BytesIO(data))
+    if fmt == "feather":
+        return pd.read_feather(io.BytesIO(data))
+    if pa is not None:
+        table = pa_csv.read_csv(pa.BufferReader(data), read_options=pa_csv.ReadOptions(use_threads=True))
+        return table.to_pandas()
+    return pd.read_csv(io.BytesIO(data))
+
+
+def drop_duplicate_rows(df):
+    """drop_duplicates() via vectorized 64-bit row hashes.
+
+    Only rows whose hash occurs more than once are compared exactly, so a
+    hash collision can never drop a distinct row.
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False)
+    candidates = hashes.duplicated(keep=False).to_numpy()
+    if not candidates.any():
+        return df.reset_index(drop=True)
+    duplicate = pd.Series(False, index=df.index)
+    duplicate[candidates] = df[candidates].duplicated().to_numpy()
+    return df[~duplicate.to_numpy()].reset_index(drop=True)
+
+
+# ================================
+# ---- PARSE-ONCE ENTRY POINTS ----
+# ================================
+def load_bytes(data, name=None, data_hash=None, dedupe=True, compact=True):
+    """Parsed (and de-duplicated, compacted) frame for `data`, memoized by content hash.
+
+    The same DataFrame object is returned for every call with the same
+    bytes; callers must not modify it in place.
+    """
+    data_hash = data_hash or hash_bytes(data)
+    key = (data_hash, dedupe, compact)
+    with _memo_lock:
+        if key in _memo:
+            _memo.move_to_end(key)
+            return _memo[key]
+    with diagnostics.stage("parse", bytes=len(data)) as span:
+        df = parse_bytes(data, name)
+        span.describe(df)
+    if dedupe:
+        with diagnostics.stage("drop duplicates", df) as span:
+            df = drop_duplicate_rows(df)
+            span.args["kept"] = len(df)
+    if compact:
+        with diagnostics.stage("compact", df):
+            df = compact_frame(df)
+    with _memo_lock:
+        _memo[key] = df
+        while len(_memo) > MEMO_ENTRIES:
+            _memo.popitem(last=False)
+    return df
+
+
+def load_upload(uploaded_file, dedupe=True, compact=True):
+    """load_bytes() for a Streamlit UploadedFile (or any object with getvalue() and name)."""
+    data = uploaded_file.getvalue()
+    return load_bytes(data, getattr(uploaded_file, "name", None), hash_bytes(data), dedupe, compact)
+
+
+def read_path(path, dedupe=True):
+    """Read a CSV/Parquet/Feather file from disk through the same parser."""
+    path = Path(path)
+    df = parse_bytes(path.read_bytes(), path.name)
+    return drop_duplicate_rows(df) if dedupe else df
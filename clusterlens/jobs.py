@@ -0,0 +1,177 @@
+"""Server-wide background queue for clustering jobs.
+
+A `JobQueue` runs jobs in a process pool of at most `max_jobs` workers
+(CLUSTERLENS_MAX_JOBS, default 2) shared by every session of the server,
+so a page only submits work and polls for it:
+
+- jobs are keyed (e.g. by `cache.cache_key` of the data hash and the
+  options). Submitting a key that is already queued, running or finished
+  returns the existing job, so identical requests from different sessions
+  run once;
+- the job function is called with a `progress(stage, done, total)`
+  callback (`engine.cluster_data` calls it after every fitted k); the
+  latest call is kept in a manager dict that `Job.progress` reads;
+- `cancel` drops a queued job, or makes the next progress call of a
+  running one raise JobCancelled. A job shared by several sessions is only
+  cancelled once every one of them has cancelled it. Progress and
+  cancellation are tracked per submission (a token), so submitting a key
+  whose job was cancelled but is still winding down starts a fresh job;
+- each worker's BLAS/OpenMP threads are limited to its share of the cores,
+  and finished jobs are kept for `keep_seconds` so other sessions can
+  collect the same result, then forgotten.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from threadpoolctl import threadpool_limits
+
+MAX_JOBS = int(os.environ.get("CLUSTERLENS_MAX_JOBS", "2"))
+KEEP_SECONDS = 600
+
+
+class JobCancelled(Exception):
+    """Raised inside a job whose cancellation was requested."""
+
+
+@dataclass
+class Progress:
+    """Latest progress report of a running job."""
+    stage: str
+    done: int
+    total: int
+
+    @property
+    def fraction(self):
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+
+@dataclass
+class Job:
+    """One submitted job and the sessions waiting for it."""
+    key: str
+    future: Future
+    submitted: float
+    # identifies this submission in the shared progress and cancel dicts
+    token: str = None
+    watchers: set = field(default_factory=set)
+    finished: float = None
+    # the queue's shared progress dict
+    _progress: object = field(default=None, repr=False)
+
+    @property
+    def status(self):
+        """"queued", "running", "done", "failed" or "cancelled"."""
+        if not self.future.done():
+            return "running" if self.token in self._progress else "queued"
+        if self.future.cancelled() or isinstance(self.future.exception(), JobCancelled):
+            return "cancelled"
+        return "failed" if self.future.exception() is not None else "done"
+
+    @property
+    def progress(self):
+        state = self._progress.get(self.token)
+        return Progress(*state) if state is not None else None
+
+    def result(self):
+        """The job's return value; re-raises its exception if it failed."""
+        return self.future.result()
+
+
+# ================================
+# ---- WORKERS ----
+# ================================
+def _init_worker(threads):
+    threadpool_limits(threads)
+
+
+def _run(token, fn, args, kwargs, progress_state, cancelled):
+    def progress(stage, done, total):
+        if cancelled.get(token):
+            raise JobCancelled(token)
+        progress_state[token] = (stage, done, total)
+
+    progress("starting", 0, 1)
+    return fn(*args, progress=progress, **kwargs)
+
+
+# ================================
+# ---- QUEUE ----
+# ================================
+class JobQueue:
+    """Process pool of at most `max_jobs` concurrent jobs, with de-duplication by key."""
+
+    def __init__(self, max_jobs=MAX_JOBS, keep_seconds=KEEP_SECONDS):
+        self.max_jobs = max(1, max_jobs)
+        self.keep_seconds = keep_seconds
+        # cores each job may use, so concurrent jobs do not oversubscribe the machine
+        self.cores_per_job = max(1, (os.cpu_count() or 1) // self.max_jobs)
+        self._manager = multiprocessing.Manager()
+        self._progress = self._manager.dict()
+        self._cancelled = self._manager.dict()
+        self._pool = ProcessPoolExecutor(max_workers=self.max_jobs, initializer=_init_worker,
+                                         initargs=(self.cores_per_job,))
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, args=(), kwargs=None, watcher=None):
+        """Run `fn(*args, progress=..., **kwargs)` in the pool, or join the job already running for `key`."""
+        with self._lock:
+            self._forget_finished()
+            job = self._jobs.get(key)
+            # a cancelled job may still be running until its next progress call; never re-adopt it
+            if job is None or job.status in ("failed", "cancelled") or self._cancelled.get(job.token):
+                token = uuid.uuid4().hex
+                future = self._pool.submit(_run, token, fn, tuple(args), dict(kwargs or {}),
+                                           self._progress, self._cancelled)
+                job = Job(key=key, future=future, submitted=time.time(), token=token, _progress=self._progress)
+                future.add_done_callback(lambda f, job=job: self._finished(job))
+                self._jobs[key] = job
+            job.watchers.add(watcher)
+            return job
+
+    def get(self, key):
+        """The job for `key`, or None if it was never submitted or has been forgotten."""
+        return self._jobs.get(key)
+
+    def cancel(self, key, watcher=None):
+        """Stop waiting for `key`; the job itself stops once no session waits for it.
+
+        Returns True if the job was cancelled.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.future.done():
+                return False
+            job.watchers.discard(watcher)
+            if job.watchers:
+                return False
+            self._cancelled[job.token] = True
+            job.future.cancel()
+            return True
+
+    def _finished(self, job):
+        job.finished = time.time()
+        try:
+            self._progress.pop(job.token, None)
+            self._cancelled.pop(job.token, None)
+        except (OSError, EOFError):
+            pass  # the manager is already shut down
+
+    def active(self):
+        """Jobs that are queued or running."""
+        return [job for job in list(self._jobs.values()) if not job.future.done()]
+
+    def _forget_finished(self):
+        now = time.time()
+        for key, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > self.keep_seconds:
+                del self._jobs[key]
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
+        self._manager.shutdown()
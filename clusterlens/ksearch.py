@@ -0,0 +1,199 @@
+"""Elbow search over candidate k values.
+
+Candidate k values are fitted concurrently in a process pool, every fitted
+model is kept so the chosen k never has to be refitted, and the sweep can
+stop early once the inertia curve has clearly bent.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from kneed import KneeLocator
+from threadpoolctl import threadpool_limits
+
+MAX_K = 10
+RANDOM_STATE = 42
+# Below this many rows, process start-up costs more than the fits themselves.
+PARALLEL_MIN_ROWS = 20_000
+# Early stop: the elbow must hold for PATIENCE extensions of the curve, and
+# every k past it must improve inertia by less than MIN_GAIN of the k=1 -> k=2
+# improvement.
+PATIENCE = 2
+MIN_GAIN = 0.1
+# Mini-batch fits run at most this many batches
+MINIBATCH_STEPS = 300
+
+
+@dataclass
+class KSearchResult:
+    """Inertia curve and fitted models from one elbow search."""
+    k: int
+    ks: list
+    wcss: list
+    models: dict = field(default_factory=dict)
+    stopped_early: bool = False
+    # wall-clock seconds of each fit
+    seconds: dict = field(default_factory=dict)
+
+    @property
+    def model(self):
+        """The already-fitted model for the chosen k."""
+        return self.models[self.k]
+
+
+# ================================
+# ---- WORKERS ----
+# ================================
+_X = None
+_WEIGHTS = None
+
+
+def _init_worker(X, sample_weight):
+    """Receive the data once per worker and keep BLAS/OpenMP to one thread."""
+    global _X, _WEIGHTS
+    _X, _WEIGHTS = X, sample_weight
+    threadpool_limits(1)
+
+
+def _fit_shared(k, random_state, kmeans_params):
+    return _timed_fit(_X, k, random_state, kmeans_params, _WEIGHTS)
+
+
+def _timed_fit(X, k, random_state, kmeans_params, sample_weight):
+    start = time.perf_counter()
+    model = fit_candidate(X, k, random_state, kmeans_params, sample_weight)
+    return model, time.perf_counter() - start
+
+
+class UniformMiniBatchKMeans(MiniBatchKMeans):
+    """MiniBatchKMeans trained on at most MINIBATCH_STEPS uniformly drawn batches.
+
+    sklearn's `fit` draws every batch with `choice(n, p=weights)`, which
+    costs O(n) per batch; here batches are drawn uniformly (row weights are
+    passed along with each batch instead) through `partial_fit`, so one
+    batch costs O(batch_size) and the fit time no longer grows with n.
+    Labels and inertia are then computed on every row, as `fit` does.
+    """
+
+    def fit(self, X, y=None, sample_weight=None):
+        rng = np.random.default_rng(self.random_state)
+        n = X.shape[0]
+        batch = min(self.batch_size, n)
+        steps = max(1, min(self.max_iter * n // batch, MINIBATCH_STEPS))
+        for _ in range(steps):
+            idx = rng.integers(0, n, batch)
+            self.partial_fit(X[idx], sample_weight=None if sample_weight is None else sample_weight[idx])
+        self.labels_ = self.predict(X)
+        self.inertia_ = -self.score(X, sample_weight=sample_weight)
+        self.n_iter_ = steps * batch / n
+        return self
+
+
+def make_kmeans(k, random_state=RANDOM_STATE, **params):
+    """KMeans, or UniformMiniBatchKMeans for `algorithm="minibatch"`; other params pass through."""
+    params = dict(params)
+    if params.get("algorithm") == "minibatch":
+        del params["algorithm"]
+        return UniformMiniBatchKMeans(n_clusters=k, random_state=random_state, **params)
+    if k == 1 and params.get("algorithm") == "elkan":
+        params["algorithm"] = "lloyd"  # Elkan's bounds need at least two centroids
+    params.pop("batch_size", None)
+    return KMeans(n_clusters=k, random_state=random_state, **params)
+
+
+def fit_candidate(X, k, random_state=RANDOM_STATE, kmeans_params=None, sample_weight=None):
+    """Fit one candidate model."""
+    model = make_kmeans(k, random_state, **(kmeans_params or {}))
+    return model.fit(X, sample_weight=sample_weight)
+
+
+# ================================
+# ---- ELBOW ----
+# ================================
+def pick_elbow(ks, wcss):
+    """Elbow of a decreasing inertia curve, falling back to k=2 (or 1) when there is none."""
+    ks = list(ks)
+    elbow = None
+    if len(ks) >= 3:
+        elbow = KneeLocator(ks, wcss, curve='convex', direction='decreasing').elbow
+    return int(elbow or min(2, max(ks)))
+
+
+def has_bent(ks, wcss, patience=PATIENCE, min_gain=MIN_GAIN):
+    """True once the elbow is stable and `patience` k values past it each gained little.
+
+    The elbow must be the same on the last `patience` prefixes of the curve,
+    and every k past it must improve inertia by less than `min_gain` of the
+    k=1 -> k=2 improvement.
+    """
+    if len(ks) < 3 + patience or wcss[0] <= wcss[1]:
+        return False
+    elbows = {pick_elbow(ks[:n], wcss[:n]) for n in range(len(ks) - patience + 1, len(ks) + 1)}
+    if len(elbows) != 1:
+        return False
+    elbow = elbows.pop()
+    tail = [i for i, k in enumerate(ks) if k > elbow]
+    if len(tail) < patience:
+        return False
+    first_gain = wcss[0] - wcss[1]
+    return all(wcss[i - 1] - wcss[i] < min_gain * first_gain for i in tail)
+
+
+# ================================
+# ---- SEARCH ----
+# ================================
+def search_k(X, max_k=MAX_K, random_state=RANDOM_STATE, n_jobs=None,
+             early_stop=False, kmeans_params=None, sample_weight=None, progress=None):
+    """Fit k = 1..max_k and pick the elbow.
+
+    `n_jobs=None` uses every core for large inputs and runs in-process for
+    small ones; `n_jobs=1` always runs in-process. With `early_stop`, k
+    values are fitted in waves of `n_jobs` and the sweep ends once
+    `has_bent` holds. `progress(stage, done, total)` is called after every
+    fitted k.
+    """
+    max_k = min(max_k, X.shape[0])
+    candidates = list(range(1, max_k + 1))
+    if n_jobs is None:
+        n_jobs = (os.cpu_count() or 1) if X.shape[0] >= PARALLEL_MIN_ROWS else 1
+    n_jobs = max(1, min(n_jobs, max_k))
+    wave = n_jobs if early_stop else max_k
+
+    fits = {}
+    stopped_early = False
+    pool = None
+    if n_jobs > 1:
+        pool = ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=_init_worker,
+            initargs=(X, sample_weight),
+        )
+    try:
+        for start in range(0, max_k, wave):
+            batch = candidates[start:start + wave]
+            futures = {}
+            if pool is not None:
+                futures = {k: pool.submit(_fit_shared, k, random_state, kmeans_params) for k in batch}
+            for k in batch:
+                if pool is None:
+                    fits[k] = _timed_fit(X, k, random_state, kmeans_params, sample_weight)
+                else:
+                    fits[k] = futures[k].result()
+                if progress is not None:
+                    progress("k-search", len(fits), max_k)
+            ks = sorted(fits)
+            if early_stop and ks[-1] < max_k and has_bent(ks, [fits[k][0].inertia_ for k in ks]):
+                stopped_early = True
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    ks = sorted(fits)
+    models = {k: fits[k][0] for k in ks}
+    wcss = [models[k].inertia_ for k in ks]
+    return KSearchResult(k=pick_elbow(ks, wcss), ks=ks, wcss=wcss, models=models,
+                         stopped_early=stopped_early, seconds={k: fits[k][1] for k in ks})
@@ -0,0 +1,134 @@
+"""Compact in-memory representation of uploaded data and session arrays.
+
+- `compact_frame` stores low-cardinality text columns as categoricals and
+  downcasts numeric columns, but only where every value survives the cast
+  unchanged, so clustering results do not move.
+- `ArrayStore` optionally memory-maps large arrays (labels, row orders)
+  from a per-session temp directory that is removed with the store.
+- `memory_report` lists the bytes held by each session object.
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_RATIO = 0.5
+# Arrays at least this large are memory-mapped; unset/empty disables mapping.
+MMAP_MIN_BYTES = os.environ.get("CLUSTERLENS_MMAP_MIN_BYTES", str(64 << 20))
+
+
+# ================================
+# ---- COMPACT FRAMES ----
+# ================================
+def _downcast_float(col):
+    as32 = col.astype("float32")
+    same = (as32.astype("float64") == col) | col.isna()
+    return as32 if same.all() else col
+
+
+def compact_frame(df, category_ratio=CATEGORY_RATIO):
+    """Return `df` with categoricals and downcast numbers where that is lossless."""
+    out = {}
+    for name in df.columns:
+        col = df[name]
+        if pd.api.types.is_bool_dtype(col) or isinstance(col.dtype, pd.CategoricalDtype):
+            out[name] = col
+        elif pd.api.types.is_integer_dtype(col):
+            out[name] = pd.to_numeric(col, downcast="integer")
+        elif pd.api.types.is_float_dtype(col):
+            out[name] = _downcast_float(col)
+        elif pd.api.types.is_object_dtype(col) or pd.api.types.is_string_dtype(col):
+            n_unique = col.nunique(dropna=True)
+            out[name] = col.astype("category") if n_unique <= category_ratio * max(len(col), 1) else col
+        else:
+            out[name] = col
+    return pd.DataFrame(out, index=df.index)
+
+
+# ================================
+# ---- MEMORY-MAPPED ARRAYS ----
+# ================================
+class ArrayStore:
+    """Per-session directory of .npy files; large arrays come back memory-mapped.
+
+    Every put writes a new file, so memmaps handed out earlier (e.g. to a
+    table view of the previous result) keep their data; the replaced file
+    is unlinked, which POSIX systems defer until its last mapping closes.
+    The directory is deleted when the store is garbage-collected or
+    `cleanup()` is called.
+    """
+
+    def __init__(self, min_bytes=MMAP_MIN_BYTES):
+        self.min_bytes = int(min_bytes) if min_bytes not in (None, "") else None
+        self.directory = Path(tempfile.mkdtemp(prefix="clusterlens_session_"))
+        self._files = {}
+        self._versions = itertools.count()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def put(self, name, array):
+        """Store `array` under `name`; returns a read-only memmap if it is large enough."""
+        array = np.asarray(array)
+        old = self._files.pop(name, None)
+        if self.min_bytes is None or array.nbytes < self.min_bytes:
+            out = array
+        else:
+            path = self.directory / f"{name}-{next(self._versions)}.npy"
+            np.save(path, array)
+            self._files[name] = path
+            out = np.load(path, mmap_mode="r")
+        if old is not None:
+            try:
+                old.unlink(missing_ok=True)
+            except OSError:
+                pass  # still mapped on Windows; removed with the directory
+        return out
+
+    def cleanup(self):
+        self._finalizer()
+
+
+# ================================
+# ---- REPORT ----
+# ================================
+def nbytes(obj):
+    """Approximate bytes held by `obj` (deep for DataFrames; 0 on disk for memmaps)."""
+    if obj is None:
+        return 0
+    if isinstance(obj, np.memmap):
+        return 0
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sum(nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(nbytes(v) for v in obj)
+    if hasattr(obj, "__dict__"):
+        return sum(nbytes(v) for v in vars(obj).values() if isinstance(v, (np.ndarray, pd.DataFrame, pd.Series, dict)))
+    return 0
+
+
+def memory_report(objects):
+    """DataFrame of bytes per named object, largest first, with a Total row."""
+    rows = []
+    for name, obj in objects.items():
+        rows.append({
+            "Object": name,
+            "Type": type(obj).__name__,
+            "Bytes": nbytes(obj),
+            "Memory-mapped": isinstance(obj, np.memmap),
+        })
+    report = pd.DataFrame(rows, columns=["Object", "Type", "Bytes", "Memory-mapped"])
+    report = report.sort_values("Bytes", ascending=False, ignore_index=True)
+    total = pd.DataFrame([{"Object": "Total", "Type": "", "Bytes": report["Bytes"].sum(), "Memory-mapped": False}])
+    report = pd.concat([report, total], ignore_index=True)
+    report["MB"] = (report["Bytes"] / 2**20).round(2)
+    return report
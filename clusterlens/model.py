@@ -0,0 +1,152 @@
+"""Fitted-model artifact: everything needed to assign clusters to new rows.
+
+A `ClusterModel` bundles the feature schema, the categorical encoders,
+the imputation/scaling statistics and the centroids of one clustering
+result. It is saved as a single .npz (no pickle) and can be rebuilt from an
+in-memory `ClusterResult`, a streaming `StreamResult` or a file. New rows
+go through exactly the transform used at fit time; categories not seen
+during the fit are treated as missing (ordinal encoding) or get no
+indicator (sparse encoding).
+"""
+import io
+import json
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .encoding import SparseEncoder, classes_from_arrays, classes_to_arrays
+
+FORMAT_VERSION = 1
+MIME = "application/octet-stream"
+
+
+@dataclass
+class ClusterModel:
+    """Schema, encoders, scaling statistics and centroids of one clustering result."""
+    features: list
+    # design columns the centroids are expressed in
+    columns: list
+    centers: np.ndarray
+    encoding: str = "ordinal"
+    # ordinal encoding: classes of each label-encoded column, and per-column mean / scale
+    classes: dict = None
+    mean: np.ndarray = None
+    scale: np.ndarray = None
+    # sparse encoding
+    encoder: SparseEncoder = None
+
+    @property
+    def k(self):
+        return len(self.centers)
+
+    # ================================
+    # ---- BUILD ----
+    # ================================
+    @classmethod
+    def from_result(cls, result):
+        """Model of an in-memory `ClusterResult`."""
+        centers = np.asarray(result.kmeans.cluster_centers_, dtype="float64")
+        if result.encoder is not None:
+            return cls(features=list(result.features), columns=list(result.columns), centers=centers,
+                       encoding="sparse", encoder=result.encoder)
+        return cls(
+            features=list(result.features), columns=list(result.columns), centers=centers,
+            classes={c: np.asarray(le.classes_, dtype=object) for c, le in result.label_encoders.items()},
+            mean=np.asarray(result.scaler.mean_, dtype="float64"),
+            scale=np.asarray(result.scaler.scale_, dtype="float64"),
+        )
+
+    @classmethod
+    def from_stream(cls, result):
+        """Model of a streaming `StreamResult` (constant columns are already dropped)."""
+        keep = np.isin(result.features, result.columns)
+        return cls(
+            features=list(result.features), columns=list(result.columns),
+            centers=np.asarray(result.kmeans.cluster_centers_, dtype="float64"),
+            classes={c: np.asarray(le.classes_, dtype=object) for c, le in result.label_encoders.items()},
+            mean=np.asarray(result.mean, dtype="float64")[keep],
+            scale=np.asarray(result.scale, dtype="float64")[keep],
+        )
+
+    # ================================
+    # ---- TRANSFORM ----
+    # ================================
+    def check_schema(self, columns):
+        """Raise ValueError if any model feature is missing from `columns`."""
+        missing = [f for f in self.features if f not in set(columns)]
+        if missing:
+            raise ValueError(f"Missing feature column(s) for this model: {', '.join(map(str, missing))}")
+
+    def transform(self, df):
+        """Design matrix of new rows: dense for ordinal models, CSR for sparse ones."""
+        self.check_schema(df.columns)
+        if self.encoding == "sparse":
+            return self.encoder.transform(df[self.features])
+        X = np.empty((len(df), len(self.columns)))
+        for j, col in enumerate(self.columns):
+            if col in self.classes:
+                codes = pd.Index(self.classes[col]).get_indexer(df[col].astype(str)).astype("float64")
+                codes[codes < 0] = np.nan
+                X[:, j] = codes
+            else:
+                X[:, j] = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype="float64")
+        X = np.where(np.isnan(X), self.mean, X)
+        X -= self.mean
+        X /= self.scale
+        return X
+
+    def predict(self, df):
+        """Cluster of every row of `df`."""
+        from .scoring import nearest_centroid
+        return nearest_centroid(self.transform(df), self.centers)
+
+    # ================================
+    # ---- (DE)SERIALIZATION ----
+    # ================================
+    def _arrays(self):
+        meta = {
+            "version": FORMAT_VERSION, "features": list(self.features), "columns": list(self.columns),
+            "encoding": self.encoding,
+        }
+        arrays = {"centers": self.centers}
+        if self.encoding == "sparse":
+            meta["encoder"], encoder_arrays = self.encoder.to_state()
+            arrays.update((f"encoder_{name}", a) for name, a in encoder_arrays.items())
+        else:
+            meta["classes"] = list(self.classes)
+            arrays["mean"], arrays["scale"] = self.mean, self.scale
+            for i, col in enumerate(self.classes):
+                arrays[f"classes_{i}"], arrays[f"classes_missing_{i}"] = classes_to_arrays(self.classes[col])
+        arrays["meta"] = np.array(json.dumps(meta))
+        return arrays
+
+    def save(self, fileobj):
+        """Write the model as a compressed .npz to a path or binary file object."""
+        np.savez_compressed(fileobj, **self._arrays())
+
+    def to_bytes(self):
+        """The saved .npz as bytes (e.g. for a download button)."""
+        buf = io.BytesIO()
+        self.save(buf)
+        return buf.getvalue()
+
+    @classmethod
+    def load(cls, fileobj):
+        """Read a model written by `save`."""
+        with np.load(fileobj, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported model format version {meta.get('version')!r}.")
+            centers = data["centers"]
+            if meta["encoding"] == "sparse":
+                prefix = "encoder_"
+                encoder = SparseEncoder.from_state(
+                    meta["encoder"], {n[len(prefix):]: data[n] for n in data.files if n.startswith(prefix)}
+                )
+                return cls(features=meta["features"], columns=meta["columns"], centers=centers,
+                           encoding="sparse", encoder=encoder)
+            classes = {col: classes_from_arrays(data[f"classes_{i}"], data.get(f"classes_missing_{i}"))
+                       for i, col in enumerate(meta["classes"])}
+            return cls(features=meta["features"], columns=meta["columns"], centers=centers,
+                       classes=classes, mean=data["mean"], scale=data["scale"])
@@ -0,0 +1,140 @@
+"""Server-side pages of cluster rows: sort, filter and slice before rendering.
+
+`TableView` sits on a `ClusterIndex` and never hands a whole cluster to
+the browser. Sorting by a column uses an ordering computed once per
+(column, direction) for all rows: rows grouped by cluster, sorted within
+each cluster (missing values last), so every cluster is again one
+contiguous run at the index's bounds and a page is a slice of it. Filters
+become one vectorized mask over the column, applied to the run and cached
+per (cluster, sort, filters). Only the rows of the requested page are
+taken from the frame, so showing the first page costs the same whatever
+the cluster size.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .engine import is_categorical
+
+PAGE_SIZE = 100
+# orderings and filtered runs kept per view (each is one int array per row)
+MAX_ORDERINGS = 4
+MAX_RUNS = 16
+
+
+@dataclass(frozen=True)
+class Filter:
+    """Keep rows whose `column` lies in [low, high], is one of `values`, or contains `contains`."""
+    column: str
+    low: float = None
+    high: float = None
+    values: tuple = None
+    contains: str = None
+
+    def mask(self, series):
+        """Boolean array: which values of `series` pass."""
+        if self.values is not None:
+            return series.astype(str).isin(self.values).to_numpy()
+        if self.contains is not None:
+            return series.astype(str).str.contains(self.contains, case=False, regex=False).to_numpy(dtype=bool)
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64")
+        keep = ~np.isnan(values)
+        if self.low is not None:
+            keep &= values >= self.low
+        if self.high is not None:
+            keep &= values <= self.high
+        return keep
+
+
+@dataclass
+class Page:
+    """One page of a cluster's rows in view order."""
+    frame: pd.DataFrame
+    number: int
+    pages: int
+    # rows matching the filters, and position of the page's first row among them
+    total: int
+    start: int
+
+
+def _sort_key(series, ascending):
+    """Key that sorts `series` with missing values last in either direction."""
+    if not is_categorical(series):
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64")
+        return values if ascending else -values  # lexsort puts NaN last
+    codes, _ = pd.factorize(series, sort=True, use_na_sentinel=True)
+    key = codes.astype(np.int64) if ascending else -codes.astype(np.int64)
+    key[codes < 0] = np.iinfo(np.int64).max
+    return key
+
+
+class TableView:
+    """Sorted, filtered, paged access to the rows of each cluster of a ClusterIndex."""
+
+    def __init__(self, index):
+        self.index = index
+        self.orderings = OrderedDict()
+        self.runs = OrderedDict()
+
+    def ordering(self, column=None, ascending=True):
+        """Row positions grouped by cluster and sorted by `column` within each cluster."""
+        if column is None:
+            return self.index.order
+        key = (column, ascending)
+        if key not in self.orderings:
+            n = len(self.index.labels)
+            # lexsort is stable: ties keep the original row order
+            order = np.lexsort((_sort_key(self.index.df[column], ascending), self.index.labels))
+            self.orderings[key] = order.astype(np.int32 if n < 2**31 else np.int64)
+            while len(self.orderings) > MAX_ORDERINGS:
+                self.orderings.popitem(last=False)
+        self.orderings.move_to_end(key)
+        return self.orderings[key]
+
+    def rows(self, cluster, sort=None, ascending=True, filters=()):
+        """Original row positions of `cluster` in view order, after `filters`."""
+        start, stop = self.index.bounds[cluster]
+        run = self.ordering(sort, ascending)[start:stop]
+        filters = tuple(filters)
+        if not filters:
+            return run
+        key = (cluster, sort, ascending, filters)
+        if key not in self.runs:
+            keep = np.ones(len(run), dtype=bool)
+            for f in filters:
+                keep &= f.mask(self.index.df[f.column].iloc[run])
+            self.runs[key] = run[keep]
+            while len(self.runs) > MAX_RUNS:
+                self.runs.popitem(last=False)
+        self.runs.move_to_end(key)
+        return self.runs[key]
+
+    def page(self, cluster, number=0, size=PAGE_SIZE, sort=None, ascending=True, filters=(), columns=None):
+        """Page `number` (0-based, clipped to the last page) of `cluster`."""
+        rows = self.rows(cluster, sort, ascending, filters)
+        pages = max(1, -(-len(rows) // size))
+        number = int(np.clip(number, 0, pages - 1))
+        start = number * size
+        frame = self.index.df.iloc[rows[start:start + size]]
+        if columns is not None:
+            frame = frame[list(columns)]
+        return Page(frame=frame, number=number, pages=pages, total=len(rows), start=start)
+
+    # ---- filter widgets ----
+    def levels(self, column, limit):
+        """Sorted distinct values of a categorical column, or None if there are more than `limit`."""
+        series = self.index.df[column]
+        if not is_categorical(series):
+            return None
+        uniques = pd.unique(series.dropna().astype(str))
+        return sorted(uniques) if len(uniques) <= limit else None
+
+    def bounds(self, column):
+        """(min, max) of a numeric column, or None for categorical columns."""
+        series = self.index.df[column]
+        if is_categorical(series):
+            return None
+        values = pd.to_numeric(series, errors="coerce")
+        return float(values.min()), float(values.max())
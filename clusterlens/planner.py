@@ -0,0 +1,220 @@
+"""Size-aware choice of the KMeans variant, restarts and sampling, with an optional time budget.
+
+The planner looks at the design matrix (rows, columns, sparsity) and
+decides, with a reason for each decision:
+
+- the algorithm: mini-batch from MINIBATCH_MIN_ROWS rows; otherwise Lloyd
+  or Elkan. Elkan is only chosen if a short trial on a sample of the data
+  shows it running faster per iteration (it rarely does on sparse input or
+  when its n x k distance bounds would be large, so those skip the trial);
+- `n_init` restarts: one k-means++ restart, as sklearn's default;
+- whether k is chosen on a sample (`sampling.select_k`).
+
+On tables larger than TRIAL_ROWS the trial fit also calibrates a cost
+model (seconds per row x feature x centroid x iteration on this machine);
+smaller tables skip the trial and use a fixed estimate. With a wall-clock
+`budget`, smaller tables get extra restarts when the estimate leaves room
+for them, and the plan is tightened step by step until the estimate fits:
+choosing k on a smaller sample, mini-batch, then an iteration cap.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy import sparse
+
+from .ksearch import MAX_K, MINIBATCH_STEPS, PARALLEL_MIN_ROWS, RANDOM_STATE, make_kmeans
+from .sampling import REPEATS, SAMPLE_SIZE, use_sampling
+
+ALGORITHMS = ("auto", "lloyd", "elkan", "minibatch")
+MINIBATCH_MIN_ROWS = 1_000_000
+BATCH_SIZE = 4096
+# restarts a time budget may add: (rows up to, restarts); larger tables keep one
+N_INIT = ((10_000, 4), (100_000, 2))
+TRIAL_ROWS = 5_000
+# cost model of tables too small for a trial fit: seconds per row x feature x centroid x iteration, iterations
+UNIT_SECONDS = 5e-9
+TRIAL_ITERS = 50
+# Elkan must beat Lloyd per iteration by this factor in the trial
+ELKAN_GAIN = 0.9
+ELKAN_MAX_BOUNDS = 256 << 20
+MIN_SAMPLE = 2_000
+MAX_ITER = 300
+# fixed cost of one partial_fit call (input validation), independent of the batch
+STEP_SECONDS = 2e-3
+
+
+@dataclass
+class Plan:
+    """How one clustering run will be executed, and why."""
+    algorithm: str
+    n_init: int
+    sampling: bool
+    sample_size: int
+    max_iter: int = MAX_ITER
+    batch_size: int = None
+    estimated_seconds: float = 0.0
+    budget: float = None
+    reasons: list = field(default_factory=list)
+    # filled in by the engine once the run has finished
+    seconds: float = None
+
+    @property
+    def kmeans_params(self):
+        """Keyword arguments for `ksearch.make_kmeans`."""
+        params = {"algorithm": self.algorithm, "n_init": self.n_init, "max_iter": self.max_iter}
+        if self.algorithm == "minibatch":
+            params["batch_size"] = self.batch_size
+        return params
+
+    @property
+    def search_params(self):
+        """Parameters for the k-search: a search on samples runs Lloyd instead of mini-batch."""
+        params = self.kmeans_params
+        if self.sampling and self.algorithm == "minibatch":
+            params = {"algorithm": "lloyd", "n_init": self.n_init, "max_iter": self.max_iter}
+        return params
+
+    def describe(self):
+        """One-line summary of the plan."""
+        parts = [self.algorithm, f"n_init={self.n_init}"]
+        if self.sampling:
+            parts.append(f"k chosen on {self.sample_size:,}-row samples")
+        if self.max_iter < MAX_ITER:
+            parts.append(f"max_iter={self.max_iter}")
+        return ", ".join(parts)
+
+
+# ================================
+# ---- CALIBRATION ----
+# ================================
+def _trial(X, k, algorithm, random_state):
+    """(seconds per iteration, iterations) of fitting `k` centroids on X; best of two, as the first fit pays warm-up."""
+    best = None
+    for _ in range(2):
+        start = time.perf_counter()
+        model = make_kmeans(k, random_state, algorithm=algorithm, n_init=1).fit(X)
+        per_iter = (time.perf_counter() - start) / max(model.n_iter_, 1)
+        best = per_iter if best is None else min(best, per_iter)
+    return best, int(model.n_iter_)
+
+
+class _Cost:
+    """Seconds for `rows` rows x `centroids` total centroids x `iters` iterations."""
+
+    def __init__(self, unit, width, workers):
+        self.unit, self.width, self.workers = unit, width, workers
+
+    def __call__(self, rows, centroids, iters, parallel=True):
+        return self.unit * rows * self.width * centroids * iters / (self.workers if parallel else 1)
+
+
+# ================================
+# ---- PLANNER ----
+# ================================
+def plan_run(X, max_k=MAX_K, budget=None, algorithm="auto", sampling="auto", sample_size=SAMPLE_SIZE,
+             n_jobs=None, random_state=RANDOM_STATE):
+    """Plan the k-search and final fit on design matrix X; see the module docstring."""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {algorithm!r}; expected one of {ALGORITHMS}.")
+    auto = algorithm == "auto"
+    n, d = X.shape
+    max_k = max(1, min(max_k, n))
+    is_sparse = sparse.issparse(X)
+    width = max(X.nnz / n if is_sparse else d, 1.0)
+    centroids = max_k * (max_k + 1) // 2
+    if n_jobs is None:
+        n_jobs = (os.cpu_count() or 1) if n >= PARALLEL_MIN_ROWS else 1
+    workers = max(1, min(n_jobs, max_k))
+    reasons = []
+
+    # trial fit on a sample: calibrates the cost model and settles Lloyd vs Elkan;
+    # on small tables it would cost about as much as the run itself
+    k_trial = max(1, min(max(2, max_k // 2), n, TRIAL_ROWS))
+    if n > TRIAL_ROWS:
+        rng = np.random.default_rng(random_state)
+        S = X[rng.choice(n, size=TRIAL_ROWS, replace=False)]
+        lloyd, iters = _trial(S, k_trial, "lloyd", random_state)
+        # per row pass, k-means++ seeding included; larger tables are assumed to need as many passes
+        cost = _Cost(lloyd / (TRIAL_ROWS * width * k_trial), width, workers)
+    else:
+        iters = TRIAL_ITERS
+        cost = _Cost(UNIT_SECONDS, width, workers)
+
+    if algorithm != "auto":
+        reasons.append(f"{algorithm} requested")
+    elif n >= MINIBATCH_MIN_ROWS:
+        algorithm = "minibatch"
+        reasons.append(f"{n:,} rows (at least {MINIBATCH_MIN_ROWS:,}): mini-batch updates touch "
+                       f"{BATCH_SIZE:,} rows per step instead of all of them")
+    elif is_sparse:
+        algorithm = "lloyd"
+        reasons.append("sparse design matrix: Lloyd (Elkan's bounds rarely pay off on sparse rows)")
+    elif 2 * n * max_k * 8 > ELKAN_MAX_BOUNDS:
+        algorithm = "lloyd"
+        reasons.append(f"Lloyd: Elkan's n x k bounds would need {2 * n * max_k * 8 / 2**20:,.0f} MB")
+    elif n <= TRIAL_ROWS or k_trial < 2:
+        algorithm = "lloyd"
+        reasons.append(f"{n:,} rows: Lloyd (too small for Elkan's bounds to matter)")
+    else:
+        elkan, _ = _trial(S, k_trial, "elkan", random_state)
+        algorithm = "elkan" if elkan < ELKAN_GAIN * lloyd else "lloyd"
+        reasons.append(f"{algorithm}: a trial on {TRIAL_ROWS:,} rows ran Elkan at {elkan / lloyd:.2f}x "
+                       f"Lloyd's time per iteration")
+
+    reasons.append("n_init=1: one k-means++ restart, as sklearn's default")
+    plan = Plan(algorithm=algorithm, n_init=1, sampling=use_sampling(n, sampling),
+                sample_size=min(sample_size, n), budget=budget,
+                batch_size=BATCH_SIZE if algorithm == "minibatch" else None, reasons=reasons)
+    if plan.sampling and sampling == "auto":
+        reasons.append(f"k chosen on samples ({n:,} rows is above the sampling threshold)")
+
+    def fit_cost(rows, k_total, parallel=True, minibatch=True):
+        it = min(iters, plan.max_iter)
+        if minibatch and plan.algorithm == "minibatch":
+            # a bounded number of batches, plus two passes for the labels and inertia of every row
+            steps = min(rows * it // plan.batch_size, MINIBATCH_STEPS)
+            fits = k_total / max_k if k_total > max_k else 1
+            return cost(steps * plan.batch_size + 2 * rows, k_total, 1, parallel) + \
+                STEP_SECONDS * steps * fits / (workers if parallel else 1)
+        return cost(rows, k_total, it, parallel)
+
+    def estimate():
+        if plan.sampling:
+            search = fit_cost(plan.sample_size, centroids, minibatch=False) * plan.n_init * REPEATS
+            return search + fit_cost(n, max(max_k // 2, 1), parallel=False)
+        return fit_cost(n, centroids) * plan.n_init
+
+    plan.estimated_seconds = estimate()
+    if budget is None:
+        return plan
+
+    restarts = next((r for limit, r in N_INIT if n <= limit), 1)
+    if restarts > 1 and plan.algorithm != "minibatch" and plan.estimated_seconds * restarts <= budget:
+        plan.n_init = restarts
+        reasons.append(f"n_init={restarts}: the time budget leaves room for restarts on {n:,} rows")
+        plan.estimated_seconds = estimate()
+    if plan.estimated_seconds > budget and sampling == "auto" and n > MIN_SAMPLE:
+        plan.sampling = True
+        final = fit_cost(n, max(max_k // 2, 1), parallel=False)
+        per_row = cost(1, centroids, iters) * REPEATS
+        fit = int((budget - final) / per_row) if budget > final else MIN_SAMPLE
+        plan.sample_size = int(np.clip(fit, MIN_SAMPLE, min(sample_size, n)))
+        reasons.append(f"k chosen on {plan.sample_size:,}-row samples to fit the time budget")
+        plan.estimated_seconds = estimate()
+    if plan.estimated_seconds > budget and auto and plan.algorithm != "minibatch" \
+            and n > MINIBATCH_STEPS * BATCH_SIZE:
+        plan.algorithm, plan.batch_size = "minibatch", BATCH_SIZE
+        reasons.append("mini-batch to fit the time budget")
+        plan.estimated_seconds = estimate()
+    if plan.estimated_seconds > budget:
+        plan.max_iter = max(5, int(iters * budget / plan.estimated_seconds))
+        reasons.append(f"iterations capped at {plan.max_iter} to fit the time budget "
+                       f"(fits may stop before converging)")
+        plan.estimated_seconds = estimate()
+    if plan.estimated_seconds > budget:
+        reasons.append(f"the {budget:g}s budget cannot be met; estimated {plan.estimated_seconds:.1f}s")
+    else:
+        reasons.append(f"estimated {plan.estimated_seconds:.1f}s fits the {budget:g}s budget")
+    return plan
@@ -0,0 +1,102 @@
+"""Per-cluster statistics in one grouped pass.
+
+Categorical columns are factorized once (codes match LabelEncoder's sorted
+classes; missing values stay NaN instead of getting a code, so they are
+left out of the statistics just as for numeric columns); every column then
+goes through a single grouped describe() for count/mean/std/min/quartiles/
+max, categorical modes come from one bincount over (cluster, code) pairs,
+and categorical means are decoded with a vectorized nearest-code lookup.
+The resulting ClusterProfile is meant to be computed once per clustering
+result and reused.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from .engine import is_categorical
+
+
+@dataclass
+class ClusterProfile:
+    """Everything the Profiling tab shows for one clustering result."""
+    summary: pd.DataFrame
+    decoded: pd.DataFrame
+    stats: pd.DataFrame
+    importance: pd.Series
+    modes: pd.DataFrame = None
+    classes: dict = field(default_factory=dict)
+
+    def cluster_stats(self, cluster):
+        """describe()-shaped table (statistics x columns) for one cluster."""
+        return self.stats.loc[cluster].unstack(level=0)
+
+
+def nearest_code(values, codes):
+    """Nearest entry of sorted `codes` for each value; ties go to the lower code."""
+    codes = np.asarray(codes, dtype="float64")
+    values = np.asarray(values, dtype="float64")
+    if len(codes) == 1:
+        return np.zeros(len(values), dtype=np.intp)
+    right = np.clip(np.searchsorted(codes, values), 1, len(codes) - 1)
+    left = right - 1
+    return np.where(values - codes[left] <= codes[right] - values, left, right)
+
+
+def decode_means(summary, classes):
+    """Replace categorical means with the class whose code is nearest (None where all values are missing)."""
+    decoded = summary.copy()
+    for col, labels in classes.items():
+        if col in decoded:
+            means = decoded[col].to_numpy(dtype="float64")
+            idx = nearest_code(means, np.arange(len(labels)))
+            decoded[col] = np.where(np.isnan(means), None, np.asarray(labels, dtype=object)[idx])
+    return decoded
+
+
+def encode_frame(df):
+    """Factorize categorical columns; returns (encoded frame, {column: classes}).
+
+    Codes are floats with NaN for missing values.
+    """
+    encoded = {}
+    classes = {}
+    for col in df.columns:
+        if is_categorical(df[col]):
+            codes, uniques = pd.factorize(df[col].astype(str), sort=True)
+            encoded[col] = np.where(codes >= 0, codes, np.nan)
+            classes[col] = np.asarray(uniques, dtype=object)
+        else:
+            encoded[col] = df[col]
+    return pd.DataFrame(encoded, index=df.index), classes
+
+
+def compute_profile(df, labels, features, label_column="Cluster"):
+    """Profile every cluster of `df` in one grouped pass."""
+    columns = [c for c in df.columns if c != label_column]
+    encoded, classes = encode_frame(df[columns])
+    labels = np.asarray(labels)
+    groups = encoded.groupby(labels, sort=True)
+
+    stats = groups.describe()
+    stats.index.name = label_column
+    summary = stats.xs("mean", axis=1, level=1)[list(features)].round(2)
+    decoded = decode_means(summary, {c: classes[c] for c in features if c in classes})
+
+    modes = None
+    if classes:
+        clusters, inverse = np.unique(labels, return_inverse=True)
+        modes = {}
+        for col, labels_ in classes.items():
+            codes = encoded[col].to_numpy()
+            valid = ~np.isnan(codes)
+            counts = np.bincount(inverse[valid] * len(labels_) + codes[valid].astype(np.intp),
+                                 minlength=len(clusters) * len(labels_)).reshape(len(clusters), -1)
+            modes[col] = np.where(counts.any(axis=1), labels_[counts.argmax(axis=1)], None)
+        modes = pd.DataFrame(modes, index=pd.Index(clusters, name=label_column))
+
+    return ClusterProfile(
+        summary=summary, decoded=decoded, stats=stats,
+        importance=summary.var().sort_values(ascending=False),
+        modes=modes, classes=classes,
+    )
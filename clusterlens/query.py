@@ -0,0 +1,423 @@
+"""Local query execution for the assistant: the model plans, pandas computes.
+
+Instead of shipping rows to the model, a question is answered in three
+steps:
+
+1. the model sees only the column schema and returns a JSON plan:
+   filters, group-by columns, aggregates, or a short row listing;
+2. `parse_plan` validates it against a fixed vocabulary (known columns,
+   whitelisted operators and functions, bounded sizes) and `execute` runs
+   it on the full in-memory frame with vectorized masks and one groupby;
+   a `Cluster` column (numbered from 1, as on the Clustering page) is
+   available when clustering labels are passed;
+3. only the small result table goes back to the model, which phrases
+   the answer (streamed).
+
+When the model returns no plan or an invalid one, `ask_local` falls back
+to the dataset digest (`assistant.build_messages`).
+"""
+import json
+import time
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from . import diagnostics
+from .assistant import _number, _short, build_digest, build_messages, estimate_tokens, stream_reply
+from .engine import is_categorical
+from .paging import _sort_key
+
+CLUSTER_COLUMN = "Cluster"
+NUMERIC_OPS = ("==", "!=", "<", "<=", ">", ">=", "between", "in", "not in", "isna", "notna")
+TEXT_OPS = ("==", "!=", "in", "not in", "contains", "isna", "notna")
+NUMERIC_FUNCS = ("count", "sum", "mean", "median", "min", "max", "std", "nunique")
+TEXT_FUNCS = ("count", "nunique")
+MAX_FILTERS = 10
+MAX_GROUP_BY = 3
+MAX_AGGREGATES = 10
+MAX_IN_VALUES = 1000
+MAX_RESULT_ROWS = 50
+SCHEMA_LEVELS = 8
+
+PLAN_PROMPT = """You turn questions about a table into a JSON query plan that is executed locally on the full data.
+Reply with one JSON object and nothing else:
+{"filters": [{"column": <column>, "op": <operator>, "value": <value>}],
+ "group_by": [<column>, ...],
+ "aggregates": [{"func": <function>, "column": <column or null for a row count>}],
+ "columns": [<column>, ...],
+ "sort_by": <column or aggregate name such as "mean(income)">, "descending": true, "limit": <at most 50>}
+Operators: ==, !=, <, <=, >, >=, between (value [low, high]), in, not in (value a list), contains, isna, notna.
+Functions: count, sum, mean, median, min, max, std, nunique (text columns: count, nunique only).
+Use aggregates for statistics, or "columns" with sort_by/limit to list rows. Use only the listed columns.
+If the question cannot be answered from this table, reply {"plan": null}."""
+
+ANSWER_PROMPT = (
+    "You answer a question about a dataset. The numbers below were computed exactly on the full data "
+    "with the query plan shown. Answer briefly from them; do not invent other figures."
+)
+
+
+class QueryError(ValueError):
+    """A plan that does not validate against the table."""
+
+
+@dataclass
+class Condition:
+    column: str
+    op: str
+    value: object = None
+
+
+@dataclass
+class Aggregate:
+    func: str
+    column: str = None
+
+    @property
+    def name(self):
+        return f"{self.func}({self.column if self.column is not None else 'rows'})"
+
+
+@dataclass
+class QueryPlan:
+    """A validated plan; see PLAN_PROMPT for the JSON form."""
+    filters: list = field(default_factory=list)
+    group_by: list = field(default_factory=list)
+    aggregates: list = field(default_factory=list)
+    columns: list = field(default_factory=list)
+    sort_by: str = None
+    descending: bool = True
+    limit: int = MAX_RESULT_ROWS
+
+    def to_json(self):
+        return json.dumps(asdict(self), default=str)
+
+
+@dataclass
+class QueryResult:
+    """Output of one executed plan."""
+    plan: QueryPlan
+    frame: pd.DataFrame
+    n_rows: int
+    matched: int
+    # groups (or rows) before `limit` was applied
+    total: int
+    seconds: float
+
+    def to_text(self):
+        """The result as compact CSV for the model."""
+        cells = self.frame.map(lambda v: _number(v) if isinstance(v, (float, np.floating)) else _short(v))
+        text = cells.to_csv(index=False)
+        if self.total > len(self.frame):
+            text += f"(showing {len(self.frame)} of {self.total:,})\n"
+        return text
+
+
+@dataclass
+class Trace:
+    """How `ask_local` answered: the plan and its result, or why it fell back to the digest."""
+    plan: QueryPlan = None
+    result: QueryResult = None
+    error: str = None
+    fallback: bool = False
+    cached: bool = False
+    prompt_tokens: int = 0
+
+
+# ================================
+# ---- SCHEMA / VALIDATION ----
+# ================================
+def column_kinds(df, labels=None):
+    """{column: "numeric" | "text"}, plus the Cluster column when labels are given."""
+    kinds = {col: "text" if is_categorical(df[col]) else "numeric" for col in df.columns}
+    if labels is not None and CLUSTER_COLUMN not in kinds:
+        kinds[CLUSTER_COLUMN] = "numeric"
+    return kinds
+
+
+def schema_text(df, labels=None):
+    """One line per column for the planning prompt (a few levels for text columns)."""
+    lines = [f"{len(df):,} rows"]
+    for col, kind in column_kinds(df, labels).items():
+        if col == CLUSTER_COLUMN and labels is not None and col not in df.columns:
+            lines.append(f"- {col}: numeric, cluster number 1..{int(np.max(labels)) + 1}")
+            continue
+        line = f"- {col}: {kind}"
+        if kind == "text":
+            levels = df[col].dropna().astype(str).value_counts().index
+            shown = ", ".join(_short(v) for v in levels[:SCHEMA_LEVELS])
+            line += f" (e.g. {shown}{', ...' if len(levels) > SCHEMA_LEVELS else ''})"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _value(kind, op, value, problems, where):
+    if op in ("isna", "notna"):
+        return None
+    if op in ("in", "not in"):
+        if not isinstance(value, list) or not 0 < len(value) <= MAX_IN_VALUES:
+            problems.append(f"{where}: '{op}' needs a list of 1..{MAX_IN_VALUES} values")
+            return None
+        return [_value(kind, "==", v, problems, where) for v in value]
+    if op == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            problems.append(f"{where}: 'between' needs [low, high]")
+            return None
+        return [_value(kind, "<", v, problems, where) for v in value]
+    if kind == "text" or op == "contains":
+        return str(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        problems.append(f"{where}: {value!r} is not a number")
+        return None
+
+
+def parse_plan(text, kinds):
+    """QueryPlan from the model's reply, None if it declined; raises QueryError if invalid."""
+    start, stop = text.find("{"), text.rfind("}")
+    if start < 0 or stop < start:
+        raise QueryError("the reply contains no JSON object")
+    try:
+        data = json.loads(text[start:stop + 1])
+    except json.JSONDecodeError as e:
+        raise QueryError(f"the reply is not valid JSON ({e.msg})") from None
+    if not isinstance(data, dict):
+        raise QueryError("the plan must be a JSON object")
+    if "plan" in data:
+        if data["plan"] is None:
+            return None
+        data = data["plan"]
+        if not isinstance(data, dict):
+            raise QueryError("the plan must be a JSON object")
+
+    problems = []
+
+    def items(name):
+        """The list under `name` (missing or null: empty)."""
+        value = data.get(name)
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            problems.append(f"{name}: must be a list")
+            return []
+        return value
+
+    def column(name, where):
+        if name not in kinds:
+            problems.append(f"{where}: unknown column {name!r}")
+            return None
+        return name
+
+    filters = []
+    for i, f in enumerate(items("filters")):
+        where = f"filter {i + 1}"
+        if not isinstance(f, dict):
+            problems.append(f"{where}: must be an object with column, op and value")
+            continue
+        col = column(f.get("column"), where)
+        if col is None:
+            continue
+        op = f.get("op")
+        allowed = NUMERIC_OPS if kinds[col] == "numeric" else TEXT_OPS
+        if op not in allowed:
+            problems.append(f"{where}: operator {op!r} is not allowed on {kinds[col]} column {col!r}")
+            continue
+        filters.append(Condition(col, op, _value(kinds[col], op, f.get("value"), problems, where)))
+
+    group_by = [c for c in (column(c, "group_by") for c in items("group_by")) if c is not None]
+
+    aggregates = []
+    for i, a in enumerate(items("aggregates")):
+        where = f"aggregate {i + 1}"
+        if not isinstance(a, dict):
+            problems.append(f"{where}: must be an object")
+            continue
+        func, col = a.get("func"), a.get("column")
+        if col is None:
+            if func != "count":
+                problems.append(f"{where}: {func!r} needs a column")
+            aggregates.append(Aggregate("count"))
+            continue
+        if column(col, where) is None:
+            continue
+        allowed = NUMERIC_FUNCS if kinds[col] == "numeric" else TEXT_FUNCS
+        if func not in allowed:
+            problems.append(f"{where}: function {func!r} is not allowed on {kinds[col]} column {col!r}")
+            continue
+        aggregates.append(Aggregate(func, col))
+
+    columns = [c for c in (column(c, "columns") for c in items("columns")) if c is not None]
+    if group_by and not aggregates:
+        aggregates = [Aggregate("count")]
+
+    outputs = set(group_by) | {a.name for a in aggregates} if aggregates else set(columns or kinds)
+    sort_by = data.get("sort_by")
+    if sort_by is not None and sort_by not in outputs:
+        if not aggregates and sort_by in kinds:
+            columns.append(sort_by)  # a listing shows the column it is sorted by
+        else:
+            problems.append(f"sort_by: {sort_by!r} is not an output column ({', '.join(sorted(outputs))})")
+
+    limit = data.get("limit")
+    if limit is None:
+        limit = MAX_RESULT_ROWS
+    elif isinstance(limit, bool) or not isinstance(limit, (int, float)) or not np.isfinite(limit) \
+            or limit != int(limit):
+        problems.append(f"limit: {limit!r} is not a whole number")
+        limit = MAX_RESULT_ROWS
+    if len(filters) > MAX_FILTERS or len(group_by) > MAX_GROUP_BY or len(aggregates) > MAX_AGGREGATES:
+        problems.append(f"at most {MAX_FILTERS} filters, {MAX_GROUP_BY} group_by columns "
+                        f"and {MAX_AGGREGATES} aggregates")
+    if problems:
+        raise QueryError("; ".join(problems))
+    return QueryPlan(filters=filters, group_by=group_by, aggregates=aggregates, columns=columns,
+                     sort_by=sort_by, descending=bool(data.get("descending", True)),
+                     limit=int(np.clip(limit, 1, MAX_RESULT_ROWS)))
+
+
+# ================================
+# ---- EXECUTION ----
+# ================================
+def _series(df, labels, col):
+    if col not in df.columns:  # the virtual cluster column
+        return pd.Series(np.asarray(labels) + 1, index=df.index, name=col)
+    return df[col]
+
+
+def _mask(series, kind, op, value):
+    """Boolean array of the rows of `series` that satisfy (op, value)."""
+    if op == "isna":
+        return series.isna().to_numpy()
+    if op == "notna":
+        return series.notna().to_numpy()
+    if kind == "numeric":
+        x = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64")
+        if op == "between":
+            return (x >= value[0]) & (x <= value[1])
+        if op in ("in", "not in"):
+            hit = np.isin(x, value)
+            return hit if op == "in" else ~hit & ~np.isnan(x)
+        return {"==": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+                ">": np.greater, ">=": np.greater_equal}[op](x, value) & ~np.isnan(x)
+    # text: evaluate on the distinct values only, then broadcast through the codes (case-insensitive)
+    codes, uniques = pd.factorize(series)
+    text = pd.Series(np.asarray(uniques, dtype=object).astype(str)).str.casefold()
+    if op == "contains":
+        hits = text.str.contains(value.casefold(), regex=False).to_numpy()
+    elif op in ("in", "not in"):
+        hits = text.isin([v.casefold() for v in value]).to_numpy()
+        hits = hits if op == "in" else ~hits
+    else:
+        hits = (text == value.casefold()).to_numpy()
+        hits = hits if op == "==" else ~hits
+    out = np.zeros(len(codes), dtype=bool)
+    valid = codes >= 0
+    out[valid] = hits[codes[valid]]
+    return out
+
+
+def _listing(df, plan, labels, rows, kinds):
+    """First `plan.limit` rows in sort order: the top rows are picked by partition before any are taken."""
+    if plan.sort_by is not None:
+        key = _sort_key(_series(df, labels, plan.sort_by).iloc[rows], not plan.descending)
+        top = np.argpartition(key, plan.limit)[:plan.limit] if len(rows) > plan.limit else np.arange(len(rows))
+        # stable: ties keep the original row order
+        rows = rows[top[np.lexsort((top, key[top]))]]
+    columns = plan.columns or [c for c in kinds if c in df.columns]
+    return pd.DataFrame({c: _series(df, labels, c).iloc[rows[:plan.limit]].to_numpy() for c in columns})
+
+
+def _aggregate(df, plan, labels, rows):
+    needed = list(dict.fromkeys(plan.group_by + [a.column for a in plan.aggregates if a.column]))
+    frame = pd.DataFrame({c: _series(df, labels, c).iloc[rows].to_numpy() for c in needed},
+                         index=pd.RangeIndex(len(rows)))
+    if not plan.group_by:
+        return pd.DataFrame([{a.name: len(frame) if a.column is None else frame[a.column].agg(a.func)
+                              for a in plan.aggregates}])
+    grouped = frame.groupby(plan.group_by, observed=True, sort=True, dropna=False)
+    out = pd.concat([grouped.size() if a.column is None else grouped[a.column].agg(a.func)
+                     for a in plan.aggregates], axis=1, keys=[a.name for a in plan.aggregates])
+    out = out.reset_index()
+    if plan.sort_by is not None:
+        out = out.sort_values(plan.sort_by, ascending=not plan.descending, kind="stable", na_position="last")
+    return out
+
+
+def execute(df, plan, labels=None):
+    """Run a validated plan on every row of `df`; returns a QueryResult of at most `plan.limit` rows."""
+    start = time.perf_counter()
+    kinds = column_kinds(df, labels)
+    mask = np.ones(len(df), dtype=bool)
+    for f in plan.filters:
+        mask &= _mask(_series(df, labels, f.column), kinds[f.column], f.op, f.value)
+    rows = np.flatnonzero(mask)
+    if plan.aggregates:
+        out = _aggregate(df, plan, labels, rows)
+        total = len(out)
+    else:
+        out, total = _listing(df, plan, labels, rows, kinds), len(rows)
+    return QueryResult(plan=plan, frame=out.head(plan.limit).reset_index(drop=True), n_rows=len(df),
+                       matched=len(rows), total=total, seconds=time.perf_counter() - start)
+
+
+# ================================
+# ---- ASSISTANT FLOW ----
+# ================================
+def plan_messages(df, question, labels=None):
+    return [("system", PLAN_PROMPT), ("human", f"Columns:\n{schema_text(df, labels)}\n\nQuestion: {question}")]
+
+
+def answer_messages(question, result):
+    body = (f"Question: {question}\n\nQuery plan: {result.plan.to_json()}\n"
+            f"Rows: {result.n_rows:,}, matching the filters: {result.matched:,}\n\nResult:\n{result.to_text()}")
+    return [("system", ANSWER_PROMPT), ("human", body)]
+
+
+def _tokens(messages):
+    return sum(estimate_tokens(text) for _, text in messages)
+
+
+def ask_local(model, df, question, labels=None, digest=None, cache=None, dataset=None, trace=None):
+    """Stream the answer to `question`, computed locally where the model can plan it.
+
+    `trace` (a Trace) is filled in with the plan, its result and the prompt
+    tokens sent. Without a usable plan the question goes to the model with
+    `digest` instead. Replies are cached like `assistant.ask`.
+    """
+    trace = trace if trace is not None else Trace()
+    if cache is not None:
+        cached = cache.get(dataset, question)
+        if cached is not None:
+            trace.cached = True
+            yield cached
+            return
+
+    messages = plan_messages(df, question, labels)
+    trace.prompt_tokens = _tokens(messages)
+    with diagnostics.stage("plan request", tokens=trace.prompt_tokens):
+        reply = model.invoke(messages)
+    try:
+        trace.plan = parse_plan(str(getattr(reply, "content", reply)), column_kinds(df, labels))
+        if trace.plan is not None:
+            with diagnostics.stage("query execution", df) as span:
+                trace.result = execute(df, trace.plan, labels)
+                span.args["matched"] = trace.result.matched
+    except (QueryError, TypeError, ValueError) as e:
+        trace.plan, trace.error = None, str(e)
+
+    if trace.result is not None:
+        messages = answer_messages(question, trace.result)
+    else:
+        trace.fallback = True
+        messages = build_messages(digest if digest is not None else build_digest(df), question)
+    trace.prompt_tokens += _tokens(messages)
+
+    parts = []
+    with diagnostics.stage("reply streaming", tokens=_tokens(messages)):
+        for text in stream_reply(model, messages):
+            parts.append(text)
+            yield text
+    if cache is not None:
+        cache.put(dataset, question, "".join(parts))
@@ -0,0 +1,211 @@
+"""PCA-reduced clustering and sampled 2-D projections.
+
+With `cluster_data(..., pca=0.9)` the k-search and the final fit run on the
+leading principal components of the scaled design matrix instead of all
+of its columns, keeping the fewest components whose explained variance
+reaches the target:
+
+- the components are estimated on at most FIT_ROWS random rows, then every
+  row is projected with one matrix product. Dense input uses the exact
+  covariance eigendecomposition (cheap while rows >> columns); sparse input
+  uses randomized truncated SVD (no centring, so the matrix stays sparse),
+  widened until the target is reached;
+- the fitted centroids are mapped back to the full space. They lie in the
+  component subspace, so a row's nearest back-mapped centroid is its
+  nearest centroid in the reduced space: saved models, warm-start states
+  and scoring work on full rows unchanged, and the final inertia is the
+  reduced one plus the variance the components leave out;
+- `ReductionReport` says how many components were kept, and compares one
+  fit at the chosen k in both spaces on a COMPARE_ROWS-row sample: the
+  speedup and the adjusted Rand agreement of the two labelings.
+
+`project` draws at most `per_cluster` rows of every cluster and places
+them (and the centroids) on the first two principal components of that
+sample, for a scatter whose cost does not grow with the table.
+"""
+import time
+from dataclasses import dataclass
+
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import PCA, TruncatedSVD
+from sklearn.metrics import adjusted_rand_score
+
+from .ksearch import RANDOM_STATE, make_kmeans
+
+VARIANCE_TARGET = 0.9
+FIT_ROWS = 100_000
+COMPARE_ROWS = 20_000
+MIN_COMPONENTS = 2
+# sparse input: first number of SVD components tried, and the most ever used
+SVD_START = 16
+SVD_MAX = 512
+POINTS_PER_CLUSTER = 2_000
+
+
+@dataclass
+class Reduction:
+    """Map between the scaled design matrix and its leading principal components."""
+    # zeros for sparse input (the SVD is not centred)
+    mean: np.ndarray
+    components: np.ndarray
+    explained: np.ndarray
+
+    @property
+    def n_components(self):
+        return len(self.components)
+
+    def transform(self, X):
+        return np.asarray(X @ self.components.T) - self.mean @ self.components.T
+
+    def inverse(self, Z):
+        return Z @ self.components + self.mean
+
+    def residual(self, X, Z):
+        """Squared distance of all rows of X to the component subspace (Z = transform(X))."""
+        if sparse.issparse(X):
+            total = float(X.multiply(X).sum())  # the mean is zero: the SVD is not centred
+        else:
+            total = float(((X - self.mean) ** 2).sum())
+        return max(total - float((Z ** 2).sum()), 0.0)
+
+
+@dataclass
+class ReductionReport:
+    """What the reduction kept and what it bought."""
+    n_features: int
+    n_components: int
+    # explained variance of the kept components, and the target
+    variance: float
+    target: float
+    solver: str
+    fit_rows: int
+    seconds: float
+    # one fit at the chosen k on a sample, in both spaces
+    compare_rows: int = None
+    full_seconds: float = None
+    reduced_seconds: float = None
+    # adjusted Rand index of the full-space labels against the result's labels on the sample
+    agreement: float = None
+
+    @property
+    def speedup(self):
+        if not self.full_seconds or not self.reduced_seconds:
+            return None
+        return self.full_seconds / self.reduced_seconds
+
+
+# ================================
+# ---- FIT ----
+# ================================
+def _sample(n, size, rng):
+    return np.sort(rng.choice(n, size=size, replace=False)) if size < n else np.arange(n)
+
+
+def fit_reduction(X, target=VARIANCE_TARGET, fit_rows=FIT_ROWS, random_state=RANDOM_STATE):
+    """(Reduction, solver) keeping the fewest components that explain `target` of the variance."""
+    if not 0 < target <= 1:
+        raise ValueError(f"The explained-variance target must be in (0, 1]; got {target}.")
+    n, d = X.shape
+    rng = np.random.default_rng(random_state)
+    S = X[_sample(n, min(fit_rows, n), rng)]
+    limit = min(d, S.shape[0])
+    if not sparse.issparse(X):
+        pca = PCA(svd_solver="covariance_eigh").fit(S)
+        ratio = pca.explained_variance_ratio_
+        m = int(np.clip(np.searchsorted(np.cumsum(ratio), target - 1e-12) + 1, min(MIN_COMPONENTS, limit), limit))
+        return Reduction(mean=pca.mean_, components=pca.components_[:m], explained=ratio[:m]), "covariance"
+
+    m = min(SVD_START, limit - 1)
+    while True:
+        svd = TruncatedSVD(n_components=max(m, 1), algorithm="randomized", random_state=random_state).fit(S)
+        ratio = svd.explained_variance_ratio_
+        cumulative = np.cumsum(ratio)
+        if cumulative[-1] >= target or m >= min(SVD_MAX, limit - 1):
+            break
+        m = min(2 * m, SVD_MAX, limit - 1)
+    keep = int(np.clip(np.searchsorted(cumulative, target - 1e-12) + 1, min(MIN_COMPONENTS, m), m))
+    return Reduction(mean=np.zeros(d), components=svd.components_[:keep], explained=ratio[:keep]), "randomized SVD"
+
+
+def reduce(X, target=VARIANCE_TARGET, fit_rows=FIT_ROWS, random_state=RANDOM_STATE):
+    """(Reduction, X projected onto it, ReductionReport) for design matrix X."""
+    start = time.perf_counter()
+    reduction, solver = fit_reduction(X, target, fit_rows, random_state)
+    Z = reduction.transform(X)
+    report = ReductionReport(
+        n_features=X.shape[1], n_components=reduction.n_components,
+        variance=float(reduction.explained.sum()), target=target, solver=solver,
+        fit_rows=min(fit_rows, X.shape[0]), seconds=time.perf_counter() - start,
+    )
+    return reduction, Z, report
+
+
+def lift(model, reduction, extra_inertia=0.0):
+    """A KMeans in the full space with `model`'s centroids mapped back from the reduced one."""
+    from .cache import _restore_kmeans
+    return _restore_kmeans(reduction.inverse(model.cluster_centers_), model.labels_,
+                           float(model.inertia_) + extra_inertia, getattr(model, "n_iter_", 0))
+
+
+def compare_fits(X, Z, labels, k, report, kmeans_params=None, compare_rows=COMPARE_ROWS,
+                 random_state=RANDOM_STATE):
+    """Fill in `report` with one fit at `k` in the full (X) and reduced (Z) space on a shared sample."""
+    rng = np.random.default_rng(random_state)
+    rows = _sample(X.shape[0], min(compare_rows, X.shape[0]), rng)
+    params = {**(kmeans_params or {}), "n_init": 1}
+    seconds = {}
+    for name, data in (("full", X[rows]), ("reduced", Z[rows])):
+        start = time.perf_counter()
+        model = make_kmeans(k, random_state, **params).fit(data)
+        seconds[name] = time.perf_counter() - start
+        if name == "full":
+            full_labels = model.labels_
+    report.compare_rows = len(rows)
+    report.full_seconds, report.reduced_seconds = seconds["full"], seconds["reduced"]
+    report.agreement = float(adjusted_rand_score(full_labels, np.asarray(labels)[rows]))
+    return report
+
+
+# ================================
+# ---- 2-D PROJECTION ----
+# ================================
+@dataclass
+class Projection:
+    """Sampled rows (and the centroids) on the first two principal components of the sample."""
+    points: np.ndarray
+    labels: np.ndarray
+    # original positions of the sampled rows
+    rows: np.ndarray
+    centers: np.ndarray
+    explained: np.ndarray
+
+
+def stratified_rows(labels, per_cluster=POINTS_PER_CLUSTER, random_state=RANDOM_STATE):
+    """Sorted positions of at most `per_cluster` random rows of every cluster."""
+    labels = np.asarray(labels)
+    rng = np.random.default_rng(random_state)
+    # one random key per row; a cluster's `per_cluster` smallest keys are its sample
+    order = np.lexsort((rng.random(len(labels)), labels))
+    clusters, starts, counts = np.unique(labels[order], return_index=True, return_counts=True)
+    picks = [order[s:s + min(c, per_cluster)] for s, c in zip(starts, counts)]
+    return np.sort(np.concatenate(picks)) if picks else np.empty(0, dtype=np.int64)
+
+
+def project(model, df, labels, per_cluster=POINTS_PER_CLUSTER, random_state=RANDOM_STATE):
+    """Projection of a stratified sample of `df`, encoded with ClusterModel `model`."""
+    rows = stratified_rows(labels, per_cluster, random_state)
+    X = model.transform(df.iloc[rows])
+    if sparse.issparse(X):
+        basis = TruncatedSVD(n_components=2, random_state=random_state).fit(X)
+        mean = np.zeros(X.shape[1])
+    else:
+        basis = PCA(n_components=min(2, *X.shape), random_state=random_state).fit(X)
+        mean = basis.mean_
+    points = np.asarray(X @ basis.components_.T) - mean @ basis.components_.T
+    centers = (model.centers - mean) @ basis.components_.T
+    if points.shape[1] < 2:
+        points = np.column_stack([points, np.zeros(len(points))])
+        centers = np.column_stack([centers, np.zeros(len(centers))])
+    return Projection(points=points, labels=np.asarray(labels)[rows], rows=rows, centers=centers,
+                      explained=basis.explained_variance_ratio_)
@@ -0,0 +1,137 @@
+"""Choose k on a sample of the rows, then fit the final model once on all of them.
+
+Two ways to draw the sample:
+
+- "stratified": rows are binned by their distance from the data mean and each
+  bin contributes in proportion to its size, so sparse outer regions are not
+  lost to chance;
+- "coreset": a lightweight coreset (Bachem et al., 2018). Rows are drawn with
+  probability mixing uniform and squared distance to the mean, and weighted by
+  the inverse of that probability.
+
+Either way the weights sum to roughly n, so the sampled inertia curve is on
+the same scale as the full-data one. The elbow search is repeated on
+independent samples as a confidence check, and the sample-fitted centroids
+are scored on the full data for a few k as a spot check.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .encoding import row_sq_dist_to_mean
+from .ksearch import MAX_K, RANDOM_STATE, search_k
+
+SAMPLE_MIN_ROWS = 200_000
+SAMPLE_SIZE = 20_000
+METHODS = ("stratified", "coreset")
+STRATA = 10
+REPEATS = 3
+MIN_AGREEMENT = 2 / 3
+# Sample growth when the repeats disagree on k.
+MAX_GROWTH = 4
+
+
+@dataclass
+class SamplingReport:
+    """How k was chosen on samples and how well the sampled curve matches the full data."""
+    method: str
+    n_rows: int
+    sample_size: int
+    votes: list
+    agreement: float
+    confident: bool
+    ks: list
+    wcss: list
+    spot_check: dict = field(default_factory=dict)
+
+    @property
+    def max_deviation(self):
+        """Largest relative gap between sampled and full-data inertia in the spot check."""
+        return max(self.spot_check.values(), default=0.0)
+
+
+def use_sampling(n_rows, sampling="auto"):
+    """Resolve the per-dataset on/off switch: True, False or "auto" (on above SAMPLE_MIN_ROWS)."""
+    if sampling == "auto":
+        return n_rows >= SAMPLE_MIN_ROWS
+    return bool(sampling)
+
+
+# ================================
+# ---- SAMPLERS ----
+# ================================
+def draw_sample(X, size, method="stratified", rng=None):
+    """Return (row indices, weights) for a sample of `size` rows."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown sampling method {method!r}; expected one of {METHODS}.")
+    rng = rng if rng is not None else np.random.default_rng(RANDOM_STATE)
+    n = X.shape[0]
+    size = min(size, n)
+    dist = row_sq_dist_to_mean(X)
+
+    if method == "coreset":
+        q = 0.5 / n + 0.5 * dist / dist.sum() if dist.sum() > 0 else np.full(n, 1.0 / n)
+        idx = rng.choice(n, size=size, replace=True, p=q / q.sum())
+        return idx, 1.0 / (size * q[idx])
+
+    edges = np.quantile(dist, np.linspace(0, 1, STRATA + 1)[1:-1])
+    strata = np.searchsorted(edges, dist)
+    # random priority within each stratum; take each stratum's quota from the front
+    order = np.lexsort((rng.random(n), strata))
+    counts = np.bincount(strata, minlength=STRATA)
+    quotas = np.floor(size * counts / n).astype(int)
+    quotas[np.argsort(-(size * counts / n - quotas))[:size - quotas.sum()]] += 1
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    idx = np.concatenate([order[s:s + q] for s, q in zip(starts, quotas)])
+    return idx, np.full(len(idx), n / len(idx))
+
+
+# ================================
+# ---- K SELECTION ----
+# ================================
+def select_k(X, sample_size=SAMPLE_SIZE, method="stratified", repeats=REPEATS,
+             min_agreement=MIN_AGREEMENT, max_k=MAX_K, random_state=RANDOM_STATE, n_jobs=None,
+             kmeans_params=None, progress=None):
+    """Pick k on `repeats` independent samples.
+
+    When fewer than `min_agreement` of the repeats agree, the sample size is
+    doubled (up to MAX_GROWTH times) and the vote is rerun. Returns
+    (k, the KSearchResult of a sample that voted for k, SamplingReport); its
+    centroids seed the single full-data fit. `progress(stage, done, total)`
+    is called after every k fitted on every sample.
+    """
+    rng = np.random.default_rng(random_state)
+    size = min(sample_size, X.shape[0])
+    limit = min(sample_size * MAX_GROWTH, X.shape[0])
+    while True:
+        searches = []
+        for i in range(repeats):
+            idx, weights = draw_sample(X, size, method, rng)
+            on_fit = None
+            if progress is not None:
+                def on_fit(stage, done, total, i=i):
+                    progress(f"k-search on {size:,}-row sample {i + 1}/{repeats}", done, total)
+            searches.append(search_k(X[idx], max_k=max_k, random_state=random_state, n_jobs=n_jobs,
+                                     kmeans_params=kmeans_params, sample_weight=weights, progress=on_fit))
+        votes = [s.k for s in searches]
+        k, count = Counter(votes).most_common(1)[0]
+        agreement = count / len(votes)
+        if agreement >= min_agreement or size >= limit:
+            break
+        size = min(size * 2, limit)
+
+    chosen = next(s for s in searches if s.k == k)
+    spot_ks = [c for c in (k - 1, k, k + 1) if c in chosen.models]
+    spot_check = {}
+    for c in spot_ks:
+        full = -chosen.models[c].score(X)
+        sampled = chosen.models[c].inertia_
+        spot_check[c] = abs(sampled - full) / full if full > 0 else 0.0
+
+    report = SamplingReport(
+        method=method, n_rows=X.shape[0], sample_size=size, votes=votes, agreement=agreement,
+        confident=agreement >= min_agreement, ks=chosen.ks, wcss=chosen.wcss,
+        spot_check=spot_check,
+    )
+    return k, chosen, report
@@ -0,0 +1,188 @@
+"""Batch scoring: assign clusters to new CSV/Parquet files with a saved model.
+
+Rows are read in chunks (`stream.iter_chunks`), transformed with the
+model's own encoders and scaler, and assigned to the nearest centroid with
+one matrix product per block: argmin_c (|c|^2 - 2 x.c), which needs no
+per-row Python work and no n x k distance matrix larger than one block.
+Chunks are scored in a process pool (the model is shipped once per worker)
+while the parent reads ahead and writes results back in input order, so
+memory stays bounded by the chunk size times the number of workers.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from threadpoolctl import threadpool_limits
+
+from .stream import CHUNKSIZE, iter_chunks
+
+# rows per matrix product inside nearest_centroid
+BLOCK_ROWS = 65_536
+# most rows a Parquet output holds back while some column has had no value yet
+SCHEMA_ROWS = 500_000
+
+
+@dataclass
+class ScoreReport:
+    """Rows scored, time taken and rows per cluster for one batch-scoring run."""
+    n_rows: int
+    seconds: float
+    counts: np.ndarray
+    output: Path = None
+
+    @property
+    def rows_per_second(self):
+        return self.n_rows / self.seconds if self.seconds > 0 else float("inf")
+
+
+# ================================
+# ---- ASSIGNMENT ----
+# ================================
+def nearest_centroid(X, centers, block_rows=BLOCK_ROWS):
+    """Index of the nearest row of `centers` for every row of X (dense or sparse)."""
+    centers = np.asarray(centers, dtype="float64")
+    half_norms = 0.5 * np.einsum("ij,ij->i", centers, centers)
+    n = X.shape[0]
+    labels = np.empty(n, dtype=np.int32)
+    for start in range(0, n, block_rows):
+        block = X[start:start + block_rows]
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2; |x|^2 does not change the argmin
+        scores = block @ centers.T
+        scores = np.asarray(scores) - half_norms
+        labels[start:start + block_rows] = scores.argmax(axis=1)
+    return labels
+
+
+# ================================
+# ---- WORKERS ----
+# ================================
+_MODEL = None
+
+
+def _init_worker(model):
+    """Receive the model once per worker and keep BLAS to one thread."""
+    global _MODEL
+    _MODEL = model
+    threadpool_limits(1)
+
+
+def _score_chunk(chunk):
+    return _MODEL.predict(chunk)
+
+
+# ================================
+# ---- WRITERS ----
+# ================================
+class _Writer:
+    """Append labelled chunks to a CSV or Parquet file (chosen by suffix).
+
+    Parquet goes through pyarrow's writer; CSV through pandas, which quotes
+    only the fields that need it, like the other CSV exports (pyarrow
+    quotes every string and header field).
+
+    A Parquet file's schema is fixed when it is opened, so chunks are held
+    back until every column has had a value (a column that is empty in the
+    first chunk would otherwise be typed from nothing), or until
+    SCHEMA_ROWS rows are waiting; columns still empty then are written as
+    strings.
+    """
+
+    def __init__(self, path, label_column):
+        self.path = Path(path)
+        self.label_column = label_column
+        self.parquet = self.path.suffix.lower() in (".parquet", ".pq")
+        self.writer = self.schema = None
+        # Parquet: tables not written yet, and the type of every column seen with a value
+        self.pending, self.types = [], {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write(self, chunk, labels):
+        chunk = chunk.assign(**{self.label_column: labels})
+        if not self.parquet:
+            header = self.writer is None
+            if header:
+                self.writer = open(self.path, "w", newline="", encoding="utf-8")
+            chunk.to_csv(self.writer, index=False, header=header)
+            return
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if self.writer is not None:
+            self.writer.write_table(table.cast(self.schema))
+            return
+        self.pending.append(table)
+        for field, column in zip(table.schema, table.columns):
+            if column.null_count < len(column):
+                self.types.setdefault(field.name, field.type)
+        if len(self.types) == table.num_columns or sum(t.num_rows for t in self.pending) >= SCHEMA_ROWS:
+            self._open()
+
+    def _open(self):
+        first = self.pending[0].schema
+        self.schema = pa.schema(
+            [pa.field(f.name, self.types.get(f.name, pa.string() if pa.types.is_null(f.type) else f.type))
+             for f in first],
+            metadata=first.metadata,
+        )
+        self.writer = pq.ParquetWriter(self.path, self.schema)
+        for table in self.pending:
+            self.writer.write_table(table.cast(self.schema))
+        self.pending = []
+
+    def close(self):
+        if self.writer is None and self.pending:
+            self._open()
+        if self.writer is not None:
+            self.writer.close()
+
+
+# ================================
+# ---- FILES ----
+# ================================
+def score_file(model, source, output, chunksize=CHUNKSIZE, n_jobs=None, label_column="Cluster"):
+    """Assign every row of `source` (CSV/Parquet path or buffer) and write rows + labels to `output`.
+
+    `output` is written as Parquet for a .parquet/.pq suffix and as CSV
+    otherwise. `n_jobs=None` uses every core; `n_jobs=1` scores in-process.
+    Returns a ScoreReport.
+    """
+    start = time.perf_counter()
+    n_jobs = max(1, n_jobs or os.cpu_count() or 1)
+    writer = _Writer(output, label_column)
+    counts = np.zeros(model.k, dtype=np.int64)
+    n_rows = 0
+
+    def emit(chunk, labels):
+        nonlocal n_rows
+        writer.write(chunk, labels)
+        counts[:] += np.bincount(labels, minlength=model.k)
+        n_rows += len(chunk)
+
+    chunks = iter_chunks(source, chunksize)
+    try:
+        if n_jobs == 1:
+            for chunk in chunks:
+                model.check_schema(chunk.columns)
+                emit(chunk, model.predict(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=(model,)) as pool:
+                # read ahead at most two chunks per worker; results are written in input order
+                pending = deque()
+                for chunk in chunks:
+                    model.check_schema(chunk.columns)
+                    pending.append((chunk, pool.submit(_score_chunk, chunk[model.features])))
+                    if len(pending) >= 2 * n_jobs:
+                        done, future = pending.popleft()
+                        emit(done, future.result())
+                while pending:
+                    done, future = pending.popleft()
+                    emit(done, future.result())
+    finally:
+        writer.close()
+    return ScoreReport(n_rows=n_rows, seconds=time.perf_counter() - start, counts=counts,
+                       output=writer.path)
@@ -0,0 +1,86 @@
+"""Silhouette-based k selection on bounded-size samples.
+
+Exact silhouette needs all n^2 pairwise distances. Here it is estimated on
+`repeats` random samples of `sample_size` rows, the same samples for every
+candidate k, and averaged. Only the sampled rows and their predicted labels
+are handed to the workers, so memory depends on `sample_size`, not on n.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from sklearn.metrics import silhouette_score
+
+from .ksearch import PARALLEL_MIN_ROWS, RANDOM_STATE
+
+SILHOUETTE_SAMPLE = 2_000
+SILHOUETTE_REPEATS = 3
+
+
+@dataclass
+class SilhouetteReport:
+    """Mean sampled silhouette per k, its spread across repeats, and the time it took."""
+    scores: dict
+    spread: dict = field(default_factory=dict)
+    sample_size: int = SILHOUETTE_SAMPLE
+    repeats: int = SILHOUETTE_REPEATS
+    seconds: float = 0.0
+
+    @property
+    def best_k(self):
+        """k with the highest mean silhouette, or None if no k >= 2 was scored."""
+        valid = {k: s for k, s in self.scores.items() if not np.isnan(s)}
+        return max(valid, key=valid.get) if valid else None
+
+
+def _score_samples(samples, labels):
+    """Mean and standard deviation of the silhouette over pre-drawn samples."""
+    scores = [
+        silhouette_score(X, y) if 1 < len(np.unique(y)) < len(y) else np.nan
+        for X, y in zip(samples, labels)
+    ]
+    if np.all(np.isnan(scores)):
+        return np.nan, np.nan
+    return float(np.nanmean(scores)), float(np.nanstd(scores))
+
+
+def sampled_silhouette(X, labels, sample_size=SILHOUETTE_SAMPLE, repeats=SILHOUETTE_REPEATS,
+                       random_state=RANDOM_STATE):
+    """Estimate the silhouette of one labelling; returns (mean, std)."""
+    rng = np.random.default_rng(random_state)
+    idx = [rng.choice(X.shape[0], size=min(sample_size, X.shape[0]), replace=False) for _ in range(repeats)]
+    return _score_samples([X[i] for i in idx], [labels[i] for i in idx])
+
+
+def silhouette_by_k(X, models, sample_size=SILHOUETTE_SAMPLE, repeats=SILHOUETTE_REPEATS,
+                    random_state=RANDOM_STATE, n_jobs=None):
+    """Score every fitted model in `models` ({k: KMeans}) on shared random samples of X.
+
+    Labels for the sampled rows come from `model.predict`, so models fitted
+    on a subsample can be scored too. Candidate k values run in parallel
+    when `n_jobs` is above one; by default all cores are used from
+    PARALLEL_MIN_ROWS rows up and the scoring stays in-process below that.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(random_state)
+    m = min(sample_size, X.shape[0])
+    samples = [X[rng.choice(X.shape[0], size=m, replace=False)] for _ in range(repeats)]
+    ks = sorted(k for k in models if k >= 2)
+    labels = {k: [models[k].predict(S) for S in samples] for k in ks}
+
+    if n_jobs is None:
+        n_jobs = (os.cpu_count() or 1) if X.shape[0] >= PARALLEL_MIN_ROWS else 1
+    n_jobs = max(1, min(n_jobs, len(ks)))
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = dict(zip(ks, pool.map(_score_samples, [samples] * len(ks), [labels[k] for k in ks])))
+    else:
+        results = {k: _score_samples(samples, labels[k]) for k in ks}
+
+    return SilhouetteReport(
+        scores={k: r[0] for k, r in results.items()},
+        spread={k: r[1] for k, r in results.items()},
+        sample_size=m, repeats=repeats, seconds=time.perf_counter() - start,
+    )
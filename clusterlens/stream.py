@@ -0,0 +1,263 @@
+"""Out-of-core clustering for files larger than RAM.
+
+The input is read in fixed-size chunks three times:
+
+1. statistics pass - per-column counts/sums for mean imputation and scaling,
+   category counts for label encoding, and a bounded reservoir sample used
+   to pick k;
+2. fit pass - one MiniBatchKMeans per candidate k, trained with partial_fit;
+3. assign pass - labels are predicted chunk by chunk and appended to the
+   output file together with the per-cluster sums needed for profiling.
+
+Memory is bounded by the chunk size and the reservoir size, not by the
+number of rows. Unlike the in-memory engine, duplicate rows are kept.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from sklearn.cluster import MiniBatchKMeans
+
+from .engine import MAX_K, RANDOM_STATE, is_categorical, decode_cluster_means
+from .ingest import detect_format
+from .ksearch import pick_elbow
+
+CHUNKSIZE = 100_000
+SAMPLE_SIZE = 20_000
+
+
+@dataclass
+class StreamResult:
+    """Summary of a streaming run; the labelled rows live in `output`."""
+    k: int
+    wcss: list
+    n_rows: int
+    features: list
+    columns: list
+    kmeans: MiniBatchKMeans
+    mean: np.ndarray
+    scale: np.ndarray
+    output: Path
+    profiles: pd.DataFrame
+    label_encoders: dict = field(default_factory=dict)
+
+
+# ================================
+# ---- CHUNKED READERS ----
+# ================================
+def _head(source):
+    """First bytes of a path or file buffer (the buffer is rewound)."""
+    if hasattr(source, "read"):
+        source.seek(0)
+        head = source.read(8)
+        source.seek(0)
+        return head
+    with open(source, "rb") as f:
+        return f.read(8)
+
+
+def _ipc_batches(source):
+    """Record batches of an Arrow IPC file (Feather v2) or stream."""
+    import pyarrow as pa
+    try:
+        reader = pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        yield from pa.ipc.open_stream(source)
+        return
+    for i in range(reader.num_record_batches):
+        yield reader.get_batch(i)
+
+
+def iter_chunks(source, chunksize=CHUNKSIZE, columns=None):
+    """Yield DataFrame chunks from a CSV/Parquet/Feather path or an uploaded file buffer."""
+    fmt = detect_format(_head(source), getattr(source, "name", source))
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    if fmt == "feather":
+        # batches are as large as the writer made them; cut them to `chunksize` rows
+        for batch in _ipc_batches(source):
+            if columns is not None:
+                batch = batch.select(list(columns))
+            for start in range(0, batch.num_rows, chunksize):
+                yield batch.slice(start, chunksize).to_pandas()
+        return
+    yield from pd.read_csv(source, chunksize=chunksize, usecols=columns)
+
+
+# ================================
+# ---- PASS 1: STATISTICS ----
+# ================================
+class _Stats:
+    """Running statistics needed to encode, impute and scale without the full frame."""
+
+    def __init__(self, features, sample_size, random_state):
+        self.features = list(features)
+        self.categorical = None
+        self.n = 0
+        # rows of the largest chunk: MiniBatchKMeans needs at least k rows in a partial_fit
+        self.largest = 0
+        self.count = np.zeros(len(features))
+        self.total = np.zeros(len(features))
+        self.total_sq = np.zeros(len(features))
+        self.category_counts = {}
+        self.sample = []
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(random_state)
+
+    def update(self, chunk):
+        chunk = chunk[self.features]
+        self.largest = max(self.largest, len(chunk))
+        if self.categorical is None:
+            self.categorical = [f for f in self.features if is_categorical(chunk[f])]
+            self.category_counts = {f: pd.Series(dtype="int64") for f in self.categorical}
+        for f in self.categorical:
+            counts = chunk[f].astype(str).value_counts()
+            self.category_counts[f] = self.category_counts[f].add(counts, fill_value=0)
+        numeric = self._numeric(chunk)
+        self.count += numeric.notna().sum().to_numpy()
+        self.total += numeric.sum().to_numpy()
+        self.total_sq += (numeric ** 2).sum().to_numpy()
+        self._reservoir(chunk)
+        self.n += len(chunk)
+
+    def _numeric(self, chunk):
+        out = {}
+        for f in self.features:
+            if f not in self.categorical:
+                out[f] = pd.to_numeric(chunk[f], errors="coerce").astype("float64")
+            else:
+                out[f] = pd.Series(np.nan, index=chunk.index)
+        return pd.DataFrame(out)
+
+    def _reservoir(self, chunk):
+        """Vectorized reservoir sampling (Algorithm R) over the incoming chunk."""
+        take = max(0, self.sample_size - self.n)
+        if take:
+            self.sample.append(chunk.iloc[:take])
+        rest = chunk.iloc[take:]
+        if len(rest) == 0:
+            return
+        seen = self.n + take + np.arange(len(rest))
+        slots = (self.rng.random(len(rest)) * (seen + 1)).astype(np.int64)
+        keep = slots < self.sample_size
+        if keep.any():
+            # later rows overwrite earlier ones that landed in the same slot
+            replacements = pd.Series(np.flatnonzero(keep), index=slots[keep])
+            replacements = replacements[~replacements.index.duplicated(keep="last")]
+            sample = pd.concat(self.sample, ignore_index=True)
+            self.sample = [
+                sample.drop(index=replacements.index.to_numpy()),
+                rest.iloc[replacements.to_numpy()],
+            ]
+
+    def finalize(self):
+        """Turn the running sums into encoders, imputation means and scales."""
+        label_encoders = {}
+        for i, f in enumerate(self.features):
+            if f in self.categorical:
+                counts = self.category_counts[f].sort_index()
+                le = LabelEncoder()
+                le.classes_ = counts.index.to_numpy(dtype=object)
+                label_encoders[f] = le
+                codes = np.arange(len(counts))
+                self.count[i] = counts.sum()
+                self.total[i] = (codes * counts.to_numpy()).sum()
+                self.total_sq[i] = (codes ** 2 * counts.to_numpy()).sum()
+        mean = np.divide(self.total, self.count, out=np.zeros_like(self.total), where=self.count > 0)
+        # mean-imputed rows add nothing to the sum of squared deviations
+        var = (self.total_sq - self.count * mean ** 2) / max(self.n, 1)
+        keep = var > 1e-12
+        if not keep.any():
+            raise ValueError("All selected features are constant; nothing to cluster on.")
+        return label_encoders, mean, np.sqrt(np.where(keep, var, 1.0)), keep
+
+
+def _encode(chunk, features, label_encoders):
+    """Label-encode one chunk with the pass-1 vocabularies; missing values stay NaN."""
+    cols = []
+    for f in features:
+        if f in label_encoders:
+            lookup = pd.Index(label_encoders[f].classes_)
+            col = lookup.get_indexer(chunk[f].astype(str)).astype("float64")
+            col[col < 0] = np.nan
+        else:
+            col = pd.to_numeric(chunk[f], errors="coerce").to_numpy(dtype="float64")
+        cols.append(col)
+    return np.column_stack(cols)
+
+
+def _scale(encoded, mean, scale, keep):
+    """Mean-impute and standard-scale an encoded chunk, dropping constant columns."""
+    X = np.where(np.isnan(encoded), mean, encoded)
+    return ((X - mean) / scale)[:, keep]
+
+
+# ================================
+# ---- PIPELINE ----
+# ================================
+def stream_cluster(source, features, output, chunksize=CHUNKSIZE, max_k=MAX_K,
+                   sample_size=SAMPLE_SIZE, random_state=RANDOM_STATE):
+    """Cluster `source` chunk by chunk and write every row plus `Cluster` to `output` (CSV)."""
+    if not features:
+        raise ValueError("Select at least one feature.")
+    features = list(features)
+    output = Path(output)
+
+    # Pass 1: statistics and reservoir sample
+    stats = _Stats(features, sample_size, random_state)
+    for chunk in iter_chunks(source, chunksize, columns=features):
+        stats.update(chunk)
+    label_encoders, mean, scale, keep = stats.finalize()
+    columns = [f for f, k in zip(features, keep) if k]
+
+    def transform(chunk):
+        return _scale(_encode(chunk, features, label_encoders), mean, scale, keep)
+
+    sample = transform(pd.concat(stats.sample, ignore_index=True))
+
+    # Pass 2: mini-batch fit of every candidate k; a k above every chunk's size would never be fitted
+    max_k = max(1, min(max_k, stats.largest))
+    ks = range(1, max_k + 1)
+    models = {k: MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3) for k in ks}
+    for chunk in iter_chunks(source, chunksize, columns=features):
+        X = transform(chunk)
+        for k, model in models.items():
+            if len(X) >= k:
+                model.partial_fit(X)
+
+    # k from the reservoir sample, extrapolated to the full row count
+    wcss = [-models[k].score(sample) * stats.n / len(sample) for k in ks]
+    k = pick_elbow(ks, wcss)
+    kmeans = models[k]
+
+    # Pass 3: assign labels, stream them to disk and accumulate profile sums
+    sums = np.zeros((k, len(features)))
+    counts = np.zeros((k, len(features)))
+    output.parent.mkdir(parents=True, exist_ok=True)
+    first = True
+    for chunk in iter_chunks(source, chunksize):
+        encoded = _encode(chunk, features, label_encoders)
+        labels = kmeans.predict(_scale(encoded, mean, scale, keep))
+        chunk.assign(Cluster=labels).to_csv(output, mode="w" if first else "a", header=first, index=False)
+        first = False
+        present = ~np.isnan(encoded)
+        np.add.at(sums, labels, np.where(present, encoded, 0.0))
+        np.add.at(counts, labels, present)
+
+    cluster_summary = pd.DataFrame(
+        sums / np.maximum(counts, 1), columns=features
+    ).rename_axis("Cluster").round(2)
+    profiles = decode_cluster_means(cluster_summary, label_encoders)
+
+    return StreamResult(
+        k=k, wcss=wcss, n_rows=stats.n, features=features, columns=columns,
+        kmeans=kmeans, mean=mean, scale=scale, output=output, profiles=profiles,
+        label_encoders=label_encoders,
+    )
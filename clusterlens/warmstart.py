@@ -0,0 +1,284 @@
+"""Warm-started re-clustering from a previous run's centroids.
+
+A finished run leaves a `WarmStart`: the centroids of every fitted k in
+unscaled design units, plus what a cold fit of each k cost. The next run
+(an appended day of rows, or a changed feature selection) starts from it:
+
+- rows changed, same design columns: the old centroids are rescaled with
+  the new scaler and used directly. A k whose centroids would not move
+  (one assignment pass shifts them by less than KMeans' tolerance) is
+  reused without refitting; the others run Lloyd from the old centroids;
+- features changed: rows are assigned to the nearest old centroid on the
+  columns both runs share and the centroids are recomputed as the means
+  of those groups over the new columns, then refined;
+- k values the previous run never fitted, or no shared columns at all,
+  fall back to a cold fit.
+
+Refits and cold fits use the planner's KMeans parameters (a refit starts
+from its one init, so it runs a single restart) and are spread over a
+process pool like `ksearch.search_k`. `WarmReport` compares the iterations
+and seconds spent with the previous cold fits (seconds scaled by the
+change in row count).
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+from scipy import sparse
+from sklearn.metrics import pairwise_distances_argmin_min
+
+from .encoding import cluster_means
+from . import ksearch
+from .ksearch import MAX_K, PARALLEL_MIN_ROWS, RANDOM_STATE, KSearchResult, fit_candidate, pick_elbow
+
+# sklearn's default KMeans tolerance, relative to the mean feature variance
+TOL = 1e-4
+
+
+@dataclass
+class WarmStart:
+    """What a later run needs to start from this one's centroids."""
+    features: list
+    columns: list
+    # k -> centroids in unscaled design units
+    centers: dict
+    n_rows: int
+    # ordinal-encoded columns -> classes, so codes are only reused if they still mean the same
+    classes: dict = field(default_factory=dict)
+    # k -> iterations / seconds of a cold fit on `n_rows` rows
+    cold_iterations: dict = field(default_factory=dict)
+    cold_seconds: dict = field(default_factory=dict)
+
+    def save(self, path):
+        """Write to a .npz file (no pickle)."""
+        meta = {
+            "features": list(self.features), "columns": list(self.columns), "n_rows": int(self.n_rows),
+            "classes": {c: list(map(str, v)) for c, v in self.classes.items()},
+            "cold_iterations": {str(k): int(v) for k, v in self.cold_iterations.items()},
+            "cold_seconds": {str(k): float(v) for k, v in self.cold_seconds.items()},
+        }
+        arrays = {f"centers_{k}": np.asarray(c) for k, c in self.centers.items()}
+        with open(path, "wb") as f:
+            np.savez_compressed(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            centers = {int(name.split("_", 1)[1]): data[name] for name in data.files if name.startswith("centers_")}
+        return cls(
+            features=meta["features"], columns=meta["columns"], centers=centers, n_rows=meta["n_rows"],
+            classes=meta["classes"],
+            cold_iterations={int(k): v for k, v in meta["cold_iterations"].items()},
+            cold_seconds={int(k): v for k, v in meta["cold_seconds"].items()},
+        )
+
+
+@dataclass
+class WarmReport:
+    """How a warm-started search went compared with cold fits."""
+    mode: str
+    reused: list
+    refitted: list
+    cold: list
+    iterations: int
+    seconds: float
+    cold_iterations: int
+    cold_seconds: float
+
+    # a warm fit can cost more than the recorded cold one (e.g. a different plan); savings stop at 0
+    @property
+    def saved_iterations(self):
+        return max(self.cold_iterations - self.iterations, 0)
+
+    @property
+    def saved_seconds(self):
+        return max(self.cold_seconds - self.seconds, 0.0)
+
+
+# ================================
+# ---- UNITS ----
+# ================================
+def design_units(columns, scaler=None, scaled_columns=None):
+    """(mean, scale) per design column; columns the scaler does not touch get (0, 1)."""
+    mean = np.zeros(len(columns))
+    scale = np.ones(len(columns))
+    if scaler is not None:
+        scaled_columns = list(columns) if scaled_columns is None else list(scaled_columns)
+        pos = {c: i for i, c in enumerate(columns)}
+        idx = [pos[c] for c in scaled_columns]
+        mean[idx] = scaler.mean_
+        scale[idx] = scaler.scale_
+    return mean, scale
+
+
+def snapshot(search, columns, units, n_rows, features, classes=None, previous=None, report=None):
+    """WarmStart from a finished KSearchResult (its models' centroids and cold-fit costs).
+
+    After a warm run, the cold-fit costs of warm-started k values are carried
+    over from `previous` so later runs still compare against a cold fit.
+    """
+    mean, scale = units
+    centers = {k: m.cluster_centers_ * scale + mean for k, m in search.models.items()}
+    cold_iterations = {k: int(m.n_iter_) for k, m in search.models.items()}
+    cold_seconds = dict(search.seconds)
+    if previous is not None and report is not None:
+        ratio = n_rows / max(previous.n_rows, 1)
+        for k in report.reused + report.refitted:
+            if k in previous.cold_iterations:
+                cold_iterations[k] = previous.cold_iterations[k]
+                cold_seconds[k] = previous.cold_seconds[k] * ratio
+            else:
+                cold_iterations.pop(k, None)
+                cold_seconds.pop(k, None)
+    return WarmStart(
+        features=list(features), columns=list(columns), centers=centers, n_rows=n_rows,
+        classes={c: list(map(str, v)) for c, v in (classes or {}).items()},
+        cold_iterations=cold_iterations, cold_seconds=cold_seconds,
+    )
+
+
+def shared_columns(previous, columns, classes=None):
+    """Positions (old, new) of design columns both runs share with the same meaning."""
+    classes = {c: list(map(str, v)) for c, v in (classes or {}).items()}
+    old_pos = {c: i for i, c in enumerate(previous.columns)}
+    old, new = [], []
+    for j, col in enumerate(columns):
+        if col in old_pos and previous.classes.get(col) == classes.get(col):
+            old.append(old_pos[col])
+            new.append(j)
+    return np.array(old, dtype=np.intp), np.array(new, dtype=np.intp)
+
+
+# ================================
+# ---- SEARCH ----
+# ================================
+def _assign(X, centers):
+    labels, dist = pairwise_distances_argmin_min(X, centers)
+    return labels, float(np.square(dist).sum())
+
+
+def _restore(X, centers, labels, inertia):
+    """A fitted KMeans that reuses `centers` as-is (zero iterations)."""
+    from .cache import _restore_kmeans
+    return _restore_kmeans(np.ascontiguousarray(centers), labels.astype(np.int32), inertia, 0)
+
+
+def _tolerance(X):
+    mean = np.asarray(X.mean(axis=0)).ravel()
+    sq = X.multiply(X).mean(axis=0) if sparse.issparse(X) else np.square(X).mean(axis=0)
+    return TOL * float(np.mean(np.asarray(sq).ravel() - mean ** 2))
+
+
+def _project(X, shared, new_idx, rng):
+    """Initial centroids in the new space: group rows by nearest old centroid on the shared columns."""
+    k = len(shared)
+    labels, _ = _assign(X[:, new_idx], shared)
+    means = cluster_means(X, labels)
+    init = X[rng.choice(X.shape[0], size=k, replace=False)]
+    init = init.toarray() if sparse.issparse(init) else np.array(init, dtype="float64")
+    init[means.index.to_numpy()] = means.to_numpy()
+    return init
+
+
+def _timed_refine(X, k, init, random_state, kmeans_params):
+    """(model, seconds) of one fit from `init` centroids, or a cold fit when `init` is None."""
+    start = time.perf_counter()
+    params = dict(kmeans_params or {})
+    if init is not None:
+        params.update(init=init, n_init=1)
+    model = fit_candidate(X, k, random_state, params)
+    return model, time.perf_counter() - start
+
+
+def _refine_shared(k, init, random_state, kmeans_params):
+    return _timed_refine(ksearch._X, k, init, random_state, kmeans_params)
+
+
+def warm_search(X, previous, columns, units, classes=None, max_k=MAX_K, random_state=RANDOM_STATE,
+                kmeans_params=None, n_jobs=None, progress=None):
+    """Elbow search for k = 1..max_k started from `previous` where possible.
+
+    `kmeans_params` (e.g. `Plan.kmeans_params`) apply to every refit and
+    cold fit; `n_jobs` works as in `ksearch.search_k`. `progress(stage,
+    done, total)` is called after every k. Returns (KSearchResult, WarmReport).
+    """
+    rng = np.random.default_rng(random_state)
+    mean, scale = units
+    n = X.shape[0]
+    max_k = min(max_k, n)
+    old_idx, new_idx = shared_columns(previous, columns, classes)
+    same_space = list(columns) == list(previous.columns) and len(new_idx) == len(columns)
+    mode = "rows" if same_space else ("features" if len(new_idx) else "cold")
+    tol = _tolerance(X)
+
+    models, seconds = {}, {}
+    reused, refitted, cold = [], [], []
+    # k -> initial centroids of the fits still to run (None: cold)
+    inits = {}
+    for k in range(1, max_k + 1):
+        old = previous.centers.get(k)
+        if old is None or mode == "cold" or len(old) != k:
+            inits[k] = None
+            cold.append(k)
+            continue
+        if same_space:
+            start = time.perf_counter()
+            init = (old - mean) / scale
+            labels, inertia = _assign(X, init)
+            means = cluster_means(X, labels)
+            moved = len(means) < k or float(np.square(means.to_numpy() - init[means.index]).sum()) > tol
+            if not moved:
+                models[k] = _restore(X, init, labels, inertia)
+                seconds[k] = time.perf_counter() - start
+                reused.append(k)
+                if progress is not None:
+                    progress("warm-started k-search", len(models), max_k)
+                continue
+        else:
+            # old centroids on the shared columns, in the new run's scaled units
+            shared = (old[:, old_idx] - mean[new_idx]) / scale[new_idx]
+            init = _project(X, shared, new_idx, rng)
+        inits[k] = init
+        refitted.append(k)
+
+    if n_jobs is None:
+        n_jobs = (os.cpu_count() or 1) if n >= PARALLEL_MIN_ROWS else 1
+    n_jobs = max(1, min(n_jobs, len(inits)))
+    pool = None
+    if n_jobs > 1:
+        pool = ProcessPoolExecutor(max_workers=n_jobs, initializer=ksearch._init_worker, initargs=(X, None))
+    try:
+        futures = {}
+        if pool is not None:
+            futures = {k: pool.submit(_refine_shared, k, init, random_state, kmeans_params)
+                       for k, init in inits.items()}
+        for k, init in inits.items():
+            if pool is None:
+                models[k], seconds[k] = _timed_refine(X, k, init, random_state, kmeans_params)
+            else:
+                models[k], seconds[k] = futures[k].result()
+            if progress is not None:
+                progress("warm-started k-search", len(models), max_k)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    ks = sorted(models)
+    wcss = [models[k].inertia_ for k in ks]
+    search = KSearchResult(k=pick_elbow(ks, wcss), ks=ks, wcss=wcss, models=models, seconds=seconds)
+
+    # savings are only counted for k values with a known cold-fit cost
+    ratio = n / max(previous.n_rows, 1)
+    warm = [k for k in reused + refitted if k in previous.cold_iterations]
+    report = WarmReport(
+        mode=mode, reused=reused, refitted=refitted, cold=cold,
+        iterations=sum(int(models[k].n_iter_) for k in warm),
+        seconds=sum(seconds[k] for k in warm),
+        cold_iterations=sum(previous.cold_iterations[k] for k in warm),
+        cold_seconds=sum(previous.cold_seconds[k] * ratio for k in warm),
+    )
+    return search, report
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from clusterlens.assistant import (FakeChatModel, ResponseCache, ask, build_digest, build_messages,
+                                   estimate_tokens, stream_reply)
+
+
+def make_frame(rows=500):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "income": rng.normal(50_000, 10_000, rows),
+        "age": rng.integers(18, 80, rows),
+        "city": rng.choice(["Lyon", "Paris", "Oslo", "Rome", "Kyiv", "Lima", "Pune"], rows),
+        "note": [f"free text entry number {i} " * 3 for i in range(rows)],
+    })
+
+
+def test_digest_stays_within_budget():
+    df = make_frame()
+    for budget in (60, 200, 1500):
+        digest = build_digest(df, budget=budget)
+        assert digest.tokens <= budget
+        assert estimate_tokens(digest.text) <= budget
+    small = build_digest(df, budget=200)
+    assert small.truncated
+    assert small.sections[0] == "Columns"
+
+
+def test_repeated_question_is_served_from_cache():
+    model = FakeChatModel(["The mean income is about 50,000."])
+    digest = build_digest(make_frame())
+    cache = ResponseCache()
+    first = "".join(ask(model, digest, "What is the mean income?", cache=cache, dataset="d1"))
+    again = list(ask(model, digest, "  what is the MEAN income ", cache=cache, dataset="d1"))
+    assert again == [first]
+    assert len(model.calls) == 1
+    # a different dataset does not share the entry
+    "".join(ask(model, digest, "What is the mean income?", cache=cache, dataset="d2"))
+    assert len(model.calls) == 2
+
+
+def test_streamed_chunks_join_to_full_reply():
+    reply = "Cluster 2 has the highest income and the oldest customers."
+    model = FakeChatModel([reply])
+    messages = build_messages(build_digest(make_frame()), "Which cluster earns most?")
+    chunks = list(stream_reply(model, messages))
+    assert len(chunks) > 1
+    assert "".join(chunks) == reply
+    assert model.calls[0] == messages
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from clusterlens.cache import ResultCache, _restore_kmeans, hash_frame
+from clusterlens.engine import cluster_data
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(2)
+    n = 400
+    centre = rng.integers(0, 3, n)
+    return pd.DataFrame({
+        "income": centre * 10 + rng.normal(0, 1, n),
+        "age": rng.normal(40, 5, n),
+        "city": np.array(["Lyon", "Oslo", "Rome"])[centre],
+    })
+
+
+def run(frame, cache, **params):
+    params = {"max_k": 4, **params}
+    return cluster_data(frame, list(frame.columns), cache=cache, data_hash=hash_frame(frame), **params)
+
+
+def test_hit_returns_the_stored_result(frame, tmp_path):
+    cache = ResultCache(tmp_path)
+    first = run(frame, cache)
+    assert len(list(tmp_path.glob("*.npz"))) == 1
+    hit = run(frame, cache)
+    assert np.array_equal(hit.labels, first.labels)
+    assert hit.k == first.k and hit.wcss == pytest.approx(first.wcss)
+    assert np.allclose(hit.kmeans.cluster_centers_, first.kmeans.cluster_centers_)
+    assert np.array_equal(hit.kmeans.predict(hit.X_scaled), first.labels)
+    # other parameters are another entry
+    run(frame, cache, max_k=3)
+    assert len(list(tmp_path.glob("*.npz"))) == 2
+
+
+def test_least_recently_used_entries_are_evicted(frame, tmp_path):
+    cache = ResultCache(tmp_path)
+    result = run(frame, cache)
+    for key, mtime in (("a", 1), ("b", 3), ("c", 2)):
+        cache.put(key, result)
+        os.utime(cache._path(key), (mtime, mtime))
+    entry = cache._path("a").stat().st_size
+    cache.max_bytes = cache.size() - 2 * entry
+    cache.evict()
+    assert not cache._path("a").exists() and not cache._path("c").exists()
+    assert cache._path("b").exists()
+
+
+def test_broken_entry_is_a_miss(tmp_path):
+    cache = ResultCache(tmp_path)
+    cache._path("bad").write_bytes(b"not an npz")
+    assert cache.get("bad") is None
+
+
+def test_restored_kmeans_keeps_the_stored_fit():
+    centers = np.array([[0.0, 0.0], [5.0, 5.0], [5.0, 5.0]])
+    labels = np.array([0, 1, 2], dtype=np.int32)
+    kmeans = _restore_kmeans(centers, labels, 1.5, 7)
+    assert np.array_equal(kmeans.cluster_centers_, centers)
+    assert (kmeans.inertia_, kmeans.n_iter_) == (1.5, 7)
+    assert list(kmeans.predict(np.array([[0.1, -0.1], [4.0, 6.0]]))) == [0, 1]
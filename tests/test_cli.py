@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clusterlens.cli import main
+
+
+def test_invalid_data_exits_with_the_message(tmp_path):
+    source = tmp_path / "flat.csv"
+    pd.DataFrame({"a": [1.0] * 20, "b": ["x"] * 20}).to_csv(source, index=False)
+    with pytest.raises(SystemExit, match="constant"):
+        main([str(source), "-o", str(tmp_path)])
+
+
+def test_labels_and_profiles_are_written(tmp_path):
+    rng = np.random.default_rng(4)
+    source = tmp_path / "data.csv"
+    pd.DataFrame({"a": rng.normal(size=200), "b": rng.normal(size=200)}).to_csv(source, index=False)
+    assert main([str(source), "-o", str(tmp_path / "out"), "--max-k", "4"]) == 0
+    labels = pd.read_csv(tmp_path / "out" / "labels.csv")
+    assert len(labels) == 200 and "Cluster" in labels
+    assert (tmp_path / "out" / "profiles.csv").exists()
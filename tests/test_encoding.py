@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clusterlens.encoding import MISSING, SparseEncoder, cluster_means
+from clusterlens.engine import cluster_data
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    n = 400
+    return pd.DataFrame({
+        "income": rng.normal(50, 10, n),
+        "city": pd.Series(rng.choice(["Lyon", "Oslo", "Rome", None], n), dtype="str"),
+        "segment": pd.Categorical(rng.choice(["a", "b", None], n)),
+        "code": [f"id{i % 90}" if i % 5 else None for i in range(n)],
+    })
+
+
+def test_onehot_gives_missing_values_their_own_level(frame):
+    encoder = SparseEncoder(max_levels=10).fit(frame[["income", "city", "segment"]])
+    assert f"city={MISSING}" in encoder.columns
+    assert f"segment={MISSING}" in encoder.columns
+    X = encoder.transform(frame[["income", "city", "segment"]])
+    names = encoder.columns
+    missing = frame["city"].isna().to_numpy()
+    column = X[:, names.index(f"city={MISSING}")].toarray().ravel()
+    assert np.array_equal(column == 1, missing)
+    # every row has exactly one indicator per one-hot column
+    city = [i for i, c in enumerate(names) if c.startswith("city=")]
+    assert np.all(X[:, city].sum(axis=1) == 1)
+
+
+@pytest.mark.parametrize("high_cardinality", ["hash", "frequency"])
+def test_sparse_clustering_accepts_missing_categories(frame, high_cardinality):
+    result = cluster_data(frame, list(frame.columns), max_k=4, encoding="sparse", max_levels=10,
+                          high_cardinality=high_cardinality)
+    assert len(result.labels) == len(frame)
+    assert result.X_scaled.shape[0] == len(frame)
+
+
+def test_encoder_state_round_trip(frame):
+    encoder = SparseEncoder(max_levels=10).fit(frame)
+    restored = SparseEncoder.from_state(*encoder.to_state())
+    assert restored.columns == encoder.columns
+    assert (restored.transform(frame) != encoder.transform(frame)).nnz == 0
+
+
+def test_cluster_means_match_dense_groupby(frame):
+    X = SparseEncoder(max_levels=10).fit_transform(frame[["income", "city"]])
+    labels = np.arange(len(frame)) % 3
+    means = cluster_means(X, labels)
+    expected = pd.DataFrame(X.toarray()).groupby(labels).mean()
+    assert np.allclose(means.to_numpy(), expected.to_numpy())
@@ -0,0 +1,44 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from clusterlens.export import write_csv, write_parquet
+
+
+def frame():
+    return pd.DataFrame({
+        "income": [10.0, 20.0, 30.0, 40.0, 50.0],
+        # empty in the first chunk only
+        "note": pd.Series([None, None, "late", None, "later"], dtype=object),
+        "city": ["Lyon", "Oslo", "Lyon", "Rome", "Oslo"],
+    })
+
+
+def test_parquet_types_come_from_the_whole_frame():
+    df = frame()
+    labels = np.array([0, 1, 0, 2, 1])
+    buf = io.BytesIO()
+    write_parquet(df, buf, labels, chunksize=2)
+    buf.seek(0)
+    table = pq.read_table(buf)
+    assert table.num_rows == 5 and pq.ParquetFile(buf).num_row_groups == 3
+    assert table.column("note").to_pylist() == [None, None, "late", None, "later"]
+    assert table.column("Cluster").to_pylist() == list(labels)
+
+
+def test_parquet_with_one_label_for_every_row():
+    buf = io.BytesIO()
+    write_parquet(frame(), buf, 3, chunksize=2)
+    buf.seek(0)
+    assert set(pq.read_table(buf).column("Cluster").to_pylist()) == {3}
+
+
+def test_csv_has_one_header():
+    buf = io.BytesIO()
+    write_csv(frame(), buf, np.arange(5), chunksize=2)
+    buf.seek(0)
+    out = pd.read_csv(buf)
+    assert list(out.columns) == ["income", "note", "city", "Cluster"]
+    assert list(out["Cluster"]) == [0, 1, 2, 3, 4]
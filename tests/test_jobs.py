@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from clusterlens.jobs import JobCancelled, JobQueue
+
+
+def count_up(n, delay=0.05, progress=None):
+    for i in range(n):
+        progress("counting", i, n)
+        time.sleep(delay)
+    return n
+
+
+@pytest.fixture
+def queue():
+    q = JobQueue(max_jobs=2, keep_seconds=60)
+    yield q
+    q.shutdown()
+
+
+def wait_running(job, timeout=10):
+    deadline = time.time() + timeout
+    while job.status == "queued" and time.time() < deadline:
+        time.sleep(0.02)
+    assert job.status == "running"
+
+
+def test_identical_submissions_share_one_job(queue):
+    first = queue.submit("k", count_up, args=(3,), watcher="a")
+    second = queue.submit("k", count_up, args=(3,), watcher="b")
+    assert first is second
+    assert first.watchers == {"a", "b"}
+    assert first.result() == 3
+    assert first.status == "done"
+
+
+def test_job_is_kept_while_another_session_watches(queue):
+    job = queue.submit("k", count_up, args=(5,), watcher="a")
+    queue.submit("k", count_up, args=(5,), watcher="b")
+    assert not queue.cancel("k", "a")
+    assert job.result() == 5
+
+
+def test_cancelled_running_job_stops(queue):
+    job = queue.submit("k", count_up, args=(200,), watcher="a")
+    wait_running(job)
+    assert queue.cancel("k", "a")
+    with pytest.raises(JobCancelled):
+        job.result()
+    assert job.status == "cancelled"
+
+
+def test_resubmit_after_cancel_starts_a_fresh_job(queue):
+    old = queue.submit("k", count_up, args=(200,), watcher="a")
+    wait_running(old)
+    assert queue.cancel("k", "a")
+    new = queue.submit("k", count_up, args=(3,), watcher="a")
+    assert new is not old
+    assert new.token != old.token
+    assert new.result() == 3
+    assert new.status == "done"
+    with pytest.raises(JobCancelled):
+        old.result()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from clusterlens.ksearch import pick_elbow, search_k
+
+
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(5)
+    centres = np.array([[0.0, 0.0], [8.0, 0.0], [0.0, 8.0]])
+    return np.vstack([c + rng.normal(0, 0.5, size=(200, 2)) for c in centres])
+
+
+def test_parallel_search_matches_in_process(blobs):
+    serial = search_k(blobs, max_k=6, n_jobs=1)
+    parallel = search_k(blobs, max_k=6, n_jobs=2)
+    assert serial.ks == parallel.ks == list(range(1, 7))
+    assert parallel.wcss == pytest.approx(serial.wcss)
+    assert parallel.k == serial.k == 3
+    assert np.array_equal(parallel.model.labels_, serial.model.labels_)
+
+
+def test_progress_is_reported_for_every_k(blobs):
+    calls = []
+    search_k(blobs, max_k=5, n_jobs=1, progress=lambda *args: calls.append(args))
+    assert calls == [("k-search", done, 5) for done in range(1, 6)]
+
+
+def test_early_stop_ends_the_sweep_after_the_bend(blobs):
+    result = search_k(blobs, max_k=10, n_jobs=1, early_stop=True)
+    assert result.stopped_early and result.ks[-1] < 10
+    assert result.k == 3
+
+
+def test_elbow_of_a_clear_bend():
+    assert pick_elbow([1, 2, 3, 4, 5], [100.0, 40.0, 10.0, 8.0, 7.0]) == 3
@@ -0,0 +1,81 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from clusterlens.engine import cluster_data
+from clusterlens.model import ClusterModel
+from clusterlens.scoring import nearest_centroid, score_file
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(1)
+    n = 600
+    centre = rng.integers(0, 3, n)
+    return pd.DataFrame({
+        "income": centre * 10 + rng.normal(0, 1, n),
+        "age": rng.normal(40, 5, n),
+        "city": pd.Series(np.where(rng.random(n) < 0.2, None,
+                                   np.array(["Lyon", "Oslo", "Rome"])[centre]), dtype="str"),
+    })
+
+
+def round_trip(model):
+    buf = io.BytesIO(model.to_bytes())
+    return ClusterModel.load(buf)
+
+
+@pytest.mark.parametrize("encoding", ["ordinal", "sparse"])
+def test_saved_model_predicts_like_the_fitted_one(frame, encoding):
+    result = cluster_data(frame, list(frame.columns), max_k=4, encoding=encoding)
+    model = ClusterModel.from_result(result)
+    loaded = round_trip(model)
+    assert np.array_equal(model.predict(frame), result.labels)
+    assert np.array_equal(loaded.predict(frame), result.labels)
+
+
+def test_missing_classes_survive_saving(frame):
+    result = cluster_data(frame, list(frame.columns), max_k=4)
+    loaded = round_trip(ClusterModel.from_result(result))
+    classes = loaded.classes["city"]
+    assert pd.isna(classes).sum() == 1
+    assert set(classes[~pd.isna(classes)]) == {"Lyon", "Oslo", "Rome"}
+
+
+def test_missing_feature_is_reported(frame):
+    model = ClusterModel.from_result(cluster_data(frame, list(frame.columns), max_k=3))
+    with pytest.raises(ValueError, match="city"):
+        model.predict(frame.drop(columns="city"))
+
+
+def test_nearest_centroid_matches_brute_force():
+    rng = np.random.default_rng(0)
+    X, centers = rng.normal(size=(1000, 4)), rng.normal(size=(5, 4))
+    brute = ((X[:, None, :] - centers[None]) ** 2).sum(axis=2).argmin(axis=1)
+    assert np.array_equal(nearest_centroid(X, centers), brute)
+
+
+def test_score_file_writes_rows_in_order(frame, tmp_path):
+    result = cluster_data(frame, list(frame.columns), max_k=4)
+    model = ClusterModel.from_result(result)
+    source = tmp_path / "new.csv"
+    frame.to_csv(source, index=False)
+    report = score_file(model, source, tmp_path / "scored.csv", chunksize=128, n_jobs=1)
+    scored = pd.read_csv(tmp_path / "scored.csv")
+    assert report.n_rows == len(frame)
+    assert np.array_equal(scored["Cluster"].to_numpy(), result.labels)
+
+
+def test_score_file_types_parquet_columns_empty_in_the_first_chunk(frame, tmp_path):
+    model = ClusterModel.from_result(cluster_data(frame, list(frame.columns), max_k=4))
+    source = tmp_path / "new.csv"
+    note = np.where(np.arange(len(frame)) % 200 == 150, "late", None)
+    frame.assign(note=note).to_csv(source, index=False)
+    score_file(model, source, tmp_path / "scored.parquet", chunksize=128, n_jobs=1)
+    scored = pq.read_table(tmp_path / "scored.parquet")
+    assert scored.num_rows == len(frame)
+    assert scored.column("note").to_pylist() == list(note)
+    assert np.array_equal(scored.column("Cluster").to_numpy(), model.predict(frame))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from clusterlens import planner
+from clusterlens.planner import TRIAL_ROWS, plan_run
+
+
+@pytest.fixture
+def trials(monkeypatch):
+    """Record trial fits, each reported as `seconds` per iteration over 20 iterations."""
+    calls = []
+
+    def trial(X, k, algorithm, random_state, seconds=1e-3):
+        calls.append(algorithm)
+        return seconds, 20
+
+    monkeypatch.setattr(planner, "_trial", trial)
+    return calls
+
+
+def test_small_table_uses_the_baseline_without_a_trial(trials):
+    X = np.random.default_rng(0).normal(size=(2_000, 4))
+    plan = plan_run(X, max_k=6)
+    assert (plan.algorithm, plan.n_init, plan.sampling) == ("lloyd", 1, False)
+    assert trials == []
+
+
+def test_large_table_without_budget_keeps_one_restart(trials):
+    X = np.random.default_rng(0).normal(size=(TRIAL_ROWS + 1_000, 4))
+    plan = plan_run(X, max_k=6)
+    assert plan.n_init == 1
+    assert trials[0] == "lloyd"
+
+
+def test_generous_budget_adds_restarts_on_small_tables(trials):
+    X = np.random.default_rng(0).normal(size=(2_000, 4))
+    plan = plan_run(X, max_k=6, budget=60.0)
+    assert plan.n_init == 4
+    assert plan.estimated_seconds <= 60.0
+
+
+def test_tight_budget_tightens_the_plan(trials):
+    X = np.random.default_rng(0).normal(size=(50_000, 4))
+    relaxed = plan_run(X, max_k=10)
+    plan = plan_run(X, max_k=10, budget=relaxed.estimated_seconds / 20)
+    assert plan.n_init == 1
+    assert plan.sampling and plan.sample_size < 50_000
+    assert plan.estimated_seconds < relaxed.estimated_seconds
+    assert any("time budget" in reason for reason in plan.reasons)
+
+
+def test_unknown_algorithm_is_rejected():
+    with pytest.raises(ValueError, match="Unknown algorithm"):
+        plan_run(np.zeros((10, 2)), algorithm="fast")
@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from clusterlens.query import MAX_RESULT_ROWS, QueryError, column_kinds, execute, parse_plan
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "income": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        "city": ["Lyon", "Paris", "Lyon", "Oslo", "Paris", "Lyon"],
+    })
+
+
+LABELS = np.array([0, 0, 1, 1, 1, 0])
+
+
+def plan_for(df, labels=None, **plan):
+    return parse_plan(json.dumps(plan), column_kinds(df, labels))
+
+
+def test_unknown_column_is_rejected(frame):
+    with pytest.raises(QueryError, match="unknown column 'salary'"):
+        plan_for(frame, filters=[{"column": "salary", "op": ">", "value": 1}])
+    with pytest.raises(QueryError, match="unknown column"):
+        plan_for(frame, group_by=["__class__"])
+    # Cluster only exists when the data was clustered
+    with pytest.raises(QueryError, match="unknown column 'Cluster'"):
+        plan_for(frame, group_by=["Cluster"])
+
+
+def test_operator_not_allowed_for_kind_is_rejected(frame):
+    with pytest.raises(QueryError, match="operator 'contains' is not allowed"):
+        plan_for(frame, filters=[{"column": "income", "op": "contains", "value": "1"}])
+    with pytest.raises(QueryError, match="operator '>' is not allowed"):
+        plan_for(frame, filters=[{"column": "city", "op": ">", "value": "L"}])
+    with pytest.raises(QueryError, match="operator 'eval' is not allowed"):
+        plan_for(frame, filters=[{"column": "income", "op": "eval", "value": "1"}])
+
+
+def test_function_not_allowed_for_kind_is_rejected(frame):
+    with pytest.raises(QueryError, match="function 'mean' is not allowed on text"):
+        plan_for(frame, aggregates=[{"func": "mean", "column": "city"}])
+    with pytest.raises(QueryError, match="function 'apply' is not allowed"):
+        plan_for(frame, aggregates=[{"func": "apply", "column": "income"}])
+
+
+def test_limit_is_capped(frame):
+    assert plan_for(frame, columns=["income"], limit=10_000).limit == MAX_RESULT_ROWS
+    assert plan_for(frame, columns=["income"], limit=-5).limit == 1
+    assert plan_for(frame, columns=["income"], limit=None).limit == MAX_RESULT_ROWS
+    assert plan_for(frame, columns=["income"], limit=5.0).limit == 5
+
+
+def test_limit_must_be_a_whole_number(frame):
+    for limit in ("all", 2.5, True):
+        with pytest.raises(QueryError, match="limit"):
+            plan_for(frame, columns=["income"], limit=limit)
+    # json.loads reads 1e999 as inf
+    with pytest.raises(QueryError, match="limit"):
+        parse_plan('{"columns": ["income"], "limit": 1e999}', column_kinds(frame))
+
+
+def test_malformed_plan_shapes_are_rejected(frame):
+    with pytest.raises(QueryError, match="plan must be a JSON object"):
+        parse_plan(json.dumps({"plan": [1]}), column_kinds(frame))
+    with pytest.raises(QueryError, match="filter 1: must be an object"):
+        plan_for(frame, columns=["income"], filters=["income > 25"])
+    with pytest.raises(QueryError, match="filters: must be a list"):
+        plan_for(frame, columns=["income"], filters={"column": "income", "op": ">", "value": 25})
+
+
+def test_group_by_cluster_aggregates(frame):
+    plan = plan_for(frame, LABELS, group_by=["Cluster"],
+                    aggregates=[{"func": "mean", "column": "income"}, {"func": "count"}])
+    result = execute(frame, plan, LABELS)
+    out = result.frame.set_index("Cluster")
+    # clusters are numbered from 1
+    assert list(out.index) == [1, 2]
+    assert out.loc[1, "mean(income)"] == pytest.approx((10 + 20 + 60) / 3)
+    assert out.loc[2, "mean(income)"] == pytest.approx((30 + 40 + 50) / 3)
+    assert list(out["count(rows)"]) == [3, 3]
+    assert result.matched == 6
+
+
+def test_filters_apply_before_grouping(frame):
+    plan = plan_for(frame, LABELS, filters=[{"column": "city", "op": "==", "value": "lyon"}],
+                    group_by=["Cluster"], aggregates=[{"func": "sum", "column": "income"}])
+    out = execute(frame, plan, LABELS).frame.set_index("Cluster")
+    assert out["sum(income)"].to_dict() == {1: 70.0, 2: 30.0}
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clusterlens.engine import cluster_data
+from clusterlens.ksearch import make_kmeans
+from clusterlens.model import ClusterModel
+from clusterlens.reduction import fit_reduction, lift, project, reduce, stratified_rows
+
+
+@pytest.fixture
+def df():
+    # three clusters in a 2-D subspace of 12 columns, plus a little noise
+    rng = np.random.default_rng(10)
+    centre = rng.integers(0, 3, 1500)
+    latent = np.array([[0.0, 0.0], [6.0, 0.0], [0.0, 6.0]])[centre] + rng.normal(0, 0.5, (1500, 2))
+    X = latent @ rng.normal(size=(2, 12)) + rng.normal(0, 0.1, (1500, 12))
+    return pd.DataFrame(X, columns=[f"x{i}" for i in range(12)])
+
+
+def test_fewest_components_reaching_the_target(df):
+    X = (df - df.mean()).to_numpy()
+    reduction, solver = fit_reduction(X, target=0.9)
+    assert solver == "covariance"
+    assert reduction.n_components == 2
+    assert reduction.explained.sum() >= 0.9
+
+
+def test_lifted_model_predicts_the_reduced_labels(df):
+    X = (df - df.mean()).to_numpy() / df.std(ddof=0).to_numpy()
+    reduction, Z, _ = reduce(X, target=0.9)
+    model = make_kmeans(3, 0, n_init=1).fit(Z)
+    lifted = lift(model, reduction, reduction.residual(X, Z))
+    assert lifted.cluster_centers_.shape == (3, 12)
+    assert np.array_equal(lifted.predict(X), model.labels_)
+    # reduced-space inertia plus the residual is the full-space inertia of the same labels
+    full = ((X - lifted.cluster_centers_[model.labels_]) ** 2).sum()
+    assert lifted.inertia_ == pytest.approx(full)
+
+
+@pytest.mark.parametrize("encoding", ["ordinal", "sparse"])
+def test_pca_run_reports_and_lifts_back(df, encoding):
+    result = cluster_data(df, list(df.columns), max_k=5, pca=0.9, encoding=encoding)
+    assert result.reduction.n_components < len(df.columns)
+    assert result.reduction.agreement > 0.95
+    assert result.kmeans.cluster_centers_.shape[1] == len(result.columns)
+    assert np.array_equal(result.kmeans.predict(result.X_scaled), result.labels)
+    assert np.array_equal(ClusterModel.from_result(result).predict(df), result.labels)
+
+
+def test_projection_samples_every_cluster(df):
+    result = cluster_data(df, list(df.columns), max_k=5)
+    rows = stratified_rows(result.labels, per_cluster=100)
+    assert np.bincount(result.labels[rows]).tolist() == [100] * result.k
+    view = project(ClusterModel.from_result(result), df, result.labels, per_cluster=100)
+    assert view.points.shape == (100 * result.k, 2) and view.centers.shape == (result.k, 2)
+    assert np.array_equal(view.labels, result.labels[view.rows])
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import adjusted_rand_score
+
+from clusterlens.engine import cluster_data
+from clusterlens.ksearch import search_k
+from clusterlens.sampling import draw_sample, select_k
+
+
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(6)
+    centres = np.array([[0.0, 0.0], [8.0, 0.0], [0.0, 8.0], [8.0, 8.0]])
+    return np.vstack([c + rng.normal(0, 0.7, size=(1500, 2)) for c in centres])
+
+
+@pytest.mark.parametrize("method", ["stratified", "coreset"])
+def test_sampled_k_agrees_with_the_full_search(blobs, method):
+    full = search_k(blobs, max_k=8, n_jobs=1)
+    k, chosen, report = select_k(blobs, sample_size=600, method=method, max_k=8, n_jobs=1)
+    assert k == full.k == 4
+    assert report.confident and report.sample_size == 600
+    # weighted sample inertia estimates the full-data inertia
+    assert report.max_deviation < 0.15
+
+
+def test_stratified_sample_weights_add_up_to_the_row_count(blobs):
+    idx, weights = draw_sample(blobs, 500, "stratified", np.random.default_rng(0))
+    assert len(idx) == len(np.unique(idx)) == 500
+    assert weights.sum() == pytest.approx(len(blobs))
+
+
+def test_sampled_run_matches_the_full_run(blobs):
+    df = pd.DataFrame(blobs, columns=["x", "y"])
+    full = cluster_data(df, ["x", "y"], max_k=8, sampling=False)
+    sampled = cluster_data(df, ["x", "y"], max_k=8, sampling=True, sample_size=600)
+    assert sampled.sampling is not None and full.sampling is None
+    assert sampled.k == full.k
+    # the final model is fitted on every row
+    assert len(sampled.labels) == len(df)
+    assert adjusted_rand_score(full.labels, sampled.labels) > 0.99
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import silhouette_score
+
+from clusterlens.engine import cluster_data
+from clusterlens.ksearch import search_k
+from clusterlens.silhouette import sampled_silhouette, silhouette_by_k
+
+
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(7)
+    centres = np.array([[0.0, 0.0], [6.0, 0.0], [0.0, 6.0]])
+    return np.vstack([c + rng.normal(0, 0.6, size=(400, 2)) for c in centres])
+
+
+def test_sample_covering_every_row_is_exact(blobs):
+    labels = search_k(blobs, max_k=3, n_jobs=1).models[3].labels_
+    mean, spread = sampled_silhouette(blobs, labels, sample_size=len(blobs), repeats=2)
+    assert mean == pytest.approx(silhouette_score(blobs, labels))
+    assert spread == pytest.approx(0.0, abs=1e-12)
+
+
+def test_parallel_scores_match_in_process(blobs):
+    models = search_k(blobs, max_k=5, n_jobs=1).models
+    serial = silhouette_by_k(blobs, models, sample_size=500, n_jobs=1)
+    parallel = silhouette_by_k(blobs, models, sample_size=500, n_jobs=2)
+    # k = 1 has no silhouette
+    assert sorted(serial.scores) == [2, 3, 4, 5]
+    assert parallel.scores == pytest.approx(serial.scores)
+    assert serial.best_k == 3
+
+
+def test_silhouette_criterion_picks_the_best_scored_k(blobs):
+    df = pd.DataFrame(blobs, columns=["x", "y"])
+    result = cluster_data(df, ["x", "y"], max_k=6, criterion="silhouette")
+    assert result.k == result.silhouette.best_k == 3
+    assert len(np.unique(result.labels)) == 3
+
+
+def test_unknown_criterion_is_rejected(blobs):
+    with pytest.raises(ValueError, match="criterion"):
+        cluster_data(pd.DataFrame(blobs, columns=["x", "y"]), ["x", "y"], criterion="gap")
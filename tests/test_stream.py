@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clusterlens.cli import main
+from clusterlens.model import ClusterModel
+from clusterlens.stream import stream_cluster
+
+
+@pytest.fixture
+def source(tmp_path):
+    rng = np.random.default_rng(3)
+    n = 300
+    centre = rng.integers(0, 3, n)
+    path = tmp_path / "data.csv"
+    pd.DataFrame({
+        "income": centre * 10 + rng.normal(0, 1, n),
+        "age": rng.normal(40, 5, n),
+        "city": np.array(["Lyon", "Oslo", "Rome"])[centre],
+    }).to_csv(path, index=False)
+    return path
+
+
+def test_labels_are_written_for_every_row(source, tmp_path):
+    result = stream_cluster(source, ["income", "age", "city"], tmp_path / "labels.csv", chunksize=100, max_k=6)
+    labels = pd.read_csv(tmp_path / "labels.csv")
+    assert len(labels) == result.n_rows == 300
+    assert labels["Cluster"].between(0, result.k - 1).all()
+    model = ClusterModel.from_stream(result)
+    assert np.array_equal(model.predict(labels), labels["Cluster"].to_numpy())
+
+
+def test_k_is_capped_at_the_largest_chunk(source, tmp_path):
+    # no chunk has 10 rows, so larger k could never be fitted
+    result = stream_cluster(source, ["income", "age"], tmp_path / "labels.csv", chunksize=8, max_k=10)
+    assert len(result.wcss) == 8
+    assert np.isfinite(result.wcss).all()
+
+
+def test_parquet_output_is_rejected_when_streaming(source, tmp_path):
+    with pytest.raises(SystemExit, match="--format parquet"):
+        main([str(source), "--stream", "--format", "parquet", "-o", str(tmp_path)])
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import adjusted_rand_score
+
+from clusterlens.engine import cluster_data
+from clusterlens.warmstart import WarmStart
+
+
+def make_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    centre = rng.integers(0, 3, n)
+    return pd.DataFrame({
+        "income": centre * 10 + rng.normal(0, 1, n),
+        "age": 30 + (centre == 1) * 10 + rng.normal(0, 1, n),
+        "score": rng.normal(0, 1, n),
+    })
+
+
+@pytest.fixture
+def frame():
+    return make_frame(900, 8)
+
+
+def test_unchanged_data_reuses_every_k(frame):
+    first = cluster_data(frame, ["income", "age"], max_k=5)
+    again = cluster_data(frame, ["income", "age"], max_k=5, warm_start=first.warm_state)
+    assert again.warm.mode == "rows" and again.warm.cold == []
+    # converged fits do not move; over-split k values stopped at the tolerance may take another step
+    assert again.k in again.warm.reused
+    assert sorted(again.warm.reused + again.warm.refitted) == [1, 2, 3, 4, 5]
+    assert again.k == first.k
+    assert np.array_equal(again.labels, first.labels)
+
+
+def test_appended_rows_refit_from_the_old_centroids(frame):
+    first = cluster_data(frame, ["income", "age"], max_k=5)
+    grown = pd.concat([frame, make_frame(300, 9)], ignore_index=True)
+    warm = cluster_data(grown, ["income", "age"], max_k=5, warm_start=first.warm_state)
+    cold = cluster_data(grown, ["income", "age"], max_k=5)
+    assert warm.warm.mode == "rows" and warm.warm.cold == []
+    assert warm.warm.refitted
+    assert warm.k == cold.k
+    assert adjusted_rand_score(warm.labels, cold.labels) > 0.99
+
+
+def test_changed_features_project_the_old_centroids(frame):
+    first = cluster_data(frame, ["income", "age"], max_k=5)
+    warm = cluster_data(frame, ["income", "age", "score"], max_k=6, warm_start=first.warm_state)
+    cold = cluster_data(frame, ["income", "age", "score"], max_k=6)
+    assert warm.warm.mode == "features"
+    assert warm.warm.refitted == [1, 2, 3, 4, 5]
+    # the previous run never fitted it
+    assert warm.warm.cold == [6]
+    assert warm.k == cold.k
+    assert adjusted_rand_score(warm.labels, cold.labels) > 0.99
+
+
+def test_no_shared_columns_falls_back_to_cold_fits(frame):
+    first = cluster_data(frame, ["income"], max_k=3)
+    warm = cluster_data(frame, ["age"], max_k=3, warm_start=first.warm_state)
+    assert warm.warm.mode == "cold" and warm.warm.cold == [1, 2, 3]
+
+
+def test_state_survives_saving(frame, tmp_path):
+    state = cluster_data(frame, ["income", "age"], max_k=4).warm_state
+    state.save(tmp_path / "warm.npz")
+    loaded = WarmStart.load(tmp_path / "warm.npz")
+    assert loaded.columns == state.columns and loaded.n_rows == state.n_rows
+    assert sorted(loaded.centers) == sorted(state.centers)
+    for k, centers in state.centers.items():
+        assert np.allclose(loaded.centers[k], centers)
+    assert loaded.cold_iterations == state.cold_iterations